@@ -0,0 +1,177 @@
+"""Admission control for Chime fan-out at exam start (join storms).
+
+Token buckets, one global and one per join_code, gate the endpoints that call
+Chime. When a bucket is empty the request is rejected with 429 and a
+`Retry-After` hint instead of reaching AWS (and failing with throttling
+500s, which makes every client retry at once).
+
+Rejected clients are spread out: each bucket keeps a virtual queue of
+rejected demand that drains at the refill rate, and a client is told to come
+back when its place in that queue is reached (`X-Queue-Position`).
+
+Fairness: proctor calls (meeting start, proctor joins) skip the per-join_code
+bucket and may dip into a reserve of the global bucket that examinee calls
+can't use, so a proctor's start is never starved by their own examinees.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+
+from .config import env_flag, env_float, env_int
+from .metrics import counter
+
+
+ADMISSION_ENABLED = env_flag("ADMISSION_ENABLED", True)
+# Chime SDK control-plane calls per second, across all meetings. The limits
+# are split evenly between ADMISSION_WORKERS processes (all nodes), since
+# the load balancer spreads joins across them.
+ADMISSION_GLOBAL_RATE = env_float("ADMISSION_GLOBAL_RATE", 20.0)
+ADMISSION_GLOBAL_BURST = env_float("ADMISSION_GLOBAL_BURST", 40.0)
+ADMISSION_MEETING_RATE = env_float("ADMISSION_MEETING_RATE", 10.0)
+ADMISSION_MEETING_BURST = env_float("ADMISSION_MEETING_BURST", 20.0)
+# Share of the global burst only proctor calls may consume.
+ADMISSION_PROCTOR_RESERVE = env_float("ADMISSION_PROCTOR_RESERVE", 0.2)
+# Upper bound for the Retry-After hint.
+ADMISSION_MAX_WAIT_SECONDS = env_float("ADMISSION_MAX_WAIT_SECONDS", 60.0)
+ADMISSION_MAX_BUCKETS = env_int("ADMISSION_MAX_BUCKETS", 10000)
+ADMISSION_WORKERS = max(1, env_int("ADMISSION_WORKERS", 1))
+
+ADMISSION_DECISIONS = counter(
+    "admission_decisions_total",
+    "Admission decisions in front of Chime calls.",
+    ("priority", "outcome"),
+)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = max(rate, 0.001)
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        # Rejected demand not yet served (drains at `rate`), for queue positions.
+        self.backlog = 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.backlog = max(0.0, self.backlog - elapsed * self.rate)
+            self.updated = now
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.tokens
+
+    def take(self) -> None:
+        self.tokens -= 1.0
+
+    def enqueue(self, floor: float = 0.0) -> tuple[int, float]:
+        """Reserve a place in the virtual queue; returns (position, wait seconds)."""
+        self.backlog += 1.0
+        position = math.ceil(self.backlog)
+        missing = max(0.0, floor + 1.0 - self.tokens)
+        return position, (missing + self.backlog - 1.0) / self.rate
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst and self.backlog <= 0.0
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        *,
+        global_rate: float,
+        global_burst: float,
+        meeting_rate: float,
+        meeting_burst: float,
+        proctor_reserve: float,
+        max_wait_seconds: float,
+        max_buckets: int,
+    ):
+        self._lock = threading.Lock()
+        self._global = TokenBucket(global_rate, global_burst)
+        self._meeting_rate = meeting_rate
+        self._meeting_burst = meeting_burst
+        self._reserve = min(max(proctor_reserve, 0.0), 1.0) * self._global.burst
+        self._max_wait = max_wait_seconds
+        self._max_buckets = max_buckets
+        self._meetings: dict[str, TokenBucket] = {}
+
+    def _meeting_bucket(self, join_code: str, now: float) -> TokenBucket:
+        bucket = self._meetings.get(join_code)
+        if bucket is None:
+            if len(self._meetings) >= self._max_buckets:
+                # Forget buckets that are back at full capacity (no state lost).
+                for key in [k for k, b in self._meetings.items() if b.idle(now)]:
+                    del self._meetings[key]
+            bucket = TokenBucket(self._meeting_rate, self._meeting_burst)
+            self._meetings[join_code] = bucket
+        return bucket
+
+    def try_admit(self, join_code: str, *, proctor: bool = False) -> Optional[tuple[int, float]]:
+        """None if admitted, else (queue position, retry-after seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            if proctor:
+                # Proctors bypass the per-meeting bucket and may use the reserve.
+                if self._global.available(now) >= 1.0:
+                    self._global.take()
+                    return None
+                return self._global.enqueue()
+
+            meeting = self._meeting_bucket(join_code, now)
+            meeting_ok = meeting.available(now) >= 1.0
+            global_ok = self._global.available(now) >= 1.0 + self._reserve
+            if meeting_ok and global_ok:
+                meeting.take()
+                self._global.take()
+                return None
+
+            # Queue on the tighter of the two buckets.
+            waits = []
+            if not meeting_ok:
+                waits.append(meeting.enqueue())
+            if not global_ok:
+                waits.append(self._global.enqueue(floor=self._reserve))
+            return max(waits, key=lambda w: w[1])
+
+    def admit(self, join_code: str, *, proctor: bool = False) -> None:
+        """Raise 429 (with Retry-After) if the Chime call can't be admitted now."""
+        priority = "proctor" if proctor else "examinee"
+        rejected = self.try_admit(join_code, proctor=proctor)
+        if rejected is None:
+            ADMISSION_DECISIONS.inc(priority=priority, outcome="admitted")
+            return
+
+        position, wait = rejected
+        ADMISSION_DECISIONS.inc(priority=priority, outcome="rejected")
+        retry_after = max(1, math.ceil(min(wait, self._max_wait)))
+        raise HTTPException(
+            status_code=429,
+            detail="Too many join requests, please retry shortly",
+            headers={"Retry-After": str(retry_after), "X-Queue-Position": str(position)},
+        )
+
+
+controller = AdmissionController(
+    global_rate=ADMISSION_GLOBAL_RATE / ADMISSION_WORKERS,
+    global_burst=ADMISSION_GLOBAL_BURST / ADMISSION_WORKERS,
+    meeting_rate=ADMISSION_MEETING_RATE / ADMISSION_WORKERS,
+    meeting_burst=ADMISSION_MEETING_BURST / ADMISSION_WORKERS,
+    proctor_reserve=ADMISSION_PROCTOR_RESERVE,
+    max_wait_seconds=ADMISSION_MAX_WAIT_SECONDS,
+    max_buckets=ADMISSION_MAX_BUCKETS,
+)
+
+
+def admit(join_code: str, *, proctor: bool = False) -> None:
+    if ADMISSION_ENABLED:
+        controller.admit(join_code, proctor=proctor)
@@ -0,0 +1,288 @@
+"""Retention / archival of chat logs and attendance for ended meetings.
+
+Both tables grow with every exam, and every secondary index makes inserts
+slower as they grow. Rows of scheduled meetings that ended more than
+ARCHIVE_AFTER_DAYS ago are moved out of the database into gzip NDJSON files,
+one per meeting and table, grouped in monthly directories:
+
+    {ARCHIVE_DIR}/{YYYY-MM}/{join_code}.chat_logs.ndjson.gz
+    {ARCHIVE_DIR}/{YYYY-MM}/{join_code}.attendance.ndjson.gz
+
+One pass per meeting: stream its rows (in list-endpoint order) into the
+files, record it in `archived_meetings` (with the highest archived id per
+table), then delete the archived rows in bounded batches. A crash between
+steps is picked up by the next pass. The list endpoints read archived
+meetings from the files (`archived_meeting` / `read_archived`), so the
+archive is transparent to the frontend. Rows written after archival (ids
+above the recorded maximum) stay in the tables and are appended.
+
+With ARCHIVE_RETENTION_DAYS > 0, archives older than that are deleted.
+
+The archiver runs in the background when ARCHIVE_ENABLED (one worker per
+interval, via the shared state backend), or once with
+`python -m app.archive`. With several nodes ARCHIVE_DIR must be shared
+storage (e.g. EFS), since any node may serve a read-through.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import quote
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics, shared_state
+from .config import env_flag, env_float, env_int
+from .db import SessionLocal
+from .models import ArchivedMeeting, MeetingAttendanceSession, MeetingChatLog, ScheduledMeeting
+from .responses import dumps
+
+
+log = logging.getLogger(__name__)
+
+
+ARCHIVE_ENABLED = env_flag("ARCHIVE_ENABLED", False)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_AFTER_DAYS = env_int("ARCHIVE_AFTER_DAYS", 30)
+# 0 keeps archives forever.
+ARCHIVE_RETENTION_DAYS = env_int("ARCHIVE_RETENTION_DAYS", 0)
+ARCHIVE_BATCH_SIZE = env_int("ARCHIVE_BATCH_SIZE", 1000)
+# Pause between delete batches so the archiver never hogs the primary.
+ARCHIVE_BATCH_PAUSE_SECONDS = env_float("ARCHIVE_BATCH_PAUSE_SECONDS", 0.05)
+ARCHIVE_INTERVAL_SECONDS = env_float("ARCHIVE_INTERVAL_SECONDS", 3600.0)
+# Meetings archived per pass (bounds one pass; the rest wait for the next).
+ARCHIVE_MAX_MEETINGS_PER_PASS = env_int("ARCHIVE_MAX_MEETINGS_PER_PASS", 50)
+
+CHAT_LOGS = "chat_logs"
+ATTENDANCE = "attendance"
+
+archived_rows_total = metrics.counter("archive_rows_total", "Rows moved to archive files", ("table",))
+archive_reads_total = metrics.counter("archive_reads_total", "List requests served from archive files", ("table",))
+
+
+def chat_log_order() -> tuple:
+    """Order of GET /chat-logs/{join_code} (and of the archive files)."""
+    return (
+        MeetingChatLog.sent_at.is_(None).asc(),
+        MeetingChatLog.sent_at.asc(),
+        MeetingChatLog.created_at.asc(),
+        MeetingChatLog.id.asc(),
+    )
+
+
+def attendance_order() -> tuple:
+    """Order of GET /attendance/{join_code} (and of the archive files)."""
+    return (MeetingAttendanceSession.joined_at.asc(), MeetingAttendanceSession.id.asc())
+
+
+# table name -> (model, order, ArchivedMeeting row-count attribute, max-id attribute)
+_TABLES = {
+    CHAT_LOGS: (MeetingChatLog, chat_log_order, "chat_log_rows", "chat_log_max_id"),
+    ATTENDANCE: (MeetingAttendanceSession, attendance_order, "attendance_rows", "attendance_max_id"),
+}
+
+
+def archive_path(month: str, join_code: str, table: str) -> str:
+    return os.path.join(ARCHIVE_DIR, month, f"{quote(join_code, safe='')}.{table}.ndjson.gz")
+
+
+# --- read-through ---
+
+
+def archived_meeting(db: Session, join_code: str) -> Optional[ArchivedMeeting]:
+    """The archive record of `join_code`, or None if its rows are in the tables."""
+    return db.get(ArchivedMeeting, join_code)
+
+
+def read_archived(archived: ArchivedMeeting, table: str, columns: tuple) -> list[tuple]:
+    """Archived rows of one table, projected to `columns`, in list order.
+
+    Values are as the list endpoints serialize them (datetimes as ISO 8601
+    strings), so responses are byte-identical to the pre-archive ones.
+    """
+    names = [c.key for c in columns]
+    path = archive_path(archived.month, archived.join_code, table)
+    archive_reads_total.inc(table=table)
+    try:
+        with gzip.open(path, "rb") as f:
+            return [tuple(record.get(n) for n in names) for record in map(json.loads, f)]
+    except FileNotFoundError:
+        # Purged by retention on another node between lookup and read.
+        return []
+
+
+def max_archived_id(archived: Optional[ArchivedMeeting], table: str) -> int:
+    return getattr(archived, _TABLES[table][3]) if archived is not None else 0
+
+
+# --- archiver ---
+
+
+def _write_archive(db: Session, table: str, join_code: str, path: str) -> tuple[int, int]:
+    """Stream one meeting's rows into `path`; returns (rows, max id)."""
+    model, order, _, _ = _TABLES[table]
+    t = model.__table__
+    stmt = select(t).where(t.c.join_code == join_code).order_by(*order())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    rows = max_id = 0
+    with gzip.open(tmp, "wb") as f:
+        for row in db.execute(stmt.execution_options(yield_per=ARCHIVE_BATCH_SIZE)).mappings():
+            f.write(dumps(dict(row)) + b"\n")
+            rows += 1
+            max_id = max(max_id, row["id"])
+    os.replace(tmp, path)
+    return rows, max_id
+
+
+def archive_meeting(db: Session, meeting: ScheduledMeeting) -> Optional[ArchivedMeeting]:
+    """Write the meeting's archive files and record them (rows are deleted later)."""
+    month = (meeting.scheduled_start_at or meeting.created_at or datetime.utcnow()).strftime("%Y-%m")
+    record = ArchivedMeeting(join_code=meeting.join_code, month=month)
+    for table, (_, _, rows_attr, max_id_attr) in _TABLES.items():
+        rows, max_id = _write_archive(db, table, meeting.join_code, archive_path(month, meeting.join_code, table))
+        setattr(record, rows_attr, rows)
+        setattr(record, max_id_attr, max_id)
+    db.add(record)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Archived concurrently by another worker (same files).
+        db.rollback()
+        return None
+    return record
+
+
+def _delete_archived_rows(db: Session, archived: ArchivedMeeting) -> int:
+    deleted = 0
+    for table, (model, _, _, max_id_attr) in _TABLES.items():
+        max_id = getattr(archived, max_id_attr)
+        while True:
+            ids = db.scalars(
+                select(model.id)
+                .where(model.join_code == archived.join_code, model.id <= max_id)
+                .limit(ARCHIVE_BATCH_SIZE)
+            ).all()
+            if not ids:
+                break
+            db.execute(delete(model).where(model.id.in_(ids)))
+            db.commit()
+            deleted += len(ids)
+            archived_rows_total.inc(len(ids), table=table)
+            if ARCHIVE_BATCH_PAUSE_SECONDS > 0:
+                time.sleep(ARCHIVE_BATCH_PAUSE_SECONDS)
+    return deleted
+
+
+def _purge_expired(db: Session, now: datetime) -> int:
+    if ARCHIVE_RETENTION_DAYS <= 0:
+        return 0
+    cutoff = now - timedelta(days=ARCHIVE_RETENTION_DAYS)
+    expired = db.scalars(
+        select(ArchivedMeeting).where(ArchivedMeeting.archived_at <= cutoff).limit(ARCHIVE_MAX_MEETINGS_PER_PASS)
+    ).all()
+    for archived in expired:
+        for table in _TABLES:
+            try:
+                os.remove(archive_path(archived.month, archived.join_code, table))
+            except FileNotFoundError:
+                pass
+        db.delete(archived)
+        db.commit()
+    return len(expired)
+
+
+def run_archive_pass(now: Optional[datetime] = None) -> dict[str, int]:
+    """Archive meetings ended before the cutoff; returns what was done."""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=ARCHIVE_AFTER_DAYS)
+    summary = {"archived_meetings": 0, "deleted_rows": 0, "purged_meetings": 0}
+    db = SessionLocal()
+    try:
+        due = db.scalars(
+            select(ScheduledMeeting)
+            .outerjoin(ArchivedMeeting, ArchivedMeeting.join_code == ScheduledMeeting.join_code)
+            .where(
+                ScheduledMeeting.status == "ended",
+                ScheduledMeeting.updated_at <= cutoff,
+                ArchivedMeeting.join_code.is_(None),
+            )
+            .order_by(ScheduledMeeting.updated_at.asc())
+            .limit(ARCHIVE_MAX_MEETINGS_PER_PASS)
+        ).all()
+        for meeting in due:
+            if archive_meeting(db, meeting) is not None:
+                summary["archived_meetings"] += 1
+
+        # Includes meetings archived by an interrupted earlier pass.
+        pending = db.scalars(
+            select(ArchivedMeeting).where(
+                or_(
+                    *(
+                        select(model.id)
+                        .where(model.join_code == ArchivedMeeting.join_code, model.id <= getattr(ArchivedMeeting, max_id))
+                        .exists()
+                        for model, _, _, max_id in _TABLES.values()
+                    )
+                )
+            )
+        ).all()
+        for archived in pending:
+            summary["deleted_rows"] += _delete_archived_rows(db, archived)
+
+        summary["purged_meetings"] = _purge_expired(db, now)
+    finally:
+        db.close()
+    return summary
+
+
+_LEASE_KEY = "archiver"
+_task: Optional[asyncio.Task] = None
+
+
+async def _archiver_loop() -> None:
+    while True:
+        try:
+            # One worker per interval does the pass.
+            state = shared_state.backend()
+            if await shared_state.run(state.add, _LEASE_KEY, shared_state.WORKER_ID.encode(), ARCHIVE_INTERVAL_SECONDS):
+                summary = await run_in_threadpool(run_archive_pass)
+                if any(summary.values()):
+                    log.info("archive pass", extra={"summary": summary})
+        except Exception as e:
+            log.warning("archive pass failed: %s", e)
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+
+def start_archiver() -> None:
+    global _task
+    if ARCHIVE_ENABLED and _task is None:
+        _task = asyncio.get_running_loop().create_task(_archiver_loop())
+
+
+async def stop_archiver() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+if __name__ == "__main__":
+    from .logs import configure_logging
+
+    configure_logging(background=False)
+    print(f"Archive pass: {run_archive_pass()}")
@@ -0,0 +1,176 @@
+"""Audit trail of proctor actions (table `audit_events`).
+
+scheduled_meetings.py and users.py call `record()` once an action is
+committed: meetings created, updated, started, ended or deleted; users
+invited, deleted, or changed (role changes as `user.role_change`). Each
+event has the acting proctor, the target, the changed fields and the
+request id, so it can be matched with the access and application logs.
+
+The action's request doesn't write the row itself: events are buffered per
+worker and a background loop inserts them in one multi-row INSERT every
+AUDIT_FLUSH_INTERVAL_SECONDS, or as soon as AUDIT_BATCH_SIZE are waiting.
+The buffer is drained at shutdown. While the database is unavailable the
+events stay buffered (up to AUDIT_MAX_PENDING, oldest dropped and counted
+after that). Every event is also logged at once (logger "app.audit"), so
+the log stream has it even if a worker dies before its next flush.
+
+Without the flusher (scripts, or the app without its lifespan) events are
+written as they are recorded.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics
+from .config import env_flag, env_float, env_int
+from .db import SessionLocal
+from .logs import get_request_id
+from .models import AuditEvent
+from .responses import dumps
+
+
+AUDIT_ENABLED = env_flag("AUDIT_ENABLED", True)
+AUDIT_FLUSH_INTERVAL_SECONDS = env_float("AUDIT_FLUSH_INTERVAL_SECONDS", 1.0)
+AUDIT_BATCH_SIZE = max(1, env_int("AUDIT_BATCH_SIZE", 100))
+AUDIT_MAX_PENDING = max(1, env_int("AUDIT_MAX_PENDING", 10000))
+
+# Targets
+SCHEDULED_MEETING = "scheduled_meeting"
+USER = "user"
+
+_DETAILS_MAX_BYTES = 4096
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending: list[dict] = []
+_task: Optional[asyncio.Task] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_wake: Optional[asyncio.Event] = None
+
+
+def _details(details: dict) -> Optional[str]:
+    if not details:
+        return None
+    encoded = dumps(details)
+    if len(encoded) > _DETAILS_MAX_BYTES:
+        # Still valid JSON; the full details are in the log record.
+        encoded = dumps({"truncated": True, "fields": sorted(details)})
+    return encoded.decode("utf-8")
+
+
+def record(actor: dict, action: str, target_type: str, target_id: Any, **details: Any) -> None:
+    """Record a committed action; `actor` is the require_proctor user."""
+    if not AUDIT_ENABLED:
+        return
+    event = {
+        "created_at": datetime.utcnow(),
+        "actor": str(actor.get("username") or "unknown"),
+        "actor_user_id": getattr(actor.get("user"), "id", None),
+        "action": action,
+        "target_type": target_type,
+        "target_id": str(target_id),
+        "details": _details(details),
+        "request_id": get_request_id(),
+    }
+    log.info(
+        action,
+        extra={"actor": event["actor"], "target_type": target_type, "target_id": event["target_id"], "details": details},
+    )
+    with _lock:
+        if len(_pending) >= AUDIT_MAX_PENDING:
+            del _pending[0]
+            events_dropped_total.inc()
+        _pending.append(event)
+        full = len(_pending) >= AUDIT_BATCH_SIZE
+    if _task is None:
+        try:
+            flush()
+        except Exception as e:
+            # Kept for the next flush; never fails the committed action.
+            log.warning("audit flush failed: %s", e)
+    elif full:
+        _loop.call_soon_threadsafe(_wake.set)
+
+
+def flush() -> int:
+    """Write the buffered events in one INSERT; returns how many."""
+    with _lock:
+        batch = list(_pending)
+        _pending.clear()
+    if not batch:
+        return 0
+    try:
+        with SessionLocal() as db:
+            db.execute(insert(AuditEvent), batch)
+            db.commit()
+    except Exception:
+        # Back in front of anything recorded meanwhile, for the next flush.
+        with _lock:
+            _pending[:0] = batch
+            overflow = len(_pending) - AUDIT_MAX_PENDING
+            if overflow > 0:
+                del _pending[:overflow]
+                events_dropped_total.inc(overflow)
+        raise
+    events_written_total.inc(len(batch))
+    return len(batch)
+
+
+async def _flusher_loop() -> None:
+    while True:
+        try:
+            await asyncio.wait_for(_wake.wait(), AUDIT_FLUSH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+        try:
+            await run_in_threadpool(flush)
+        except Exception as e:
+            log.warning("audit flush failed: %s", e)
+            # Don't retry on every new event while the database is down.
+            await asyncio.sleep(AUDIT_FLUSH_INTERVAL_SECONDS)
+
+
+def start_flusher() -> None:
+    global _task, _loop, _wake
+    if AUDIT_ENABLED and _task is None:
+        _loop = asyncio.get_running_loop()
+        _wake = asyncio.Event()
+        _task = _loop.create_task(_flusher_loop())
+
+
+async def stop_flusher() -> None:
+    """Stop the loop and write what is still buffered."""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    try:
+        await run_in_threadpool(flush)
+    except Exception as e:
+        log.warning("audit flush at shutdown failed, %d event(s) not written: %s", len(_pending), e)
+
+
+events_written_total = metrics.counter("audit_events_written_total", "Audit events written to audit_events")
+events_dropped_total = metrics.counter(
+    "audit_events_dropped_total", "Audit events dropped (buffer full while the database was unavailable)"
+)
+
+metrics.gauge(
+    "audit_events_pending",
+    "Audit events buffered for the next flush.",
+    collect=lambda: {(): float(len(_pending))},
+)
@@ -1,4 +1,5 @@
 import os
+import time
 from typing import Optional
 
 import requests
@@ -6,8 +7,11 @@ from fastapi import Depends, Header, HTTPException
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
+from .conditional import USERS, bump
 from .db import get_db
+from .metrics import observe_dependency
 from .models import User
+from .resilience import call as resilient_call
 
 
 # Cognito Configuration
@@ -35,22 +39,49 @@ COGNITO_ISSUER = f"https://cognito-idp.{COGNITO_REGION}.amazonaws.com/{COGNITO_U
 
 # Cache JWKS
 _jwks = None
+# time.monotonic() of the last successful fetch.
+_jwks_fetched_at: Optional[float] = None
 
 
-def get_jwks():
-    global _jwks
-    if _jwks is None:
-        try:
-            url = f"{COGNITO_ISSUER}/.well-known/jwks.json"
-            res = requests.get(url, timeout=5)
-            res.raise_for_status()
-            _jwks = res.json()
-        except Exception:
-            # Fallback for dev/offline environments.
-            _jwks = {"keys": []}
+def _fetch_jwks() -> dict:
+    url = f"{COGNITO_ISSUER}/.well-known/jwks.json"
+    with observe_dependency("cognito", "jwks_fetch"):
+        res = requests.get(url, timeout=5)
+        res.raise_for_status()
+        return res.json()
+
 
+def refresh_jwks() -> bool:
+    """Fetch the JWKS (blocking; keeps the cached keys on failure).
+
+    Only called off the request path: the "jwks" lifecycle component at
+    startup and the health monitor's jwks probe (keys missing or older than
+    JWKS_MAX_AGE_SECONDS).
+    """
+    global _jwks, _jwks_fetched_at
+    try:
+        jwks = resilient_call("cognito-jwks", "jwks_fetch", _fetch_jwks, deadline_seconds=5)
+    except Exception:
+        return False
     # Defensive: ensure expected shape
-    if not isinstance(_jwks, dict) or not isinstance(_jwks.get("keys"), list):
+    if not isinstance(jwks, dict) or not isinstance(jwks.get("keys"), list):
+        return False
+    _jwks, _jwks_fetched_at = jwks, time.monotonic()
+    return True
+
+
+def jwks_age_seconds() -> Optional[float]:
+    """Seconds since the cached JWKS was fetched (None if it wasn't fetched here)."""
+    return None if _jwks_fetched_at is None else time.monotonic() - _jwks_fetched_at
+
+
+def get_jwks():
+    """The cached JWKS; never fetches (token checks run on the event loop).
+
+    Empty until a background fetch succeeds, so while Cognito is unreachable
+    requests fail fast with 401 instead of each waiting on the fetch.
+    """
+    if _jwks is None:
         return {"keys": []}
     return _jwks
 
@@ -67,6 +98,11 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
         raise HTTPException(status_code=401, detail="Missing authorization header")
 
     token = authorization.replace("Bearer ", "")
+    with observe_dependency("auth", "jwt_verify"):
+        return _verify_token(token)
+
+
+def _verify_token(token: str) -> dict:
     try:
         keys = get_jwks()["keys"]
         if not keys:
@@ -98,6 +134,19 @@ def _payload_username(payload: dict) -> str:
     return str(value).strip() or "unknown"
 
 
+def _release_connection(db: Session, record: Optional[User]) -> None:
+    """Give the request's pooled connection back before the endpoint runs.
+
+    Dependencies and the endpoint run in separate threadpool hops. Holding a
+    connection between them lets a burst of requests park every pooled
+    connection while all threads wait for one (pool timeouts, not progress).
+    The record stays usable detached; `db.add()` re-attaches it.
+    """
+    if record is not None:
+        db.expunge(record)
+    db.rollback()
+
+
 def get_current_user_record(
     user_payload: dict = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -107,12 +156,15 @@ def get_current_user_record(
     default_proctors = {u.strip().lower() for u in os.getenv("DEFAULT_PROCTOR_USERS", "").split(",") if u.strip()}
     default_role = "proctor" if email.lower() in default_proctors else "examinee"
 
-    record = db.query(User).filter(User.email == email).one_or_none()
-    if record is None:
-        record = User(email=email, role=default_role)
-        db.add(record)
-        db.commit()
-        db.refresh(record)
+    with observe_dependency("db", "user_lookup"):
+        record = db.query(User).filter(User.email == email).one_or_none()
+        if record is None:
+            record = User(email=email, role=default_role)
+            db.add(record)
+            db.commit()
+            bump(USERS)
+            db.refresh(record)
+    _release_connection(db, record)
 
     return {
         "payload": user_payload,
@@ -126,3 +178,29 @@ def require_proctor(user=Depends(get_current_user_record)):
     if user.get("role") != "proctor":
         raise HTTPException(status_code=403, detail="Proctor role required")
     return user
+
+
+async def get_optional_current_user(authorization: Optional[str] = Header(None)):
+    """Like get_current_user, but anonymous (None) instead of 401.
+
+    Used by endpoints that stay callable without auth (e.g. attendance
+    beacons) but record the user when a valid token is sent.
+    """
+    if not authorization:
+        return None
+    try:
+        return await get_current_user(authorization)
+    except HTTPException:
+        return None
+
+
+def get_optional_user(
+    user_payload: Optional[dict] = Depends(get_optional_current_user),
+    db: Session = Depends(get_db),
+) -> Optional[User]:
+    if user_payload is None:
+        return None
+    email = _payload_username(user_payload)
+    record = db.query(User).filter(User.email == email).one_or_none()
+    _release_connection(db, record)
+    return record
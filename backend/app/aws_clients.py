@@ -0,0 +1,122 @@
+"""Lazily constructed, shared AWS SDK clients.
+
+boto3 is imported and clients are built on first use (not at module import),
+so workers/tests that never touch AWS don't pay for it. boto3 clients are
+thread-safe once created, but creating them from the default session is not,
+hence the lock.
+
+Set AWS_CLIENTS_PREWARM=true to build them at worker startup (after fork)
+instead of on the first request.
+
+Clients are wrapped for metrics and for the retry / circuit-breaker policy in
+app.resilience (botocore's own retries are turned off to avoid stacking).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Optional
+
+from .config import env_flag, env_float
+from .metrics import instrument_client
+from .resilience import ResilientClient
+
+
+log = logging.getLogger(__name__)
+
+
+AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "us-east-1")
+AWS_CLIENTS_PREWARM = env_flag("AWS_CLIENTS_PREWARM", False)
+AWS_CONNECT_TIMEOUT_SECONDS = env_float("AWS_CONNECT_TIMEOUT_SECONDS", 3.0)
+AWS_READ_TIMEOUT_SECONDS = env_float("AWS_READ_TIMEOUT_SECONDS", 10.0)
+
+CHIME_SERVICE = "chime-sdk-meetings"
+S3_SERVICE = "s3"
+COGNITO_SERVICE = "cognito-idp"
+
+_lock = threading.Lock()
+_clients: dict[tuple[str, str], Any] = {}
+
+
+def _build_client(service: str, region: str) -> Any:
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        # Retries are handled by app.resilience (one attempt per call here).
+        retries={"total_max_attempts": 1, "mode": "standard"},
+        connect_timeout=AWS_CONNECT_TIMEOUT_SECONDS,
+        read_timeout=AWS_READ_TIMEOUT_SECONDS,
+    )
+    if service == S3_SERVICE:
+        # Presigned browser uploads need SigV4.
+        config = config.merge(Config(signature_version="s3v4"))
+    return boto3.client(service, region_name=region, config=config)
+
+
+def _wrap(client: Any, service: str) -> Any:
+    # Metrics innermost, so each attempt is timed separately.
+    return ResilientClient(instrument_client(client, service), service)
+
+
+def get_client(service: str, region: Optional[str] = None) -> Any:
+    key = (service, region or AWS_REGION)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _wrap(_build_client(*key), service)
+            _clients[key] = client
+    return client
+
+
+def set_client(service: str, client: Any, region: Optional[str] = None) -> None:
+    """Install a client explicitly (local fakes in benchmarks/dev)."""
+    with _lock:
+        _clients[(service, region or AWS_REGION)] = _wrap(client, service)
+
+
+def reset_clients() -> None:
+    with _lock:
+        _clients.clear()
+
+
+def close_clients() -> None:
+    """Release the clients' HTTP connection pools at shutdown (the next use builds new ones)."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            log.warning("failed to close AWS client: %s", e)
+
+
+def get_chime() -> Any:
+    return get_client(CHIME_SERVICE)
+
+
+def get_s3() -> Any:
+    return get_client(S3_SERVICE)
+
+
+def get_cognito(region: Optional[str] = None) -> Any:
+    return get_client(COGNITO_SERVICE, region)
+
+
+def prewarm_clients(cognito_region: Optional[str] = None) -> None:
+    for service, region in (
+        (CHIME_SERVICE, None),
+        (S3_SERVICE, None),
+        (COGNITO_SERVICE, cognito_region),
+    ):
+        try:
+            get_client(service, region)
+        except Exception as e:
+            log.warning("failed to pre-warm AWS %s client: %s", service, e)
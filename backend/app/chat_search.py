@@ -0,0 +1,260 @@
+"""Full-text search over chat logs (GET /chat-logs/search).
+
+Japanese has no spaces between words, so both backends match on character
+bigrams:
+
+- MySQL: a FULLTEXT index with the ngram parser (migration 006;
+  ngram_token_size must stay at its default, 2). Each query word becomes a
+  required phrase in BOOLEAN MODE, ranked by InnoDB's relevance score.
+- Other databases (SQLite in development / benchmarks): an in-process
+  inverted index of bigrams. It catches up from the table on each search
+  (rows with a higher id than it has seen), so every worker sees every
+  insert without touching the insert path. Candidates are checked against
+  the actual text and ranked with a BM25-style score. The index also keeps
+  each meeting's ids, so a join_code search only considers that exam; the
+  other filters are applied in SQL before the CHAT_SEARCH_MAX_CANDIDATES
+  cap, and a search stopped by the cap says so (`truncated`). Every
+  CHAT_SEARCH_PRUNE_SECONDS the per-meeting row counts are compared with the
+  table and ids of deleted or archived rows are evicted.
+
+Both require every word of the query (AND); text is NFKC-normalized and
+case-folded. Archived meetings (app.archive) are not searched.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Session
+
+from .config import env_float, env_int
+from .models import MeetingChatLog
+
+
+# Fallback index: most candidate rows (matching the filters) checked per
+# search, newest first.
+CHAT_SEARCH_MAX_CANDIDATES = env_int("CHAT_SEARCH_MAX_CANDIDATES", 20000)
+# Fallback index: how often removed rows (deleted, archived) are evicted.
+CHAT_SEARCH_PRUNE_SECONDS = env_float("CHAT_SEARCH_PRUNE_SECONDS", 60.0)
+_CATCH_UP_BATCH = 5000
+_LOAD_BATCH = 500
+# Ids below the highest indexed one that are re-checked on catch-up: a lower
+# auto-increment id can commit after a higher one.
+_CATCH_UP_LOOKBACK = 1000
+
+FULLTEXT_INDEX = "ft_meeting_chat_logs_text"
+
+_WORD_RE = re.compile(r"[^\s\"'()<>~*+\-@]+")
+
+
+def normalize(value: str) -> str:
+    return unicodedata.normalize("NFKC", value or "").casefold()
+
+
+def query_words(q: str) -> list[str]:
+    """Search words of `q` (normalized; words shorter than a bigram are dropped)."""
+    words = []
+    for word in _WORD_RE.findall(normalize(q)):
+        if len(word) >= 2 and word not in words:
+            words.append(word)
+    return words
+
+
+def _bigrams(value: str) -> set[str]:
+    return {value[i : i + 2] for i in range(len(value) - 1)}
+
+
+class SearchResult(NamedTuple):
+    rows: list[tuple]
+    # The fallback index stopped at CHAT_SEARCH_MAX_CANDIDATES: older matches
+    # were not considered (narrow the search to see them).
+    truncated: bool = False
+
+
+class BigramIndex:
+    """Inverted index: bigram -> chat log ids (this process only)."""
+
+    def __init__(self):
+        self._postings: dict[str, list[int]] = {}
+        # join_code -> indexed ids, for join_code searches and pruning.
+        self._meetings: dict[str, set[int]] = {}
+        # Evicted ids still in _postings (dropped when compacted).
+        self._removed: set[int] = set()
+        self._documents = 0
+        self._last_id = 0
+        self._pruned_at = time.monotonic()
+        # Indexed ids within the lookback window.
+        self._recent: set[int] = set()
+        self._lock = threading.Lock()
+
+    def catch_up(self, db: Session) -> None:
+        with self._lock:
+            after = max(0, self._last_id - _CATCH_UP_LOOKBACK)
+            while True:
+                rows = db.execute(
+                    select(MeetingChatLog.id, MeetingChatLog.join_code, MeetingChatLog.text)
+                    .where(MeetingChatLog.id > after)
+                    .order_by(MeetingChatLog.id.asc())
+                    .limit(_CATCH_UP_BATCH)
+                ).all()
+                for row_id, join_code, value in rows:
+                    if row_id in self._recent:
+                        continue
+                    for gram in _bigrams(normalize(value)):
+                        self._postings.setdefault(gram, []).append(row_id)
+                    self._meetings.setdefault(join_code, set()).add(row_id)
+                    self._recent.add(row_id)
+                    self._documents += 1
+                if rows:
+                    after = rows[-1][0]
+                    self._last_id = max(self._last_id, after)
+                if len(rows) < _CATCH_UP_BATCH:
+                    break
+            floor = self._last_id - _CATCH_UP_LOOKBACK
+            self._recent = {i for i in self._recent if i > floor}
+            if time.monotonic() - self._pruned_at >= CHAT_SEARCH_PRUNE_SECONDS:
+                self._prune(db)
+
+    def _prune(self, db: Session) -> None:
+        """Evict ids of rows no longer in the table (lock held)."""
+        self._pruned_at = time.monotonic()
+        counts = dict(
+            db.execute(select(MeetingChatLog.join_code, func.count()).group_by(MeetingChatLog.join_code)).all()
+        )
+        for join_code, ids in list(self._meetings.items()):
+            live = counts.get(join_code, 0)
+            if live >= len(ids):
+                continue
+            if live:
+                gone = ids - set(db.scalars(select(MeetingChatLog.id).where(MeetingChatLog.join_code == join_code)))
+                ids -= gone
+            else:
+                # Archived (or deleted) as a whole.
+                gone = self._meetings.pop(join_code)
+            self._removed |= gone
+            self._documents -= len(gone)
+        if len(self._removed) > max(1000, self._documents // 4):
+            removed = self._removed
+            for gram in list(self._postings):
+                kept = [i for i in self._postings[gram] if i not in removed]
+                if kept:
+                    self._postings[gram] = kept
+                else:
+                    del self._postings[gram]
+            self._removed = set()
+
+    def idf(self, word: str) -> float:
+        # Document frequency estimated by the word's rarest bigram (an upper bound).
+        df = min((len(self._postings.get(g, ())) for g in _bigrams(word)), default=0)
+        return math.log(1 + (self._documents - df + 0.5) / (df + 0.5))
+
+    def candidates(self, words: list[str], join_code: Optional[str] = None) -> list[int]:
+        """Ids containing every bigram of every word (in `join_code` if given), newest first."""
+        grams = set().union(*(_bigrams(w) for w in words))
+        with self._lock:
+            lists = [self._postings.get(g, []) for g in grams]
+            if join_code is not None:
+                lists.append(self._meetings.get(join_code, ()))
+            lists.sort(key=len)
+            if not lists or not lists[0]:
+                return []
+            ids = set(lists[0])
+            for posting in lists[1:]:
+                ids.intersection_update(posting)
+                if not ids:
+                    return []
+            ids -= self._removed
+        return sorted(ids, reverse=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._meetings.clear()
+            self._removed.clear()
+            self._documents = 0
+            self._last_id = 0
+            self._recent.clear()
+
+
+bigram_index = BigramIndex()
+
+
+def _filters(join_code: Optional[str], role: Optional[str], since: Optional[datetime], until: Optional[datetime]):
+    sent = func.coalesce(MeetingChatLog.sent_at, MeetingChatLog.created_at)
+    clauses = []
+    if join_code:
+        clauses.append(MeetingChatLog.join_code == join_code)
+    if role:
+        clauses.append(MeetingChatLog.from_role == role)
+    if since is not None:
+        clauses.append(sent >= since)
+    if until is not None:
+        clauses.append(sent < until)
+    return clauses
+
+
+def search(
+    db: Session,
+    columns: tuple,
+    words: list[str],
+    *,
+    join_code: Optional[str] = None,
+    role: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int,
+    offset: int = 0,
+) -> SearchResult:
+    """Matching rows projected to `columns` plus a trailing score, best first.
+
+    Returns up to `limit + 1` rows from `offset`, so callers can tell whether
+    another page exists.
+    """
+    filters = _filters(join_code, role, since, until)
+    if db.get_bind().dialect.name == "mysql":
+        against = " ".join('+"{}"'.format(w.replace('"', "")) for w in words)
+        score = mysql.match(MeetingChatLog.text, against=against).in_boolean_mode()
+        stmt = (
+            select(*columns, score.label("score"))
+            .where(score, *filters)
+            .order_by(score.desc(), MeetingChatLog.id.desc())
+            .offset(offset)
+            .limit(limit + 1)
+        )
+        return SearchResult([tuple(row) for row in db.execute(stmt)])
+
+    bigram_index.catch_up(db)
+    ids = bigram_index.candidates(words, join_code)
+    idf = {w: bigram_index.idf(w) for w in words}
+    n = len(columns)
+    scored = []
+    checked = 0
+    truncated = False
+    for start in range(0, len(ids), _LOAD_BATCH):
+        if checked >= CHAT_SEARCH_MAX_CANDIDATES:
+            truncated = True
+            break
+        chunk = ids[start : start + _LOAD_BATCH]
+        stmt = select(*columns, MeetingChatLog.id.label("_id"), MeetingChatLog.text.label("_text")).where(
+            MeetingChatLog.id.in_(chunk), *filters
+        )
+        for row in db.execute(stmt):
+            checked += 1
+            text = normalize(row[n + 1])
+            counts = [text.count(w) for w in words]
+            if not all(counts):
+                continue
+            # BM25-like: saturating term frequency, shorter messages rank higher.
+            norm = 1.2 * (0.25 + 0.75 * len(text) / 64)
+            score = sum(idf[w] * c * 2.2 / (c + norm) for w, c in zip(words, counts))
+            scored.append((-score, -row[n], tuple(row[:n]) + (round(score, 4),)))
+    scored.sort(key=lambda item: item[:2])
+    return SearchResult([row for _, _, row in scored[offset : offset + limit + 1]], truncated)
@@ -1,30 +1,235 @@
-import os
+import hashlib
+import json
+import logging
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from typing import NamedTuple, Optional
 
-import boto3
 from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 
+from . import shared_state
+from .aws_clients import get_chime
+from .conditional import MEETING_STATUS, versions
+from .config import env_float, env_int
+from .metrics import counter
+from .models import ScheduledMeeting
+from .resilience import NOT_FOUND, classify, http_exception
 
-# Initialize AWS Chime SDK client
-# Ensure AWS credentials are set in environment variables or .env file
-try:
-    chime = boto3.client(
-        "chime-sdk-meetings",
-        region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"),
-    )
-except Exception as e:
-    print(f"Warning: Failed to initialize AWS Chime SDK client: {e}")
-    chime = None
 
+log = logging.getLogger(__name__)
 
-# In-memory store for active meetings (MVP only)
-active_meetings: dict[str, dict] = {}
+
+# Chime ends a meeting after 24 hours at the latest.
+LEGACY_MEETING_TTL_SECONDS = 24 * 3600
+
+
+class MeetingRegistry:
+    """Legacy (unscheduled) meetings by ExternalMeetingId.
+
+    Kept in the shared state backend so every worker hands out the same Chime
+    meeting for an external id.
+    """
+
+    @staticmethod
+    def _key(external_id: str) -> str:
+        return "legacy-meeting:" + hashlib.sha256(external_id.encode()).hexdigest()
+
+    def get(self, external_id: str) -> Optional[dict]:
+        raw = shared_state.backend().get(self._key(external_id))
+        return json.loads(raw) if raw is not None else None
+
+    def setdefault(self, external_id: str, response: dict) -> dict:
+        """Register `response` unless another worker registered one first; returns the winner."""
+        state = shared_state.backend()
+        raw = json.dumps(response, default=str).encode()
+        if state.add(self._key(external_id), raw, ttl=LEGACY_MEETING_TTL_SECONDS):
+            return response
+        return self.get(external_id) or response
+
+    def discard(self, external_id: str, meeting_id: Optional[str]) -> None:
+        """Forget the meeting, unless it was already replaced by another one."""
+        current = self.get(external_id)
+        if current is not None and (current.get("Meeting") or {}).get("MeetingId") not in (None, meeting_id):
+            return
+        shared_state.backend().delete(self._key(external_id))
+
+
+active_meetings = MeetingRegistry()
+
+# Reconnecting examinees get their existing attendee back (Chime returns the
+# same attendee for a repeated ExternalUserId anyway). The TTL bounds how long
+# credentials are served for a meeting Chime ended on its own.
+ATTENDEE_CACHE_TTL_SECONDS = env_float("ATTENDEE_CACHE_TTL_SECONDS", 600.0)
+ATTENDEE_CACHE_MAX_ENTRIES = env_int("ATTENDEE_CACHE_MAX_ENTRIES", 50000)
+
+ATTENDEE_CACHE_LOOKUPS = counter("attendee_cache_lookups_total", "Attendee credential cache lookups.", ("outcome",))
+
+
+class AttendeeCache:
+    """Bounded LRU of {"Meeting", "Attendee"} keyed by (chime_meeting_id, external_user_id)."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple[str, str], tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, meeting_id: str, external_user_id: str) -> Optional[dict]:
+        key = (meeting_id, external_user_id)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] <= time.monotonic():
+                del self._entries[key]
+                item = None
+            if item is not None:
+                self._entries.move_to_end(key)
+        ATTENDEE_CACHE_LOOKUPS.inc(outcome="miss" if item is None else "hit")
+        return None if item is None else item[1]
+
+    def put(self, meeting_id: str, external_user_id: str, meeting: Optional[dict], attendee: Optional[dict]) -> None:
+        if not attendee or not attendee.get("JoinToken"):
+            return
+        key = (meeting_id, external_user_id)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, {"Meeting": meeting, "Attendee": attendee})
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget_meeting(self, meeting_id: Optional[str]) -> None:
+        """Drop every attendee of a meeting (ended, deleted or recreated)."""
+        if not meeting_id:
+            return
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == meeting_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+attendee_cache = AttendeeCache(ATTENDEE_CACHE_MAX_ENTRIES, ATTENDEE_CACHE_TTL_SECONDS)
+
+MEETING_STATUS_CACHE_MAX_ENTRIES = env_int("MEETING_STATUS_CACHE_MAX_ENTRIES", 10000)
+# How often a worker re-reads the shared meeting-status version (how long a
+# start / end / delete on another worker can go unnoticed here).
+MEETING_STATUS_RECHECK_SECONDS = env_float("MEETING_STATUS_RECHECK_SECONDS", 1.0)
+
+MEETING_STATUS_LOOKUPS = counter(
+    "meeting_status_lookups_total", "Scheduled-meeting lookups by Chime MeetingId.", ("outcome",)
+)
+
+
+class MeetingStatus(NamedTuple):
+    join_code: str
+    status: str
+
+
+class MeetingStatusCache:
+    """Bounded LRU of chime_meeting_id -> MeetingStatus (None: not a scheduled meeting).
+
+    Backs the ended-meeting gate of POST /meetings/{meeting_id}/attendees, so a
+    join storm doesn't query scheduled_meetings per attendee. The start / end
+    / delete handlers and meeting (re)creation write their change through;
+    other ids are read from the table (indexed) on first use.
+
+    Entries are valid for one MEETING_STATUS version (app.conditional): every
+    start / end / delete / recreation on any worker bumps it, and this map
+    starts over once it notices. The shared version is re-read at most every
+    MEETING_STATUS_RECHECK_SECONDS, so a hit is a dict lookup with any shared
+    state backend. The version is always read before the table, so a row is
+    never cached under a version newer than itself.
+    """
+
+    def __init__(self, max_entries: int, recheck_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.recheck_seconds = recheck_seconds
+        self._entries: "OrderedDict[str, Optional[MeetingStatus]]" = OrderedDict()
+        self._version: Optional[tuple] = None
+        self._shared: Optional[tuple] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _current_version(self) -> tuple:
+        now = time.monotonic()
+        if self._shared is None or now - self._checked >= self.recheck_seconds:
+            # The epoch changes when the backend lost its counters.
+            self._shared = (versions.epoch(), versions.get(MEETING_STATUS))
+            self._checked = now
+        return self._shared
+
+    def _sync(self, version: tuple) -> None:
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def _store(self, meeting_id: str, value: Optional[MeetingStatus]) -> None:
+        self._entries[meeting_id] = value
+        self._entries.move_to_end(meeting_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, db: Session, meeting_id: str) -> Optional[MeetingStatus]:
+        version = self._current_version()
+        with self._lock:
+            self._sync(version)
+            hit = meeting_id in self._entries
+            if hit:
+                self._entries.move_to_end(meeting_id)
+                value = self._entries[meeting_id]
+        MEETING_STATUS_LOOKUPS.inc(outcome="hit" if hit else "miss")
+        if hit:
+            return value
+
+        row = db.execute(
+            select(ScheduledMeeting.join_code, ScheduledMeeting.status)
+            .where(ScheduledMeeting.chime_meeting_id == meeting_id)
+            .limit(1)
+        ).first()
+        value = MeetingStatus(row.join_code, row.status) if row is not None else None
+        with self._lock:
+            if self._version == version:
+                self._store(meeting_id, value)
+        return value
+
+    def put(self, meeting_id: Optional[str], join_code: str, status: str) -> None:
+        """Write through a change this worker made (after its commit and bump)."""
+        if not meeting_id:
+            return
+        version = self._current_version()
+        with self._lock:
+            self._sync(version)
+            self._store(meeting_id, MeetingStatus(join_code, status))
+
+    def forget(self, meeting_id: Optional[str]) -> None:
+        if not meeting_id:
+            return
+        with self._lock:
+            self._entries.pop(meeting_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self._shared = None
+
+
+meeting_status = MeetingStatusCache(MEETING_STATUS_CACHE_MAX_ENTRIES, MEETING_STATUS_RECHECK_SECONDS)
 
 
 def get_chime_client():
-    if not chime:
+    # Created on first use (see aws_clients); ensure AWS credentials are set
+    # in environment variables or .env file.
+    try:
+        return get_chime()
+    except Exception as e:
+        log.warning("failed to initialize AWS Chime SDK client: %s", e)
         raise HTTPException(status_code=500, detail="AWS Chime SDK client not initialized")
-    return chime
 
 
 def _generate_join_code() -> str:
@@ -38,15 +243,39 @@ def _get_or_create_chime_meeting(*, external_meeting_id: str, region: str, exist
     if existing_meeting_id:
         try:
             return client.get_meeting(MeetingId=existing_meeting_id)
-        except Exception:
-            # expired / not found -> recreate
-            pass
-
-    return client.create_meeting(
-        ClientRequestToken=str(uuid.uuid4()),
-        MediaRegion=region,
-        ExternalMeetingId=external_meeting_id,
-    )
+        except Exception as e:
+            # Only an expired / deleted meeting is recreated. Throttling or an
+            # outage (after retries) must not split the room into a new meeting.
+            if classify(e) != NOT_FOUND:
+                raise http_exception(e)
+            attendee_cache.forget_meeting(existing_meeting_id)
+            meeting_status.forget(existing_meeting_id)
+
+    try:
+        resp = client.create_meeting(
+            ClientRequestToken=str(uuid.uuid4()),
+            MediaRegion=region,
+            ExternalMeetingId=external_meeting_id,
+        )
+    except Exception as e:
+        raise http_exception(e, "Failed to create meeting")
+    # Only started (or starting) meetings get a Chime meeting; the caller
+    # stores the new id in the row.
+    meeting_status.put((resp.get("Meeting") or {}).get("MeetingId"), external_meeting_id, "started")
+    return resp
+
+
+def create_attendee_cached(meeting_id: str, external_user_id: str, meeting: Optional[dict] = None) -> dict:
+    """create_attendee through the cache; returns {"Meeting", "Attendee"}."""
+    try:
+        resp = get_chime_client().create_attendee(MeetingId=meeting_id, ExternalUserId=external_user_id)
+    except Exception as e:
+        if classify(e) == NOT_FOUND:
+            attendee_cache.forget_meeting(meeting_id)
+        raise http_exception(e)
+    attendee = resp.get("Attendee")
+    attendee_cache.put(meeting_id, external_user_id, meeting, attendee)
+    return {"Meeting": meeting, "Attendee": attendee}
 
 
 # Backwards-compatible aliases for new code
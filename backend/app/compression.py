@@ -0,0 +1,165 @@
+"""Response compression (Brotli when available, else gzip).
+
+Pure ASGI middleware. Bodies smaller than COMPRESSION_MIN_BYTES, already
+encoded bodies and non-text content types are passed through. Strong ETags
+get an encoding suffix (e.g. `"…-gzip"`) so each encoding is its own
+representation; app.conditional strips it again when matching If-None-Match.
+
+Brotli needs the optional `brotli` package; without it only gzip is offered.
+"""
+
+from __future__ import annotations
+
+import zlib
+from typing import Optional
+
+from .config import env_flag, env_int
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+COMPRESSION_ENABLED = env_flag("COMPRESSION_ENABLED", True)
+COMPRESSION_MIN_BYTES = env_int("COMPRESSION_MIN_BYTES", 1024)
+# Favour speed: these are per-request, on the event loop / worker thread.
+GZIP_LEVEL = env_int("COMPRESSION_GZIP_LEVEL", 5)
+BROTLI_QUALITY = env_int("COMPRESSION_BROTLI_QUALITY", 4)
+
+_COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+
+def _accepted_encodings(header: str) -> dict[str, float]:
+    accepted: dict[str, float] = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = _accepted_encodings(accept_encoding)
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31: gzip container.
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish() if self.encoding == "br" else self._compressor.flush()
+
+
+def _header(headers: list[tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _compressed_headers(headers: list[tuple[bytes, bytes]], encoding: str) -> list[tuple[bytes, bytes]]:
+    result = []
+    vary = None
+    for key, value in headers:
+        lower = key.lower()
+        if lower == b"content-length":
+            continue
+        if lower == b"vary":
+            vary = value
+            continue
+        if lower == b"etag" and value.endswith(b'"') and not value.startswith(b"W/"):
+            value = value[:-1] + f"-{encoding}".encode() + b'"'
+        result.append((key, value))
+    result.append((b"content-encoding", encoding.encode()))
+    vary_values = [v.strip() for v in (vary or b"").split(b",") if v.strip()]
+    if b"accept-encoding" not in {v.lower() for v in vary_values}:
+        vary_values.append(b"Accept-Encoding")
+    result.append((b"vary", b", ".join(vary_values)))
+    return result
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding((_header(scope.get("headers") or [], b"accept-encoding") or b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[dict] = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] != "http.response.body":
+                # e.g. http.response.pathsend: nothing to compress.
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                headers = list(start.get("headers") or [])
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1").lower()
+                eligible = (
+                    _header(headers, b"content-encoding") is None
+                    and content_type.startswith(_COMPRESSIBLE_TYPES)
+                    and start["status"] not in (204, 206, 304)
+                    and (more_body or len(body) >= self.minimum_size)
+                )
+                if not eligible:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding)
+                await send(dict(start, headers=_compressed_headers(headers, encoding)))
+
+            chunk = encoder.compress(body)
+            if not more_body:
+                chunk += encoder.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
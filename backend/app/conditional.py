@@ -0,0 +1,143 @@
+"""Conditional GET for list endpoints, driven by write-side version counters.
+
+Write endpoints bump a counter for the resource they changed (e.g. the chat
+log of one join_code) after committing. Read endpoints derive a strong ETag
+from the current counter *before* querying, so an unchanged resource is
+answered with 304 without touching the database (beyond authentication).
+
+Ordering matters for correctness: bumping after commit and reading the
+version before the query can only ever tag *newer* data with an older
+version (causing one extra full response), never the reverse.
+
+Counters live in the shared state backend (app.shared_state), so every
+worker tags the same data alike. The ETag embeds an epoch stored next to
+them (re-read every few seconds), so tags issued before the counters were
+lost (restart of the in-process backend, flushed Redis) don't match.
+
+With a read replica (app.db.get_read_db), `bump()` also leaves a short-lived
+"recently written" marker per key, and reads of marked resources go to the
+primary. Otherwise a lagging replica could return rows older than the
+version already in the ETag, and the stale response would then revalidate
+as current.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+import uuid
+from typing import Optional
+
+from fastapi import Request, Response
+
+from . import shared_state
+from .db import DB_READ_REPLICA_MAX_LAG_SECONDS, read_replica_enabled
+
+
+_EPOCH_KEY = "etag-epoch"
+# How often a worker re-reads the shared epoch (notices a flushed backend).
+_EPOCH_RECHECK_SECONDS = 5.0
+
+# Suffixes appended to the ETag by CompressionMiddleware (one tag per encoding).
+ENCODING_SUFFIXES = ("-br", "-gzip")
+
+USERS = "users"
+SCHEDULED_MEETINGS = "scheduled-meetings"
+# Chime MeetingId -> scheduled meeting status (app.chime_client.meeting_status):
+# bumped only on start, end, delete and meeting recreation.
+MEETING_STATUS = "meeting-status"
+
+
+def chat_logs_key(join_code: str) -> str:
+    return f"chat-logs:{join_code}"
+
+
+def attendance_key(join_code: str) -> str:
+    return f"attendance:{join_code}"
+
+
+def flags_key(join_code: str) -> str:
+    return f"flags:{join_code}"
+
+
+class VersionStore:
+    def __init__(self):
+        self._epoch: Optional[str] = None
+        self._epoch_backend = None
+        self._epoch_checked = 0.0
+
+    def epoch(self) -> str:
+        state = shared_state.backend()
+        now = time.monotonic()
+        if self._epoch is None or self._epoch_backend is not state or now - self._epoch_checked >= _EPOCH_RECHECK_SECONDS:
+            candidate = uuid.uuid4().hex[:8].encode()
+            state.add(_EPOCH_KEY, candidate)
+            self._epoch = (state.get(_EPOCH_KEY) or candidate).decode()
+            self._epoch_backend = state
+            self._epoch_checked = now
+        return self._epoch
+
+    def get_many(self, keys: list[str]) -> list[int]:
+        return shared_state.backend().counters([f"version:{k}" for k in keys])
+
+    def get(self, key: str) -> int:
+        return self.get_many([key])[0]
+
+    def bump(self, key: str) -> int:
+        return shared_state.backend().incr(f"version:{key}")
+
+
+versions = VersionStore()
+
+
+def bump(*keys: str) -> None:
+    """Record that the resources were modified (call after commit)."""
+    mark = read_replica_enabled()
+    for key in keys:
+        versions.bump(key)
+        if mark:
+            shared_state.backend().set(f"written:{key}", b"1", ttl=DB_READ_REPLICA_MAX_LAG_SECONDS)
+
+
+def recently_written(*keys: str) -> bool:
+    """True if any of the resources was bumped within the replica lag window."""
+    state = shared_state.backend()
+    return any(state.get(f"written:{key}") is not None for key in keys)
+
+
+def etag_for(request: Request, *keys: str) -> str:
+    parts = [versions.epoch()] + [str(v) for v in versions.get_many(list(keys))]
+    query = request.url.query
+    if query:
+        # Different filters/pages are different representations.
+        parts.append(hashlib.blake2b(query.encode(), digest_size=6).hexdigest())
+    return '"' + ".".join(parts) + '"'
+
+
+def _strip_encoding(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[: -len(suffix) - 1] + '"'
+    return tag
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return any(_strip_encoding(tag) == etag for tag in if_none_match.split(","))
+
+
+def cache_headers(etag: str) -> dict[str, str]:
+    # Always revalidate; responses are per-user (bearer auth), so private.
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 response if the client's If-None-Match matches, else None."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return None
@@ -1,8 +1,16 @@
+import logging
 import os
 
-from sqlalchemy import create_engine, text
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
+from .config import env_flag, env_float, env_int
+from . import metrics, profiling
+
+
+log = logging.getLogger(__name__)
+
 
 # --- MySQL (User role store) ---
 MYSQL_HOST = os.getenv("MYSQL_HOST", "localhost")
@@ -16,15 +24,72 @@ DATABASE_URL = os.getenv(
     f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}",
 )
 
+# Optional read replica for proctor list endpoints (`get_read_db`). Unset:
+# reads use the primary. Migrations only ever run against DATABASE_URL.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "").strip()
+# Upper bound on replica lag: a resource written within this window is read
+# from the primary (read-your-writes, and no ETag on stale replica rows).
+DB_READ_REPLICA_MAX_LAG_SECONDS = env_float("DB_READ_REPLICA_MAX_LAG_SECONDS", 5.0)
+# Request header that forces primary reads (`X-Read-Consistency: primary`).
+READ_CONSISTENCY_HEADER = "x-read-consistency"
+
+# Disable when migrations run as a separate deploy step (`python -m app.migrations`).
+DB_MIGRATE_ON_STARTUP = env_flag("DB_MIGRATE_ON_STARTUP", True)
+
+# Connections per worker process. Size the database's max_connections for
+# workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT_SECONDS = env_int("DB_POOL_TIMEOUT_SECONDS", 30)
+DB_POOL_RECYCLE_SECONDS = env_int("DB_POOL_RECYCLE_SECONDS", 1800)
+
 Base = declarative_base()
 
+
+def _pool_options(url: str) -> dict:
+    if url.startswith("sqlite") and (url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url):
+        # In-memory SQLite uses a single-connection pool without these knobs.
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+    }
+
+
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,
     future=True,
+    **_pool_options(DATABASE_URL),
 )
+metrics.instrument_engine(engine)
+profiling.instrument_engine(engine)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
+if DATABASE_READ_URL:
+    read_engine = create_engine(
+        DATABASE_READ_URL,
+        pool_pre_ping=True,
+        future=True,
+        **_pool_options(DATABASE_READ_URL),
+    )
+    metrics.instrument_engine(read_engine, pool_metric="db_read_pool_connections")
+    profiling.instrument_engine(read_engine)
+else:
+    read_engine = engine
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False, future=True)
+
+read_routing_total = metrics.counter(
+    "db_read_routing_total", "Read-only sessions by the database that served them", ("target", "reason")
+)
+
+
+@event.listens_for(ReadSessionLocal, "before_flush")
+def _refuse_writes(session, flush_context, instances) -> None:
+    raise RuntimeError("get_read_db sessions are read-only; use get_db for writes")
+
 
 def get_db():
     db: Session = SessionLocal()
@@ -34,120 +99,77 @@ def get_db():
         db.close()
 
 
-def init_db() -> None:
-    """Create tables and apply minimal schema evolution.
+def read_replica_enabled() -> bool:
+    return read_engine is not engine
 
-    Note: this is intentionally lightweight (MVP). It should not block app startup.
-    """
-    # Import models so Base.metadata is populated
-    from .models import MeetingAttendanceSession, MeetingChatLog, ScheduledMeeting, User  # noqa: F401
 
-    Base.metadata.create_all(bind=engine)
+def get_read_db(request: Request):
+    """Read-only session for list endpoints: the replica, if one is configured.
 
-    # SQLAlchemy's create_all does NOT add columns to existing tables.
+    Call `route_read(db, *keys)` before the first query so resources written
+    in the last DB_READ_REPLICA_MAX_LAG_SECONDS are read from the primary.
+    """
+    db: Session = ReadSessionLocal()
+    if read_replica_enabled() and request.headers.get(READ_CONSISTENCY_HEADER, "").strip().lower() == "primary":
+        _use_primary(db, "header")
     try:
-        with engine.begin() as conn:
-            cols = conn.execute(
-                text(
-                    """
-                    SELECT COLUMN_NAME
-                    FROM information_schema.COLUMNS
-                    WHERE TABLE_SCHEMA = :db
-                      AND TABLE_NAME = 'users'
-                    """
-                ),
-                {"db": MYSQL_DATABASE},
-            ).fetchall()
-            existing = {row[0] for row in cols}
-
-            # If schema was renamed manually, ensure the new columns exist.
-            # If old columns still exist, try to rename them to the new names.
-            if "email" not in existing:
-                if "username" in existing:
-                    try:
-                        conn.execute(text("ALTER TABLE users RENAME COLUMN username TO email"))
-                        existing.add("email")
-                    except Exception:
-                        # Fallback: add as new column
-                        conn.execute(text("ALTER TABLE users ADD COLUMN email VARCHAR(255) NULL"))
-                        existing.add("email")
-                else:
-                    conn.execute(text("ALTER TABLE users ADD COLUMN email VARCHAR(255) NULL"))
-                    existing.add("email")
-
-            if "user_name" not in existing:
-                if "display_name" in existing:
-                    try:
-                        conn.execute(text("ALTER TABLE users RENAME COLUMN display_name TO user_name"))
-                        existing.add("user_name")
-                    except Exception:
-                        conn.execute(text("ALTER TABLE users ADD COLUMN user_name VARCHAR(255) NULL"))
-                        existing.add("user_name")
-                else:
-                    conn.execute(text("ALTER TABLE users ADD COLUMN user_name VARCHAR(255) NULL"))
-                    existing.add("user_name")
-
-            if "class_name" not in existing:
-                conn.execute(text("ALTER TABLE users ADD COLUMN class_name VARCHAR(255) NULL"))
-    except Exception as e:
-        # Don't block startup; DB could be unavailable during boot.
-        print(f"Warning: failed to ensure users columns: {e}")
+        yield db
+    finally:
+        db.close()
 
-    try:
-        with engine.begin() as conn:
-            cols = conn.execute(
-                text(
-                    """
-                    SELECT COLUMN_NAME
-                    FROM information_schema.COLUMNS
-                    WHERE TABLE_SCHEMA = :db
-                      AND TABLE_NAME = 'scheduled_meetings'
-                    """
-                ),
-                {"db": MYSQL_DATABASE},
-            ).fetchall()
-            existing = {row[0] for row in cols}
-
-            if "teacher_name" not in existing:
-                conn.execute(text("ALTER TABLE scheduled_meetings ADD COLUMN teacher_name VARCHAR(255) NULL"))
-    except Exception as e:
-        print(f"Warning: failed to ensure scheduled_meetings columns: {e}")
 
-    # Seed dev-friendly default users (idempotent).
-    # Note: the app's role vocabulary is 'proctor' | 'examinee'.
+def dispose_engines() -> None:
+    """Close pooled connections at shutdown (the engines reconnect if used again)."""
+    engine.dispose()
+    if read_replica_enabled():
+        read_engine.dispose()
+
+
+def _use_primary(db: Session, reason: str) -> None:
+    # Only valid before the session's first query (no connection checked out yet).
+    db.bind = engine
+    db.info["read_reason"] = reason
+
+
+def route_read(db: Session, *keys: str) -> None:
+    """Pick the database for a read session, given the resources it will read.
+
+    Keys are the version keys of app.conditional; their writers call `bump()`,
+    which marks them recently written. A no-op without a replica.
+    """
+    if not read_replica_enabled():
+        return
+    reason = db.info.get("read_reason")
+    if reason is None:
+        from .conditional import recently_written
+
+        if recently_written(*keys):
+            reason = "recent_write"
+            _use_primary(db, reason)
+    read_routing_total.inc(target="primary" if reason else "replica", reason=reason or "none")
+
+
+def init_db() -> None:
+    """Bring the schema up to date at startup (see app/migrations.py).
+
+    When the schema is current this is a single version check. With several
+    workers / nodes, one elected process migrates and the others wait for it
+    (app.shared_state.run_once). It should not block app startup, so failures
+    are reported and startup continues.
+    Default users are no longer seeded here; run `python -m app.seed`.
+    """
+    if not DB_MIGRATE_ON_STARTUP:
+        return
+
+    from .migrations import LATEST_VERSION, MIGRATION_LOCK_TIMEOUT_SECONDS, migrate
+    from .shared_state import run_once
+
     try:
-        from .models import User
-
-        seed_users = [
-            {
-                "email": "fukukaranimube+proctor@gmail.com",
-                "role": "proctor",
-                "user_name": "山田太郎",
-            },
-            {
-                "email": "fukukaranimube+student@gmail.com",
-                # System uses 'examinee' for students.
-                "role": "examinee",
-                "user_name": "田中花子",
-            },
-        ]
-
-        with SessionLocal.begin() as db:
-            for u in seed_users:
-                email = str(u.get("email") or "").strip().lower()
-                role = str(u.get("role") or "").strip() or "examinee"
-                user_name = (str(u.get("user_name") or "").strip() or None)
-
-                if not email:
-                    continue
-
-                record = db.query(User).filter(User.email == email).one_or_none()
-                if record is None:
-                    db.add(User(email=email, role=role, user_name=user_name))
-                else:
-                    # Don't overwrite existing role/name; only fill missing display name.
-                    if record.user_name is None and user_name is not None:
-                        record.user_name = user_name
-                        db.add(record)
+        run_once(
+            f"init_db:v{LATEST_VERSION}",
+            lambda: migrate(engine),
+            lease_seconds=MIGRATION_LOCK_TIMEOUT_SECONDS,
+        )
     except Exception as e:
-        print(f"Warning: failed to seed default users: {e}")
+        # Don't block startup; DB could be unavailable during boot.
+        log.warning("failed to apply schema migrations: %s", e)
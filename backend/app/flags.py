@@ -0,0 +1,322 @@
+"""Suspicious-activity flags, computed incrementally from the write paths.
+
+POST /attendance/join, /attendance/leave and /chat-logs feed each event to
+this module after committing. Per examinee it keeps a few timestamps in the
+shared state backend (app.shared_state; in-process by default), so the work
+per event is constant and nothing is re-read from the tables:
+
+- repeated_disconnects: FLAG_DISCONNECT_COUNT leaves within
+  FLAG_DISCONNECT_WINDOW_SECONDS.
+- long_absence: away for FLAG_ABSENCE_SECONDS or more. Raised on rejoin, or
+  by the sweeper while the examinee is still away (scheduled meetings that
+  are started and not past their scheduled end).
+- examinee_direct_message: an examinee messaged another examinee (once per
+  pair and meeting).
+- message_burst: FLAG_BURST_COUNT messages from one examinee within
+  FLAG_BURST_WINDOW_SECONDS.
+
+A "K events within W seconds" window only needs the last K timestamps, so
+each window is at most K floats. After a flag the same window stays quiet
+for W seconds, so one burst is one flag.
+
+Flags are rows of `meeting_flags`, listed by
+GET /scheduled-meetings/{join_code}/flags. Failures here are reported and
+never fail the write that fed the event.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics, overview, shared_state
+from .conditional import bump, flags_key
+from .config import env_flag, env_float, env_int
+from .db import SessionLocal
+from .models import MeetingFlag, ScheduledMeeting
+
+
+log = logging.getLogger(__name__)
+
+
+FLAGS_ENABLED = env_flag("FLAGS_ENABLED", True)
+FLAG_DISCONNECT_COUNT = max(2, env_int("FLAG_DISCONNECT_COUNT", 3))
+FLAG_DISCONNECT_WINDOW_SECONDS = env_float("FLAG_DISCONNECT_WINDOW_SECONDS", 600.0)
+FLAG_ABSENCE_SECONDS = env_float("FLAG_ABSENCE_SECONDS", 300.0)
+FLAG_BURST_COUNT = max(2, env_int("FLAG_BURST_COUNT", 10))
+FLAG_BURST_WINDOW_SECONDS = env_float("FLAG_BURST_WINDOW_SECONDS", 30.0)
+# How often each worker checks the examinees that left through it for absences.
+FLAG_SWEEP_INTERVAL_SECONDS = env_float("FLAG_SWEEP_INTERVAL_SECONDS", 30.0)
+# Lifetime of per-examinee state (longer than any exam).
+FLAG_STATE_TTL_SECONDS = env_float("FLAG_STATE_TTL_SECONDS", 6 * 3600.0)
+
+REPEATED_DISCONNECTS = "repeated_disconnects"
+LONG_ABSENCE = "long_absence"
+EXAMINEE_DIRECT_MESSAGE = "examinee_direct_message"
+MESSAGE_BURST = "message_burst"
+
+flags_total = metrics.counter("meeting_flags_total", "Suspicious-activity flags raised", ("kind",))
+
+
+def _utc(ts: float) -> datetime:
+    return datetime.utcfromtimestamp(ts)
+
+
+# Per-examinee state: a packed array of floats (0.0 = unset), read and
+# written whole. Concurrent events of one examinee are rare; if two race, a
+# timestamp can be lost, which at worst delays a flag by one event.
+#
+# attendance: [last_join, last_left, absence_flagged_for, quiet_until, *leave times]
+# chat:       [quiet_until, *send times]
+_LAST_JOIN, _LAST_LEFT, _ABSENCE_FLAGGED = range(3)
+
+
+def _state_key(kind: str, join_code: str, attendee_id: str) -> str:
+    return f"flag-window:{kind}:{join_code}:{attendee_id}"
+
+
+def _load(key: str, header: int) -> array:
+    raw = shared_state.backend().get(key)
+    state = array("d")
+    if raw:
+        state.frombytes(raw)
+    if len(state) < header:
+        state = array("d", [0.0] * header)
+    return state
+
+
+def _save(key: str, state: array) -> None:
+    shared_state.backend().set(key, state.tobytes(), ttl=FLAG_STATE_TTL_SECONDS)
+
+
+def _slide(state: array, header: int, now: float, count: int, window: float) -> Optional[list[float]]:
+    """Append `now` to the window; the timestamps in it if that makes `count` within `window`.
+
+    The window's timestamps follow the `header` slots; the last header slot
+    is its quiet-until time.
+    """
+    times = [t for t in state[header:] if now - t <= window] + [now]
+    times = times[-count:]
+    state[header:] = array("d", times)
+    if len(times) >= count and now >= state[header - 1]:
+        state[header - 1] = now + window
+        return times
+    return None
+
+
+def _flag(kind: str, join_code: str, attendee_id: str, **fields) -> MeetingFlag:
+    return MeetingFlag(kind=kind, join_code=join_code, attendee_id=attendee_id, **fields)
+
+
+def _emit(db: Session, flags: list[MeetingFlag]) -> None:
+    if not flags:
+        return
+    db.add_all(flags)
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    for code in {f.join_code for f in flags}:
+        bump(flags_key(code))
+        overview.record_flags(code, sum(1 for f in flags if f.join_code == code))
+    for f in flags:
+        flags_total.inc(kind=f.kind)
+
+
+# Leaves seen by this worker, for absences that are still ongoing:
+# (join_code, attendee_id) -> (left at, external_user_id).
+_pending: dict[tuple[str, str], tuple[float, Optional[str]]] = {}
+_pending_lock = threading.Lock()
+
+
+def record_join(db: Session, join_code: str, attendee_id: str, external_user_id: Optional[str], role: str) -> None:
+    if not FLAGS_ENABLED or role != "examinee":
+        return
+    try:
+        now = time.time()
+        with _pending_lock:
+            _pending.pop((join_code, attendee_id), None)
+        key = _state_key("att", join_code, attendee_id)
+        state = _load(key, 4)
+        flags = []
+        left = state[_LAST_LEFT]
+        if left > state[_LAST_JOIN] and state[_ABSENCE_FLAGGED] != left and now - left >= FLAG_ABSENCE_SECONDS:
+            flags.append(
+                _flag(
+                    LONG_ABSENCE,
+                    join_code,
+                    attendee_id,
+                    external_user_id=external_user_id,
+                    first_event_at=_utc(left),
+                    last_event_at=_utc(now),
+                )
+            )
+            state[_ABSENCE_FLAGGED] = left
+        state[_LAST_JOIN] = now
+        _save(key, state)
+        _emit(db, flags)
+    except Exception as e:
+        log.warning("flag analytics failed on join: %s", e)
+
+
+def record_leave(db: Session, join_code: str, attendee_id: str, external_user_id: Optional[str], role: str) -> None:
+    if not FLAGS_ENABLED or role != "examinee":
+        return
+    try:
+        now = time.time()
+        key = _state_key("att", join_code, attendee_id)
+        state = _load(key, 4)
+        state[_LAST_LEFT] = now
+        flags = []
+        times = _slide(state, 4, now, FLAG_DISCONNECT_COUNT, FLAG_DISCONNECT_WINDOW_SECONDS)
+        if times:
+            flags.append(
+                _flag(
+                    REPEATED_DISCONNECTS,
+                    join_code,
+                    attendee_id,
+                    external_user_id=external_user_id,
+                    event_count=len(times),
+                    first_event_at=_utc(times[0]),
+                    last_event_at=_utc(now),
+                )
+            )
+        _save(key, state)
+        with _pending_lock:
+            _pending[(join_code, attendee_id)] = (now, external_user_id)
+        _emit(db, flags)
+    except Exception as e:
+        log.warning("flag analytics failed on leave: %s", e)
+
+
+def record_chat(
+    db: Session,
+    join_code: str,
+    from_role: Optional[str],
+    from_attendee_id: Optional[str],
+    to_role: Optional[str],
+    to_attendee_id: Optional[str],
+) -> None:
+    if not FLAGS_ENABLED or from_role != "examinee" or not from_attendee_id:
+        return
+    try:
+        now = time.time()
+        flags = []
+        if to_role == "examinee":
+            pair = f"flag-dm:{join_code}:{from_attendee_id}:{to_attendee_id or ''}"
+            if shared_state.backend().add(pair, b"1", ttl=FLAG_STATE_TTL_SECONDS):
+                flags.append(
+                    _flag(
+                        EXAMINEE_DIRECT_MESSAGE,
+                        join_code,
+                        from_attendee_id,
+                        related_attendee_id=to_attendee_id,
+                        first_event_at=_utc(now),
+                        last_event_at=_utc(now),
+                    )
+                )
+        key = _state_key("chat", join_code, from_attendee_id)
+        state = _load(key, 1)
+        times = _slide(state, 1, now, FLAG_BURST_COUNT, FLAG_BURST_WINDOW_SECONDS)
+        if times:
+            flags.append(
+                _flag(
+                    MESSAGE_BURST,
+                    join_code,
+                    from_attendee_id,
+                    event_count=len(times),
+                    first_event_at=_utc(times[0]),
+                    last_event_at=_utc(now),
+                )
+            )
+        _save(key, state)
+        _emit(db, flags)
+    except Exception as e:
+        log.warning("flag analytics failed on chat log: %s", e)
+
+
+def sweep_absences(now: Optional[float] = None) -> int:
+    """Flag examinees that left through this worker and are still away; returns the count."""
+    now = now or time.time()
+    with _pending_lock:
+        due = {k: v for k, v in _pending.items() if now - v[0] >= FLAG_ABSENCE_SECONDS}
+        for k in due:
+            del _pending[k]
+    if not due:
+        return 0
+    db = SessionLocal()
+    try:
+        # Only exams in progress: everyone leaves at the end.
+        live = set(
+            db.scalars(
+                select(ScheduledMeeting.join_code).where(
+                    ScheduledMeeting.join_code.in_({code for code, _ in due}),
+                    ScheduledMeeting.status == "started",
+                    (ScheduledMeeting.scheduled_end_at.is_(None)) | (ScheduledMeeting.scheduled_end_at > _utc(now)),
+                )
+            )
+        )
+        flags = []
+        for (join_code, attendee_id), (left, external_user_id) in due.items():
+            if join_code not in live:
+                continue
+            key = _state_key("att", join_code, attendee_id)
+            state = _load(key, 4)
+            # Rejoined (possibly through another worker), or already flagged.
+            if state[_LAST_LEFT] != left or state[_LAST_JOIN] > left or state[_ABSENCE_FLAGGED] == left:
+                continue
+            state[_ABSENCE_FLAGGED] = left
+            _save(key, state)
+            flags.append(
+                _flag(
+                    LONG_ABSENCE,
+                    join_code,
+                    attendee_id,
+                    external_user_id=external_user_id,
+                    first_event_at=_utc(left),
+                    last_event_at=None,
+                )
+            )
+        _emit(db, flags)
+        return len(flags)
+    finally:
+        db.close()
+
+
+_task: Optional[asyncio.Task] = None
+
+
+async def _sweeper_loop() -> None:
+    while True:
+        await asyncio.sleep(FLAG_SWEEP_INTERVAL_SECONDS)
+        try:
+            await run_in_threadpool(sweep_absences)
+        except Exception as e:
+            log.warning("absence sweep failed: %s", e)
+
+
+def start_sweeper() -> None:
+    global _task
+    if FLAGS_ENABLED and _task is None:
+        _task = asyncio.get_running_loop().create_task(_sweeper_loop())
+
+
+async def stop_sweeper() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,294 @@
+"""Dependency probes behind GET /healthz and GET /readyz.
+
+The load balancer polls the health endpoints of every worker every few
+seconds, so they never touch a dependency themselves: one background loop
+per worker runs the probes every HEALTH_PROBE_INTERVAL_SECONDS (AWS ones
+every HEALTH_AWS_PROBE_INTERVAL_SECONDS) and the endpoints only read the
+results of the last round (the /healthz body is built once per round). A
+probe still running from the previous round is not started again, so a
+struggling database sees at most one ping per worker at a time.
+
+Probes:
+
+- database: `SELECT 1` through the worker's pool (skipped while the pool is
+  saturated, so the ping doesn't wait for a connection);
+- db_pool: checked-out connections against DB_POOL_SIZE + DB_MAX_OVERFLOW;
+  failing at HEALTH_POOL_MAX_UTILIZATION;
+- database_replica: `SELECT 1` on DATABASE_READ_URL, if configured;
+- shared_state: a read from SHARED_STATE_URL, if shared;
+- jwks: Cognito keys loaded; missing keys (startup fetch failed) and keys
+  older than JWKS_MAX_AGE_SECONDS (key rotation) are fetched here, keeping
+  the old ones if that fails. Requests only read the cached keys;
+- chime: GetMeeting on an unknown id answers (NotFound means reachable).
+
+Critical probes (database, db_pool, shared_state) fail readiness: they can
+be broken on one worker only, and the load balancer should route around it.
+The others are shared by every worker, so they only show as "degraded" in
+/healthz instead of taking every worker out at once. A result older than
+three intervals counts as failed (the probe loop is stuck). /healthz itself
+is liveness and stays 200 while the worker serves requests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from . import auth, db, metrics, shared_state
+from .aws_clients import get_chime
+from .config import env_float
+from .lifecycle import lifecycle
+from .resilience import NOT_FOUND, classify
+from .responses import dumps
+
+
+log = logging.getLogger(__name__)
+
+
+HEALTH_PROBE_INTERVAL_SECONDS = env_float("HEALTH_PROBE_INTERVAL_SECONDS", 5.0)
+HEALTH_AWS_PROBE_INTERVAL_SECONDS = env_float("HEALTH_AWS_PROBE_INTERVAL_SECONDS", 30.0)
+HEALTH_PROBE_TIMEOUT_SECONDS = env_float("HEALTH_PROBE_TIMEOUT_SECONDS", 2.0)
+HEALTH_POOL_MAX_UTILIZATION = env_float("HEALTH_POOL_MAX_UTILIZATION", 1.0)
+JWKS_MAX_AGE_SECONDS = env_float("JWKS_MAX_AGE_SECONDS", 24 * 3600.0)
+
+# A meeting id that can't exist (Chime ids are UUIDs).
+_PROBE_MEETING_ID = "00000000-0000-0000-0000-000000000000"
+_PROBE_KEY = "health:probe"
+
+
+class ProbeFailed(Exception):
+    """A probe's dependency answered, but not well enough (details kept)."""
+
+    def __init__(self, message: str, **details: Any):
+        super().__init__(message)
+        self.details = details
+
+
+@dataclass
+class Probe:
+    name: str
+    # Returns details for the report; raises when the dependency is unhealthy.
+    check: Callable[[], dict]
+    critical: bool
+    interval: float
+
+
+# --- probes (run in the threadpool) ---
+
+
+def _pool_usage(engine) -> Optional[tuple[int, int]]:
+    """(checked out, capacity) of a queue pool; None for pools without limits."""
+    checkedout = getattr(engine.pool, "checkedout", None)
+    if not callable(checkedout) or not hasattr(engine.pool, "overflow"):
+        return None
+    return checkedout(), db.DB_POOL_SIZE + db.DB_MAX_OVERFLOW
+
+
+def _ping(engine) -> dict:
+    usage = _pool_usage(engine)
+    if usage is not None and usage[0] >= usage[1]:
+        return {"skipped": "pool saturated"}
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return {}
+
+
+def check_database() -> dict:
+    return _ping(db.engine)
+
+
+def check_replica() -> dict:
+    return _ping(db.read_engine)
+
+
+def check_db_pool() -> dict:
+    usage = _pool_usage(db.engine)
+    if usage is None:
+        return {}
+    in_use, capacity = usage
+    details = {"in_use": in_use, "capacity": capacity}
+    if in_use >= capacity * HEALTH_POOL_MAX_UTILIZATION:
+        raise ProbeFailed("connection pool saturated", **details)
+    return details
+
+
+def check_shared_state() -> dict:
+    state = shared_state.backend()
+    if not state.shared:
+        return {"backend": "memory"}
+    state.get(_PROBE_KEY)
+    return {"backend": type(state).__name__}
+
+
+def check_jwks() -> dict:
+    if not auth.COGNITO_USER_POOL_ID:
+        return {"skipped": "Cognito not configured"}
+    age = auth.jwks_age_seconds()
+    refreshed = None
+    if age is None or age > JWKS_MAX_AGE_SECONDS:
+        refreshed = auth.refresh_jwks()
+        age = auth.jwks_age_seconds()
+    keys = auth.get_jwks()["keys"]
+    details = {"keys": len(keys), "age_seconds": None if age is None else round(age)}
+    if refreshed is False:
+        details["refresh"] = "failed"
+    if not keys:
+        raise ProbeFailed("no signing keys", **details)
+    return details
+
+
+def check_chime() -> dict:
+    try:
+        get_chime().get_meeting(MeetingId=_PROBE_MEETING_ID)
+    except Exception as e:
+        if classify(e) != NOT_FOUND:
+            raise
+    return {}
+
+
+def default_probes() -> list[Probe]:
+    probes = [
+        Probe("database", check_database, critical=True, interval=HEALTH_PROBE_INTERVAL_SECONDS),
+        Probe("db_pool", check_db_pool, critical=True, interval=HEALTH_PROBE_INTERVAL_SECONDS),
+        Probe("shared_state", check_shared_state, critical=True, interval=HEALTH_PROBE_INTERVAL_SECONDS),
+        Probe("jwks", check_jwks, critical=False, interval=HEALTH_AWS_PROBE_INTERVAL_SECONDS),
+        Probe("chime", check_chime, critical=False, interval=HEALTH_AWS_PROBE_INTERVAL_SECONDS),
+    ]
+    if db.read_replica_enabled():
+        probes.append(Probe("database_replica", check_replica, critical=False, interval=HEALTH_PROBE_INTERVAL_SECONDS))
+    return probes
+
+
+# --- monitor ---
+
+
+class HealthMonitor:
+    def __init__(self, probes: list[Probe]):
+        self.probes = probes
+        # name -> last result (monotonic time it was taken under "_at").
+        self.results: dict[str, dict] = {}
+        self._next_due: dict[str, float] = {}
+        self._running: set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._built_at = 0.0
+        self._health_body = b""
+        self._failing: list[str] = []
+
+    async def _run(self, probe: Probe) -> None:
+        self._running.add(probe.name)
+        started = time.perf_counter()
+        result: dict[str, Any] = {"ok": True, "critical": probe.critical}
+        work = asyncio.ensure_future(run_in_threadpool(probe.check))
+        try:
+            result.update(await asyncio.wait_for(asyncio.shield(work), HEALTH_PROBE_TIMEOUT_SECONDS))
+        except asyncio.TimeoutError:
+            result.update(ok=False, error=f"timed out after {HEALTH_PROBE_TIMEOUT_SECONDS:g}s")
+        except ProbeFailed as e:
+            result.update(e.details, ok=False, error=str(e))
+        except Exception as e:
+            result.update(ok=False, error=f"{type(e).__name__}: {e}"[:200])
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        result["checked_at"] = datetime.utcnow()
+        result["_at"] = time.monotonic()
+        self.results[probe.name] = result
+        if not result["ok"]:
+            probe_failures_total.inc(probe=probe.name)
+        if work.done():
+            self._running.discard(probe.name)
+        else:
+            # Still blocked in its thread: not started again until it returns.
+            work.add_done_callback(lambda f: self._finished(probe.name, f))
+
+    def _finished(self, name: str, work: asyncio.Future) -> None:
+        self._running.discard(name)
+        if not work.cancelled():
+            work.exception()  # already reported as a timeout
+
+    async def run_due(self, force: bool = False) -> None:
+        now = time.monotonic()
+        due = [
+            p
+            for p in self.probes
+            if p.name not in self._running and (force or now >= self._next_due.get(p.name, 0.0))
+        ]
+        for p in due:
+            self._next_due[p.name] = now + p.interval
+        if due:
+            await asyncio.gather(*(self._run(p) for p in due))
+        self._build()
+
+    def _stale(self, probe: Probe, now: float) -> bool:
+        result = self.results.get(probe.name)
+        return result is None or now - result["_at"] > 3 * max(probe.interval, HEALTH_PROBE_INTERVAL_SECONDS)
+
+    def _build(self) -> None:
+        now = time.monotonic()
+        checks = {}
+        for p in self.probes:
+            result = {k: v for k, v in self.results.get(p.name, {}).items() if k != "_at"}
+            if self._stale(p, now):
+                result.update(ok=False, critical=p.critical, error=result.get("error") or "no recent result")
+            checks[p.name] = result
+        self._failing = [name for name, r in checks.items() if r["critical"] and not r["ok"]]
+        degraded = any(not r["ok"] for r in checks.values())
+        self._health_body = dumps({"status": "degraded" if degraded else "ok", "checks": checks})
+        self._built_at = now
+
+    def _current(self) -> None:
+        # Normally rebuilt by the loop; rebuilt here only if it stopped.
+        if time.monotonic() - self._built_at > HEALTH_PROBE_INTERVAL_SECONDS:
+            self._build()
+
+    def health(self) -> bytes:
+        self._current()
+        return self._health_body
+
+    def readiness(self) -> tuple[int, dict]:
+        if not lifecycle.ready:
+            return 503, {"status": lifecycle.state}
+        self._current()
+        if self._failing:
+            return 503, {"status": "unhealthy", "failing": self._failing}
+        return 200, {"status": "ready"}
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(min(p.interval for p in self.probes))
+            try:
+                await self.run_due()
+            except Exception as e:
+                log.warning("health probes failed: %s", e)
+
+    async def start(self) -> None:
+        # One round before the worker reports ready.
+        await self.run_due(force=True)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+probe_failures_total = metrics.counter("health_probe_failures_total", "Failed dependency probes", ("probe",))
+
+monitor = HealthMonitor(default_probes())
+
+metrics.gauge(
+    "health_probe_ok",
+    "Last dependency probe result per probe (1=ok, 0=failing).",
+    ("probe",),
+    collect=lambda: {(name,): 1.0 if r.get("ok") else 0.0 for name, r in list(monitor.results.items())},
+)
@@ -0,0 +1,235 @@
+"""`Idempotency-Key` support for join / create endpoints.
+
+Clients on flaky networks retry POSTs; without this each retry creates
+another Chime attendee or scheduled meeting. For the routes in
+IDEMPOTENT_ROUTES, a request carrying `Idempotency-Key` is executed once per
+(route, key, caller) and its response is kept in a bounded TTL store; retries
+get the stored response back with `Idempotent-Replayed: true`.
+
+- A concurrent duplicate (on any worker) waits for the in-flight original and
+  then replays its response (or, if the original was not stored, runs
+  itself).
+- Reusing a key with a different request body is rejected with 422.
+- Only final outcomes are stored: 2xx and deterministic 4xx. 5xx, 408, 409
+  and 429 are not, so a retry after those runs again.
+
+Records and in-flight locks live in the shared state backend
+(app.shared_state), so a retry landing on another worker is still replayed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import re
+import time
+from typing import Optional
+
+from . import shared_state
+from .config import env_flag, env_float, env_int
+
+
+IDEMPOTENCY_ENABLED = env_flag("IDEMPOTENCY_ENABLED", True)
+IDEMPOTENCY_TTL_SECONDS = env_float("IDEMPOTENCY_TTL_SECONDS", 3600.0)
+IDEMPOTENCY_MAX_BODY_BYTES = env_int("IDEMPOTENCY_MAX_BODY_BYTES", 256 * 1024)
+# How long a duplicate waits for the in-flight original.
+IDEMPOTENCY_WAIT_SECONDS = env_float("IDEMPOTENCY_WAIT_SECONDS", 30.0)
+_POLL_SECONDS = 0.05
+
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+
+IDEMPOTENT_ROUTES = [
+    ("POST", re.compile(r"^/guest/join$")),
+    ("POST", re.compile(r"^/meetings/[^/]+/attendees$")),
+    ("POST", re.compile(r"^/scheduled-meetings$")),
+]
+
+_NOT_STORED_STATUSES = {408, 409, 429}
+# Per-request headers that must not be replayed.
+_SKIP_HEADERS = {b"content-length", b"date", b"server", b"set-cookie"}
+
+
+class StoredResponse:
+    __slots__ = ("fingerprint", "status", "headers", "body")
+
+    def __init__(self, fingerprint: str, status: int, headers: list[tuple[bytes, bytes]], body: bytes):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def dumps(self) -> bytes:
+        return json.dumps(
+            {
+                "f": self.fingerprint,
+                "s": self.status,
+                "h": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in self.headers],
+                "b": base64.b64encode(self.body).decode(),
+            }
+        ).encode()
+
+    @classmethod
+    def loads(cls, raw: bytes) -> "StoredResponse":
+        data = json.loads(raw)
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in data["h"]]
+        return cls(data["f"], data["s"], headers, base64.b64decode(data["b"]))
+
+
+class IdempotencyStore:
+    """Stored responses and in-flight locks in the shared state backend."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        raw = shared_state.backend().get(f"idem:{key}")
+        return StoredResponse.loads(raw) if raw is not None else None
+
+    def put(self, key: str, entry: StoredResponse) -> None:
+        shared_state.backend().set(f"idem:{key}", entry.dumps(), ttl=self.ttl_seconds)
+
+    def lock(self, key: str) -> bool:
+        # Expires on its own if the worker dies mid-request.
+        return shared_state.backend().add(
+            f"idem-lock:{key}", shared_state.WORKER_ID.encode(), ttl=IDEMPOTENCY_WAIT_SECONDS
+        )
+
+    def unlock(self, key: str) -> None:
+        shared_state.backend().delete(f"idem-lock:{key}")
+
+
+store = IdempotencyStore(IDEMPOTENCY_TTL_SECONDS)
+
+
+def _route_matches(method: str, path: str) -> bool:
+    return any(method == m and pattern.match(path) for m, pattern in IDEMPOTENT_ROUTES)
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope.get("headers") or []:
+        if key == name:
+            return value
+    return None
+
+
+async def _send_json(send, status: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _route_matches(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        raw_key = _header(scope, HEADER)
+        if raw_key is None:
+            await self.app(scope, receive, send)
+            return
+
+        idem_key = raw_key.decode("latin-1").strip()
+        if not idem_key or len(idem_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, "Idempotency-Key must be 1-255 characters")
+            return
+
+        # Read the whole request body (small JSON) to fingerprint it.
+        chunks = []
+        more = True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        # Keys are scoped to the caller, so one user can't replay another's response.
+        caller = hashlib.sha256(_header(scope, b"authorization") or b"").hexdigest()[:16]
+        # Hashed: fixed length for the shared state backend.
+        store_key = hashlib.sha256(f"{scope['method']} {scope['path']} {caller} {idem_key}".encode()).hexdigest()
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            entry = await shared_state.run(store.get, store_key)
+            if entry is not None:
+                if entry.fingerprint != fingerprint:
+                    await _send_json(send, 422, "Idempotency-Key was already used with a different request")
+                    return
+                await self._replay(entry, send)
+                return
+
+            if await shared_state.run(store.lock, store_key):
+                # Re-check under the lock: the original may have just finished.
+                if await shared_state.run(store.get, store_key) is None:
+                    break
+                await shared_state.run(store.unlock, store_key)
+                continue
+            # Another request with this key is in flight (possibly on another worker).
+            if time.monotonic() >= deadline:
+                await _send_json(send, 409, "A request with this Idempotency-Key is still in progress")
+                return
+            await asyncio.sleep(_POLL_SECONDS)
+
+        try:
+            await self._run_and_store(scope, body, send, store_key, fingerprint)
+        finally:
+            await shared_state.run(store.unlock, store_key)
+
+    async def _replay(self, entry: StoredResponse, send) -> None:
+        headers = list(entry.headers)
+        headers.append((b"content-length", str(len(entry.body)).encode()))
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": entry.status, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
+
+    async def _run_and_store(self, scope, body: bytes, send, store_key: str, fingerprint: str) -> None:
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Never report a disconnect mid-request to the endpoint.
+            await asyncio.Event().wait()
+
+        status = 500
+        headers: list[tuple[bytes, bytes]] = []
+        response_chunks: list[bytes] = []
+        size = 0
+        storable = True
+
+        async def send_wrapper(message):
+            nonlocal status, headers, size, storable
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [(k, v) for k, v in message.get("headers") or [] if k.lower() not in _SKIP_HEADERS]
+            elif message["type"] == "http.response.body" and storable:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > IDEMPOTENCY_MAX_BODY_BYTES:
+                    storable = False
+                    response_chunks.clear()
+                else:
+                    response_chunks.append(chunk)
+            await send(message)
+
+        await self.app(scope, replay_receive, send_wrapper)
+
+        if storable and status < 500 and status not in _NOT_STORED_STATUSES:
+            entry = StoredResponse(fingerprint, status, headers, b"".join(response_chunks))
+            await shared_state.run(store.put, store_key, entry)
@@ -0,0 +1,161 @@
+"""Startup / shutdown of the worker's components (the FastAPI lifespan).
+
+main.py registers every component that needs starting or stopping (the
+database, shared state, AWS clients, cache warmers, background loops, the
+report pool) with the components it uses:
+
+    lifecycle.register("archiver", start=start_archiver, stop=stop_archiver, after=("database",))
+
+Startup runs the `start` hooks in dependency order (registration order
+among independent ones) and only then marks the worker ready; shutdown first
+marks it not ready, then runs the `stop` hooks in reverse order, so a loop
+stops before the pool it writes through is disposed. A hook may be sync or
+return an awaitable; blocking hooks are wrapped in `run_in_threadpool` at
+registration, since the event loop keeps serving while they run.
+
+Shutdown has one deadline, SHUTDOWN_TIMEOUT_SECONDS (keep it below the
+process manager's grace period, e.g. gunicorn's graceful_timeout). Each
+`stop` hook gets the time left (`remaining()`, for hooks that drain a
+queue); a hook that overruns or fails is logged and the next one still runs.
+If a `start` hook fails, the components already started are stopped and the
+error is raised, so the worker exits instead of serving half started.
+
+Liveness and readiness are separate (GET /healthz, GET /readyz): the process
+is alive as soon as it serves requests, but ready only between a complete
+startup and the beginning of shutdown.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from .config import env_float
+
+
+log = logging.getLogger(__name__)
+
+
+SHUTDOWN_TIMEOUT_SECONDS = env_float("SHUTDOWN_TIMEOUT_SECONDS", 20.0)
+
+STARTING = "starting"
+READY = "ready"
+STOPPING = "stopping"
+STOPPED = "stopped"
+
+
+@dataclass
+class Component:
+    name: str
+    start: Optional[Callable[[], Any]] = None
+    stop: Optional[Callable[[], Any]] = None
+    after: tuple[str, ...] = ()
+
+
+async def _call(hook: Callable[[], Any]) -> None:
+    result = hook()
+    if inspect.isawaitable(result):
+        await result
+
+
+class Lifecycle:
+    def __init__(self, shutdown_timeout: float = SHUTDOWN_TIMEOUT_SECONDS):
+        self.shutdown_timeout = shutdown_timeout
+        self.state = STARTING
+        self._components: dict[str, Component] = {}
+        self._started: list[Component] = []
+        self._deadline: Optional[float] = None
+
+    def register(
+        self,
+        name: str,
+        *,
+        start: Optional[Callable[[], Any]] = None,
+        stop: Optional[Callable[[], Any]] = None,
+        after: tuple[str, ...] = (),
+    ) -> None:
+        if name in self._components:
+            raise ValueError(f"Component {name!r} is already registered")
+        self._components[name] = Component(name, start, stop, tuple(after))
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def remaining(self) -> float:
+        """Seconds left until the shutdown deadline (the full timeout before shutdown)."""
+        if self._deadline is None:
+            return self.shutdown_timeout
+        return max(0.0, self._deadline - time.monotonic())
+
+    def order(self) -> list[Component]:
+        """Components in start order: each after everything in its `after`."""
+        ordered: list[Component] = []
+        visiting: set[str] = set()
+        done: set[str] = set()
+
+        def visit(component: Component) -> None:
+            if component.name in done:
+                return
+            if component.name in visiting:
+                raise RuntimeError(f"Component dependency cycle at {component.name!r}")
+            visiting.add(component.name)
+            for dep in component.after:
+                if dep not in self._components:
+                    raise RuntimeError(f"Component {component.name!r} needs unknown component {dep!r}")
+                visit(self._components[dep])
+            visiting.discard(component.name)
+            done.add(component.name)
+            ordered.append(component)
+
+        for component in self._components.values():
+            visit(component)
+        return ordered
+
+    async def startup(self) -> None:
+        self.state = STARTING
+        self._deadline = None
+        started_at = time.perf_counter()
+        for component in self.order():
+            if component.start is not None:
+                try:
+                    await _call(component.start)
+                except BaseException:
+                    log.error("startup of %s failed; stopping the started components", component.name)
+                    await self.shutdown()
+                    raise
+            self._started.append(component)
+        self.state = READY
+        log.info("Started %d components in %.2fs", len(self._started), time.perf_counter() - started_at)
+
+    async def shutdown(self) -> None:
+        self.state = STOPPING
+        self._deadline = time.monotonic() + self.shutdown_timeout
+        while self._started:
+            component = self._started.pop()
+            if component.stop is None:
+                continue
+            try:
+                # At least a moment, so a late hook can still release what it holds.
+                await asyncio.wait_for(_call(component.stop), timeout=max(self.remaining(), 0.1))
+            except asyncio.TimeoutError:
+                log.warning("stopping %s exceeded the shutdown deadline", component.name)
+            except Exception as e:
+                log.warning("stopping %s failed: %s", component.name, e)
+        self.state = STOPPED
+
+    @asynccontextmanager
+    async def lifespan(self, app):
+        await self.startup()
+        try:
+            yield
+        finally:
+            await self.shutdown()
+
+
+lifecycle = Lifecycle()
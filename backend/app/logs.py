@@ -0,0 +1,266 @@
+"""Structured (JSON lines) logging, request ids and the access log.
+
+Every record is one JSON object per line on stderr:
+
+    {"ts":"2026-10-19T09:00:00.123Z","level":"info","logger":"app.access","msg":"request",
+     "request_id":"9f2c...","method":"POST","route":"/scheduled-meetings/{join_code}/start",
+     "status":200,"duration_ms":41.7}
+
+Modules log through the standard library (`logging.getLogger(__name__)`,
+extra fields with `extra={...}`). Records go through a bounded queue to one
+listener thread per worker that formats and writes them, so a slow stderr
+(a blocked pipe, a stalled log shipper) never blocks a request thread or
+the event loop. When the queue is full, records are dropped and counted
+(log_records_dropped_total) instead.
+
+Request ids: RequestLogMiddleware takes X-Request-ID from the request (load
+balancer / frontend) or generates one, returns it as a response header and
+keeps it in a context variable for the request. Every record logged while
+the request runs carries it, including from the threadpool (dependencies
+and sync endpoints run in a copy of the request's context); endpoints and
+dependencies can also read it with `Depends(get_request_id)`.
+
+The access log has one record per request. /chat-logs, /attendance/* and
+the health / metrics polls make up most of the traffic and are sampled at
+LOG_ACCESS_HIGH_VOLUME_SAMPLE_RATE, other routes at LOG_ACCESS_SAMPLE_RATE;
+server errors and requests slower than LOG_SLOW_REQUEST_SECONDS are always
+logged. Sampled records carry their `sample_rate`.
+
+`configure_logging()` installs the handler (main.py, at import); the
+"logging" lifecycle component starts the listener thread (after fork) and
+drains the queue at shutdown. CLIs (`python -m app.…`) log synchronously
+with `configure_logging(background=False)`.
+"""
+
+from __future__ import annotations
+
+import copy
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from . import metrics
+from .config import env_flag, env_float, env_int
+from .responses import dumps
+
+
+LOG_LEVEL = (os.getenv("LOG_LEVEL") or "INFO").strip().upper()
+LOG_QUEUE_SIZE = max(1, env_int("LOG_QUEUE_SIZE", 10000))
+LOG_ACCESS_ENABLED = env_flag("LOG_ACCESS_ENABLED", True)
+LOG_ACCESS_SAMPLE_RATE = env_float("LOG_ACCESS_SAMPLE_RATE", 1.0)
+LOG_ACCESS_HIGH_VOLUME_SAMPLE_RATE = env_float("LOG_ACCESS_HIGH_VOLUME_SAMPLE_RATE", 0.05)
+LOG_SLOW_REQUEST_SECONDS = env_float("LOG_SLOW_REQUEST_SECONDS", 1.0)
+
+# Route templates sampled at the high-volume rate (prefix match).
+HIGH_VOLUME_ROUTES = ("/chat-logs", "/attendance/", "/healthz", "/readyz", "/metrics")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Accepted from clients as is; anything else is replaced by a generated id.
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# LogRecord attributes; everything else on a record is an `extra` field.
+_STANDARD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+access_log = logging.getLogger("app.access")
+
+records_dropped_total = metrics.counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full"
+)
+
+
+def get_request_id() -> Optional[str]:
+    """The current request's id (also usable as `Depends(get_request_id)`)."""
+    return _request_id.get()
+
+
+def set_request_id(value: Optional[str]):
+    """Bind a request id outside a request (jobs, CLIs); returns the reset token."""
+    return _request_id.set(value)
+
+
+def reset_request_id(token) -> None:
+    _request_id.reset(token)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None) or _request_id.get()
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key != "request_id" and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        try:
+            return dumps(entry).decode("utf-8")
+        except TypeError:
+            # An `extra` value JSON can't represent: logged as its repr.
+            entry = {k: v if isinstance(v, (str, int, float, bool, type(None))) else repr(v) for k, v in entry.items()}
+            return dumps(entry).decode("utf-8")
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve everything that depends on the caller (message arguments,
+        # the exception, the request id) before the record changes threads.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _formatter.formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = _request_id.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            records_dropped_total.inc()
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Behind whatever is queued (waits for room instead of failing when full).
+        self.queue.put(self._sentinel)
+
+
+_formatter = JsonFormatter()
+_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(LOG_QUEUE_SIZE)
+_listener: Optional[_Listener] = None
+_configured = False
+
+
+def _stream_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(_formatter)
+    return handler
+
+
+def configure_logging(background: bool = True) -> None:
+    """Route the root logger to JSON lines on stderr (idempotent).
+
+    With `background`, records are queued until `start_listener()` runs.
+    """
+    global _configured
+    if _configured:
+        return
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DroppingQueueHandler(_queue) if background else _stream_handler())
+    _configured = True
+
+
+def start_listener() -> None:
+    global _listener
+    if _listener is None:
+        _listener = _Listener(_queue, _stream_handler())
+        _listener.start()
+
+
+def stop_listener() -> None:
+    """Write what is queued and stop the thread (shutdown)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+metrics.gauge(
+    "log_queue_depth",
+    "Log records waiting for the log writer thread.",
+    collect=lambda: {(): float(_queue.qsize())},
+)
+
+
+# --- access log ---
+
+
+def _sample_rate(route: str) -> float:
+    if route.startswith(HIGH_VOLUME_ROUTES):
+        return LOG_ACCESS_HIGH_VOLUME_SAMPLE_RATE
+    return LOG_ACCESS_SAMPLE_RATE
+
+
+class RequestLogMiddleware:
+    """Binds the request id and writes the (sampled) access log.
+
+    Outermost, so the id is set for every other middleware and the logged
+    duration covers the whole request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers") or ():
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not _REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+        token = _request_id.set(request_id)
+        header = (b"x-request-id", request_id.encode("latin-1"))
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = dict(message, headers=[*message.get("headers", ()), header])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if LOG_ACCESS_ENABLED:
+                self._log(scope, status["code"], time.perf_counter() - started)
+            _request_id.reset(token)
+
+    @staticmethod
+    def _log(scope, status: int, elapsed: float) -> None:
+        route = scope.get("route")
+        template = getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+        rate = 1.0
+        if status < 500 and elapsed < LOG_SLOW_REQUEST_SECONDS:
+            rate = _sample_rate(template)
+            if rate <= 0.0 or (rate < 1.0 and random.random() >= rate):
+                return
+        fields = {
+            "method": scope.get("method", ""),
+            "path": scope.get("path", ""),
+            "route": template,
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 1),
+        }
+        if rate < 1.0:
+            fields["sample_rate"] = rate
+        access_log.log(logging.WARNING if status >= 500 else logging.INFO, "request", extra=fields)
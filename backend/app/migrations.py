@@ -0,0 +1,322 @@
+"""Versioned schema migrations.
+
+Replaces the old "probe information_schema on every boot" init_db:
+
+- Applied versions are recorded in `schema_version`.
+- Startup fast path is a single `SELECT MAX(version)`.
+- Only one process migrates at a time (DB advisory lock); others wait and
+  then see the new version.
+
+Every migration must be idempotent: a fresh database gets all tables from
+`create_all` in version 1, and existing (pre-versioning) databases may
+already have some of the changes applied by hand or by the old init_db.
+
+Run manually (e.g. as a deploy step) with: `python -m app.migrations`
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from .config import env_int
+from .db import Base
+
+
+log = logging.getLogger(__name__)
+
+
+MIGRATION_LOCK_NAME = "exam_surveillance.schema_migrate"
+MIGRATION_LOCK_TIMEOUT_SECONDS = env_int("DB_MIGRATION_LOCK_TIMEOUT_SECONDS", 120)
+
+_meta = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    _meta,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False, server_default=func.now()),
+)
+
+
+# --- helpers ---
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _indexes(conn: Connection, table: str) -> set[str]:
+    return {ix["name"] for ix in inspect(conn).get_indexes(table)}
+
+
+def _add_column(conn: Connection, table: str, name: str, ddl: str) -> None:
+    if name not in _columns(conn, table):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def _create_index(conn: Connection, table: str, name: str, columns: str) -> None:
+    if name not in _indexes(conn, table):
+        conn.execute(text(f"CREATE INDEX {name} ON {table} ({columns})"))
+
+
+def _drop_indexes(conn: Connection, table: str, names: list[str]) -> None:
+    existing = [name for name in names if name in _indexes(conn, table)]
+    if not existing:
+        return
+    if conn.dialect.name == "mysql":
+        # One ALTER: InnoDB drops secondary indexes in place, as a metadata change.
+        conn.execute(text(f"ALTER TABLE {table} " + ", ".join(f"DROP INDEX {name}" for name in existing)))
+    else:
+        for name in existing:
+            conn.execute(text(f"DROP INDEX {name}"))
+
+
+def _rename_or_add_column(conn: Connection, table: str, old: str, new: str, ddl: str) -> None:
+    existing = _columns(conn, table)
+    if new in existing:
+        return
+    if old in existing:
+        try:
+            conn.execute(text(f"ALTER TABLE {table} RENAME COLUMN {old} TO {new}"))
+            return
+        except Exception:
+            pass
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {new} {ddl}"))
+
+
+# --- migrations ---
+
+
+def _m001_baseline(conn: Connection) -> None:
+    # Import models so Base.metadata is populated
+    from . import models  # noqa: F401
+
+    Base.metadata.create_all(bind=conn)
+
+    # Legacy column names from before the users table was renamed.
+    _rename_or_add_column(conn, "users", "username", "email", "VARCHAR(255) NULL")
+    _rename_or_add_column(conn, "users", "display_name", "user_name", "VARCHAR(255) NULL")
+    _add_column(conn, "users", "class_name", "VARCHAR(255) NULL")
+    _add_column(conn, "scheduled_meetings", "teacher_name", "VARCHAR(255) NULL")
+
+
+def _m002_users_list_indexes(conn: Connection) -> None:
+    # Back the paginated/filtered/prefix-searched GET /users.
+    _create_index(conn, "users", "ix_users_user_name", "user_name")
+    _create_index(conn, "users", "ix_users_class_name", "class_name")
+    _create_index(conn, "users", "ix_users_role_id", "role, id")
+
+
+def _m003_class_rosters(conn: Connection) -> None:
+    _add_column(conn, "meeting_attendance_sessions", "user_id", "INTEGER NULL")
+    _create_index(
+        conn,
+        "meeting_attendance_sessions",
+        "ix_meeting_attendance_sessions_join_code_user_id_left_at",
+        "join_code, user_id, left_at",
+    )
+
+    # Backfill normalized classes/memberships from users.class_name.
+    if conn.execute(text("SELECT 1 FROM classes LIMIT 1")).first() is None:
+        conn.execute(
+            text(
+                """
+                INSERT INTO classes (name)
+                SELECT DISTINCT class_name
+                FROM users
+                WHERE role = 'examinee' AND class_name IS NOT NULL AND class_name <> ''
+                """
+            )
+        )
+        conn.execute(
+            text(
+                """
+                INSERT INTO user_class_memberships (user_id, class_id)
+                SELECT u.id, c.id
+                FROM users u
+                JOIN classes c ON c.name = u.class_name
+                WHERE u.role = 'examinee'
+                """
+            )
+        )
+
+
+def _m004_archived_meetings(conn: Connection) -> None:
+    from .models import ArchivedMeeting
+
+    ArchivedMeeting.__table__.create(bind=conn, checkfirst=True)
+
+
+# Single-column indexes from the original models (`index=True`). No query
+# filters on most of these columns, yet every chat / attendance insert updated
+# all of them.
+_UNUSED_LOG_INDEXES = {
+    "meeting_chat_logs": [
+        # join_code / message_id: covered by uq_meeting_chat_logs_join_code_message_id
+        "ix_meeting_chat_logs_join_code",
+        "ix_meeting_chat_logs_message_id",
+        "ix_meeting_chat_logs_msg_type",
+        "ix_meeting_chat_logs_from_role",
+        "ix_meeting_chat_logs_from_attendee_id",
+        "ix_meeting_chat_logs_to_role",
+        "ix_meeting_chat_logs_to_attendee_id",
+    ],
+    "meeting_attendance_sessions": [
+        # join_code: covered by the (join_code, ...) composite indexes
+        "ix_meeting_attendance_sessions_join_code",
+        "ix_meeting_attendance_sessions_chime_meeting_id",
+        "ix_meeting_attendance_sessions_attendee_id",
+        "ix_meeting_attendance_sessions_external_user_id",
+        "ix_meeting_attendance_sessions_role",
+    ],
+}
+
+
+def _m005_trim_log_indexes(conn: Connection) -> None:
+    # Create the replacement first, so join/leave lookups always have an index.
+    _create_index(
+        conn,
+        "meeting_attendance_sessions",
+        "ix_meeting_attendance_sessions_join_code_attendee_id_left_at",
+        "join_code, attendee_id, left_at",
+    )
+    for table, names in _UNUSED_LOG_INDEXES.items():
+        _drop_indexes(conn, table, names)
+
+
+def _m006_chat_log_fulltext(conn: Connection) -> None:
+    # GET /chat-logs/search on MySQL (app/chat_search.py); other databases
+    # search through an in-process bigram index instead.
+    if conn.dialect.name != "mysql":
+        return
+    from .chat_search import FULLTEXT_INDEX
+
+    if FULLTEXT_INDEX in _indexes(conn, "meeting_chat_logs"):
+        return
+    # Read at index creation: otherwise bigrams such as "in" / "at" (InnoDB's
+    # default stopwords) are not indexed and English phrases stop matching.
+    conn.execute(text("SET SESSION innodb_ft_enable_stopword = 0"))
+    conn.execute(text(f"ALTER TABLE meeting_chat_logs ADD FULLTEXT INDEX {FULLTEXT_INDEX} (text) WITH PARSER ngram"))
+
+
+def _m007_meeting_flags(conn: Connection) -> None:
+    from .models import MeetingFlag
+
+    MeetingFlag.__table__.create(bind=conn, checkfirst=True)
+
+
+def _m008_report_jobs(conn: Connection) -> None:
+    from .models import ReportJob
+
+    ReportJob.__table__.create(bind=conn, checkfirst=True)
+
+
+def _m009_audit_events(conn: Connection) -> None:
+    from .models import AuditEvent
+
+    AuditEvent.__table__.create(bind=conn, checkfirst=True)
+
+
+def _m010_scheduled_meetings_chime_meeting_id(conn: Connection) -> None:
+    # Attendee gate lookups that miss the per-worker map (app.chime_client.meeting_status).
+    _create_index(conn, "scheduled_meetings", "ix_scheduled_meetings_chime_meeting_id", "chime_meeting_id")
+
+
+# Append only. Never renumber or edit an applied migration.
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline tables and legacy column renames", _m001_baseline),
+    (2, "users list indexes", _m002_users_list_indexes),
+    (3, "class rosters and attendance user_id", _m003_class_rosters),
+    (4, "archived meetings index", _m004_archived_meetings),
+    (5, "trim chat log / attendance indexes", _m005_trim_log_indexes),
+    (6, "chat log full-text index", _m006_chat_log_fulltext),
+    (7, "meeting flags", _m007_meeting_flags),
+    (8, "report jobs", _m008_report_jobs),
+    (9, "audit events", _m009_audit_events),
+    (10, "scheduled meetings chime_meeting_id index", _m010_scheduled_meetings_chime_meeting_id),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# --- runner ---
+
+
+def current_version(conn: Connection) -> int:
+    return int(conn.execute(select(func.max(schema_version.c.version))).scalar() or 0)
+
+
+@contextmanager
+def _migration_lock(conn: Connection) -> Iterator[None]:
+    """Cross-process advisory lock (session-scoped; held by `conn`)."""
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        got = conn.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"),
+            {"name": MIGRATION_LOCK_NAME, "timeout": MIGRATION_LOCK_TIMEOUT_SECONDS},
+        ).scalar()
+        if got != 1:
+            raise RuntimeError("Timed out waiting for schema migration lock")
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK_NAME})
+    elif dialect == "postgresql":
+        conn.execute(text("SELECT pg_advisory_lock(hashtext(:name))"), {"name": MIGRATION_LOCK_NAME})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": MIGRATION_LOCK_NAME})
+    else:
+        # SQLite (dev/bench): single-host; writers are serialized by the file lock.
+        yield
+
+
+def migrate(engine: Engine) -> int:
+    """Apply pending migrations; returns the resulting schema version."""
+    # Fast path: one round trip when the schema is already current.
+    try:
+        with engine.connect() as conn:
+            if current_version(conn) >= LATEST_VERSION:
+                return LATEST_VERSION
+    except Exception:
+        # schema_version does not exist yet (fresh or pre-versioning DB).
+        pass
+
+    with engine.connect() as lock_conn:
+        with _migration_lock(lock_conn):
+            with engine.begin() as conn:
+                _meta.create_all(bind=conn)
+
+            # Re-check under the lock: another worker may have just finished.
+            with engine.connect() as conn:
+                version = current_version(conn)
+
+            for number, description, apply in MIGRATIONS:
+                if number <= version:
+                    continue
+                started = time.perf_counter()
+                with engine.begin() as conn:
+                    apply(conn)
+                    conn.execute(schema_version.insert().values(version=number, description=description))
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                log.info("Applied schema migration %03d (%s) in %.0f ms", number, description, elapsed_ms)
+                version = number
+
+    return version
+
+
+if __name__ == "__main__":
+    from .db import engine
+    from .logs import configure_logging
+
+    configure_logging(background=False)
+
+    print(f"Schema version: {migrate(engine)}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, UniqueConstraint, func
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint, func
 
 from .db import Base
 
@@ -6,12 +6,17 @@ from .db import Base
 class User(Base):
     __tablename__ = "users"
 
+    __table_args__ = (
+        # Keyset pagination filtered by role: WHERE role = ? AND id > ? ORDER BY id
+        Index("ix_users_role_id", "role", "id"),
+    )
+
     id = Column(Integer, primary_key=True, autoincrement=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
     role = Column(String(32), nullable=False, default="examinee")  # 'proctor' | 'examinee'
     # Display profile fields (used for UI/tile labels)
-    user_name = Column(String(255), nullable=True)
-    class_name = Column(String(255), nullable=True)
+    user_name = Column(String(255), index=True, nullable=True)
+    class_name = Column(String(255), index=True, nullable=True)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
 
@@ -34,7 +39,8 @@ class ScheduledMeeting(Base):
     scheduled_end_at = Column(DateTime, nullable=True)
 
     region = Column(String(32), nullable=False, default="us-east-1")
-    chime_meeting_id = Column(String(128), nullable=True)
+    # POST /meetings/{meeting_id}/attendees gate (app.chime_client.meeting_status)
+    chime_meeting_id = Column(String(128), index=True, nullable=True)
 
     # scheduled | started | ended
     status = Column(String(32), nullable=False, default="scheduled")
@@ -43,25 +49,72 @@ class ScheduledMeeting(Base):
     updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
 
 
+class ExamClass(Base):
+    """Normalized class/roster (users.class_name is kept as the display copy)."""
+
+    __tablename__ = "classes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(255), unique=True, index=True, nullable=False)
+
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class UserClassMembership(Base):
+    __tablename__ = "user_class_memberships"
+
+    __table_args__ = (
+        # Roster expansion: class -> users
+        Index("ix_user_class_memberships_class_id_user_id", "class_id", "user_id"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    class_id = Column(Integer, ForeignKey("classes.id", ondelete="CASCADE"), primary_key=True)
+
+
+class ScheduledMeetingClass(Base):
+    """Optional link: which classes are expected to attend a scheduled meeting."""
+
+    __tablename__ = "scheduled_meeting_classes"
+
+    scheduled_meeting_id = Column(
+        Integer, ForeignKey("scheduled_meetings.id", ondelete="CASCADE"), primary_key=True
+    )
+    class_id = Column(Integer, ForeignKey("classes.id", ondelete="CASCADE"), primary_key=True)
+
+
 class MeetingAttendanceSession(Base):
     __tablename__ = "meeting_attendance_sessions"
 
+    __table_args__ = (
+        # Roster status: LEFT JOIN on (join_code, user_id) filtered by open sessions
+        Index("ix_meeting_attendance_sessions_join_code_user_id_left_at", "join_code", "user_id", "left_at"),
+        # Join / leave: the attendee's open session in a meeting. Its join_code
+        # prefix also serves GET /attendance/{join_code} and archival.
+        Index(
+            "ix_meeting_attendance_sessions_join_code_attendee_id_left_at", "join_code", "attendee_id", "left_at"
+        ),
+    )
+
     id = Column(Integer, primary_key=True, autoincrement=True)
 
     # External meeting join code (ScheduledMeeting.join_code) or legacy external meeting id
-    join_code = Column(String(64), index=True, nullable=False)
+    join_code = Column(String(64), nullable=False)
 
     # Chime MeetingId (not stable across recreations; stored for reference)
-    chime_meeting_id = Column(String(128), index=True, nullable=True)
+    chime_meeting_id = Column(String(128), nullable=True)
 
     # Chime AttendeeId (unique per join)
-    attendee_id = Column(String(128), index=True, nullable=False)
+    attendee_id = Column(String(128), nullable=False)
 
     # Chime ExternalUserId (contains display name token)
-    external_user_id = Column(String(512), index=True, nullable=True)
+    external_user_id = Column(String(512), nullable=True)
+
+    # Authenticated app user, when the client sent a valid token (roster matching)
+    user_id = Column(Integer, nullable=True)
 
     # 'examinee' | 'proctor' (MVP: record what client reports)
-    role = Column(String(32), index=True, nullable=False, default="examinee")
+    role = Column(String(32), nullable=False, default="examinee")
 
     joined_at = Column(DateTime, nullable=False, server_default=func.now())
     left_at = Column(DateTime, nullable=True)
@@ -75,20 +128,22 @@ class MeetingChatLog(Base):
     __tablename__ = "meeting_chat_logs"
 
     __table_args__ = (
+        # The only index: idempotent inserts, and its join_code prefix serves
+        # GET /chat-logs/{join_code} and archival. Inserts are the hot path.
         UniqueConstraint("join_code", "message_id", name="uq_meeting_chat_logs_join_code_message_id"),
     )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
 
-    join_code = Column(String(64), index=True, nullable=False)
-    message_id = Column(String(128), index=True, nullable=False)
+    join_code = Column(String(64), nullable=False)
+    message_id = Column(String(128), nullable=False)
 
     # Message metadata (aligned with Chime DataMessage payload)
-    msg_type = Column(String(32), index=True, nullable=True)  # 'broadcast' | 'direct'
-    from_role = Column(String(32), index=True, nullable=True)  # 'proctor' | 'examinee'
-    from_attendee_id = Column(String(128), index=True, nullable=True)
-    to_role = Column(String(32), index=True, nullable=True)  # 'all' | 'proctor' | 'examinee'
-    to_attendee_id = Column(String(128), index=True, nullable=True)
+    msg_type = Column(String(32), nullable=True)  # 'broadcast' | 'direct'
+    from_role = Column(String(32), nullable=True)  # 'proctor' | 'examinee'
+    from_attendee_id = Column(String(128), nullable=True)
+    to_role = Column(String(32), nullable=True)  # 'all' | 'proctor' | 'examinee'
+    to_attendee_id = Column(String(128), nullable=True)
 
     text = Column(String(4096), nullable=False)
 
@@ -96,3 +151,120 @@ class MeetingChatLog(Base):
     sent_at = Column(DateTime, nullable=True)
 
     created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class ArchivedMeeting(Base):
+    """Chat logs / attendance of an ended meeting moved to archive files (app/archive.py)."""
+
+    __tablename__ = "archived_meetings"
+
+    join_code = Column(String(64), primary_key=True)
+
+    # Archive partition (YYYY-MM of the meeting), part of the file paths
+    month = Column(String(7), nullable=False)
+
+    # Rows up to these ids are in the files (later stragglers stay in the tables)
+    chat_log_rows = Column(Integer, nullable=False, default=0)
+    chat_log_max_id = Column(Integer, nullable=False, default=0)
+    attendance_rows = Column(Integer, nullable=False, default=0)
+    attendance_max_id = Column(Integer, nullable=False, default=0)
+
+    archived_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class MeetingFlag(Base):
+    """Suspicious-activity flag raised from the attendance / chat write paths (app/flags.py)."""
+
+    __tablename__ = "meeting_flags"
+
+    __table_args__ = (
+        # GET /scheduled-meetings/{join_code}/flags: WHERE join_code = ? [AND id > ?] ORDER BY id
+        Index("ix_meeting_flags_join_code_id", "join_code", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    join_code = Column(String(64), nullable=False)
+
+    # 'repeated_disconnects' | 'long_absence' | 'examinee_direct_message' | 'message_burst'
+    kind = Column(String(32), nullable=False)
+
+    # The flagged examinee
+    attendee_id = Column(String(128), nullable=False)
+    external_user_id = Column(String(512), nullable=True)
+    # The other examinee of a direct message
+    related_attendee_id = Column(String(128), nullable=True)
+
+    # Events behind the flag: how many, and the span they cover. last_event_at
+    # is null for an absence that was still ongoing when flagged.
+    event_count = Column(Integer, nullable=False, default=1)
+    first_event_at = Column(DateTime, nullable=False)
+    last_event_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class ReportJob(Base):
+    """Post-exam report generation job and its artifacts (app/reports.py)."""
+
+    __tablename__ = "report_jobs"
+
+    __table_args__ = (
+        # Latest job of a meeting (cache lookup): WHERE join_code = ? ORDER BY created_at DESC
+        Index("ix_report_jobs_join_code_created_at", "join_code", "created_at"),
+    )
+
+    id = Column(String(32), primary_key=True)
+
+    join_code = Column(String(64), nullable=False)
+
+    # queued | running | done | failed
+    status = Column(String(16), nullable=False, default="queued")
+
+    # Data versions the report was built from; a done job with the current
+    # fingerprint is served instead of building again.
+    fingerprint = Column(String(255), nullable=False)
+
+    requested_by_user_id = Column(Integer, nullable=True)
+
+    # 'local' (REPORTS_DIR) | 's3' (REPORTS_S3_BUCKET), and artifact sizes
+    storage = Column(String(8), nullable=True)
+    json_bytes = Column(Integer, nullable=True)
+    zip_bytes = Column(Integer, nullable=True)
+    error = Column(String(1024), nullable=True)
+
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class AuditEvent(Base):
+    """Proctor action (meeting / user changes), appended in batches by app/audit.py."""
+
+    __tablename__ = "audit_events"
+
+    __table_args__ = (
+        # History of one exam / user: WHERE target_type = ? AND target_id = ? ORDER BY id
+        Index("ix_audit_events_target", "target_type", "target_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    # When the action happened (not when the batch was written)
+    created_at = Column(DateTime, nullable=False)
+
+    # Who: the proctor's email and users.id
+    actor = Column(String(255), nullable=False)
+    actor_user_id = Column(Integer, nullable=True)
+
+    # e.g. 'scheduled_meeting.start', 'user.role_change'
+    action = Column(String(64), nullable=False)
+    # 'scheduled_meeting' (join code) | 'user' (email)
+    target_type = Column(String(32), nullable=False)
+    target_id = Column(String(255), nullable=False)
+
+    # JSON object with the action's specifics (changed fields, ...)
+    details = Column(String(4096), nullable=True)
+
+    # X-Request-ID of the request that did it (matches the access / app logs)
+    request_id = Column(String(64), nullable=True)
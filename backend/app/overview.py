@@ -0,0 +1,291 @@
+"""Live stats of all started exams for GET /overview.
+
+A head proctor's dashboard polls one call for every room, so nothing here
+scans the log tables per request. The write paths maintain per-meeting
+counters in the shared state backend (same for every worker):
+
+- `overview:joins:{join_code}` / `overview:leaves:{join_code}`: examinee
+  sessions opened / closed (counters only go up; live = joins - leaves);
+- `overview:flags:{join_code}`: flags raised (app.flags);
+- `overview:last-chat:{join_code}`: time of the latest chat message.
+
+Per request that is one batched counter read plus one get per room. The list
+of started meetings and their expected (roster) counts is cached per worker
+and refreshed when the scheduled-meeting or user versions (app.conditional)
+change.
+
+Counters can drift from the tables (the in-process backend starts from zero
+after a restart, a crashed request may write without counting). Every
+OVERVIEW_RECONCILE_SECONDS one request re-counts open sessions and flags of
+the started meetings (two grouped queries) and keeps the difference as a
+per-meeting correction.
+
+A difference can also be a write in flight: the write paths commit first
+and count afterwards, and the counters are read apart from the queries. So
+a meeting whose counters moved while it was re-counted is skipped, and a new
+difference is only applied once the next reconcile (after
+_CONFIRM_SECONDS) measures the same one; a join storm's in-flight joins
+don't agree twice. After the counters were lost (a new epoch, or the
+in-process backend of a restarted worker) differences are applied at once:
+the raw counters are known to be wrong then.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import shared_state
+from .conditional import SCHEDULED_MEETINGS, USERS, versions
+from .config import env_float
+from .models import (
+    MeetingAttendanceSession,
+    MeetingChatLog,
+    MeetingFlag,
+    ScheduledMeeting,
+    ScheduledMeetingClass,
+    UserClassMembership,
+)
+
+
+log = logging.getLogger(__name__)
+
+
+OVERVIEW_RECONCILE_SECONDS = env_float("OVERVIEW_RECONCILE_SECONDS", 300.0)
+# Delay of the reconcile that confirms (or drops) an unconfirmed difference.
+_CONFIRM_SECONDS = min(5.0, OVERVIEW_RECONCILE_SECONDS)
+# Last-chat times outlive any exam.
+_LAST_CHAT_TTL_SECONDS = 24 * 3600.0
+# Stored last-chat value of a meeting without messages.
+_NO_CHAT = b"-"
+
+
+def _joins(join_code: str) -> str:
+    return f"overview:joins:{join_code}"
+
+
+def _leaves(join_code: str) -> str:
+    return f"overview:leaves:{join_code}"
+
+
+def _flags(join_code: str) -> str:
+    return f"overview:flags:{join_code}"
+
+
+def _last_chat(join_code: str) -> str:
+    return f"overview:last-chat:{join_code}"
+
+
+# --- write side (after commit; never fails the write) ---
+
+
+def record_join(join_code: str, role: str) -> None:
+    if role == "examinee":
+        _safe(shared_state.backend().incr, _joins(join_code))
+
+
+def record_leave(join_code: str, role: str) -> None:
+    if role == "examinee":
+        _safe(shared_state.backend().incr, _leaves(join_code))
+
+
+def record_flags(join_code: str, count: int) -> None:
+    for _ in range(count):
+        _safe(shared_state.backend().incr, _flags(join_code))
+
+
+def record_chat(join_code: str, at: Optional[datetime] = None) -> None:
+    at = at or datetime.utcnow()
+    _safe(shared_state.backend().set, _last_chat(join_code), at.isoformat().encode(), _LAST_CHAT_TTL_SECONDS)
+
+
+def _safe(fn, *args) -> None:
+    try:
+        fn(*args)
+    except Exception as e:
+        log.warning("overview counter update failed: %s", e)
+
+
+# --- read side ---
+
+
+class Overview:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Started meetings (with expected counts), and the versions they were read at.
+        self._meetings: list[dict] = []
+        self._meetings_version: Optional[tuple] = None
+        # join_code -> (live correction, flag correction)
+        self._corrections: dict[str, tuple[int, int]] = {}
+        # join_code -> difference measured once, applied if the next reconcile agrees
+        self._unconfirmed: dict[str, tuple[int, int]] = {}
+        self._next_reconcile = 0.0
+        self._reconciled_epoch: Optional[str] = None
+        # Meetings reconciled at least once in this epoch.
+        self._measured: set[str] = set()
+
+    def _started_meetings(self, db: Session, version: tuple) -> list[dict]:
+        with self._lock:
+            if self._meetings_version == version:
+                return self._meetings
+        rows = db.execute(
+            select(
+                ScheduledMeeting.id,
+                ScheduledMeeting.join_code,
+                ScheduledMeeting.title,
+                ScheduledMeeting.teacher_name,
+                ScheduledMeeting.scheduled_start_at,
+                ScheduledMeeting.scheduled_end_at,
+            )
+            .where(ScheduledMeeting.status == "started")
+            .order_by(
+                ScheduledMeeting.scheduled_start_at.is_(None),
+                ScheduledMeeting.scheduled_start_at,
+                ScheduledMeeting.id,
+            )
+        ).all()
+        # Same count as roster_status (distinct users of the meeting's classes).
+        expected = dict(
+            db.execute(
+                select(
+                    ScheduledMeetingClass.scheduled_meeting_id,
+                    func.count(func.distinct(UserClassMembership.user_id)),
+                )
+                .join(UserClassMembership, UserClassMembership.class_id == ScheduledMeetingClass.class_id)
+                .where(ScheduledMeetingClass.scheduled_meeting_id.in_([r.id for r in rows]))
+                .group_by(ScheduledMeetingClass.scheduled_meeting_id)
+            ).all()
+        )
+        meetings = [
+            {
+                "join_code": r.join_code,
+                "title": r.title,
+                "teacher_name": r.teacher_name,
+                "scheduled_start_at": r.scheduled_start_at,
+                "scheduled_end_at": r.scheduled_end_at,
+                "expected_count": expected.get(r.id, 0),
+            }
+            for r in rows
+        ]
+        with self._lock:
+            self._meetings, self._meetings_version = meetings, version
+        return meetings
+
+    @staticmethod
+    def _counters(codes: list[str]) -> dict[str, tuple[int, int]]:
+        """join_code -> (live, flags) from the shared counters (one batched read)."""
+        keys = []
+        for code in codes:
+            keys += [_joins(code), _leaves(code), _flags(code)]
+        values = shared_state.backend().counters(keys)
+        return {code: (values[3 * i] - values[3 * i + 1], values[3 * i + 2]) for i, code in enumerate(codes)}
+
+    def _reconcile(self, db: Session, codes: list[str], counters: dict[str, tuple[int, int]], epoch: str) -> None:
+        s = MeetingAttendanceSession
+        live = dict(
+            db.execute(
+                select(s.join_code, func.count())
+                .where(s.join_code.in_(codes), s.left_at.is_(None), s.role == "examinee")
+                .group_by(s.join_code)
+            ).all()
+        )
+        flags = dict(
+            db.execute(
+                select(MeetingFlag.join_code, func.count())
+                .where(MeetingFlag.join_code.in_(codes))
+                .group_by(MeetingFlag.join_code)
+            ).all()
+        )
+        # Counters that moved during the queries: the difference includes
+        # writes in flight, so that meeting isn't measured this time.
+        after = self._counters(codes)
+        # Counters lost: the backend was flushed (a new epoch), or this is the
+        # first reconcile of a process whose in-process counters start at zero.
+        lost = self._reconciled_epoch is not None or not shared_state.backend().shared
+        with self._lock:
+            reset = self._reconciled_epoch != epoch
+            trusted = reset and lost
+            corrections = {} if reset else dict(self._corrections)
+            unconfirmed = {} if reset else dict(self._unconfirmed)
+            settled = True
+            for code in codes:
+                if after[code] != counters[code]:
+                    settled = False
+                    continue
+                measured = (live.get(code, 0) - counters[code][0], flags.get(code, 0) - counters[code][1])
+                if measured == corrections.get(code, (0, 0)):
+                    unconfirmed.pop(code, None)
+                elif trusted or unconfirmed.get(code) == measured:
+                    corrections[code] = measured
+                    unconfirmed.pop(code, None)
+                else:
+                    unconfirmed[code] = measured
+            for code in set(corrections) - set(codes):
+                del corrections[code]
+            for code in set(unconfirmed) - set(codes):
+                del unconfirmed[code]
+            self._corrections, self._unconfirmed = corrections, unconfirmed
+            self._reconciled_epoch = epoch
+            self._measured = set(codes) if reset else self._measured | set(codes)
+            soon = unconfirmed or not settled
+            self._next_reconcile = time.monotonic() + (_CONFIRM_SECONDS if soon else OVERVIEW_RECONCILE_SECONDS)
+
+    def _last_chat(self, db: Session, join_code: str) -> Optional[datetime]:
+        raw = shared_state.backend().get(_last_chat(join_code))
+        if raw == _NO_CHAT:
+            return None
+        if raw:
+            return datetime.fromisoformat(raw.decode())
+        # Unknown (in-process backend restarted): read once, then kept by record_chat.
+        last_id = db.scalar(select(func.max(MeetingChatLog.id)).where(MeetingChatLog.join_code == join_code))
+        at = db.scalar(select(MeetingChatLog.created_at).where(MeetingChatLog.id == last_id)) if last_id else None
+        if at is not None:
+            record_chat(join_code, at)
+        else:
+            shared_state.backend().add(_last_chat(join_code), _NO_CHAT, ttl=_LAST_CHAT_TTL_SECONDS)
+        return at
+
+    def snapshot(self, db: Session) -> list[dict]:
+        # The epoch changes when the backend lost its counters.
+        epoch = versions.epoch()
+        version = (epoch, *versions.get_many([SCHEDULED_MEETINGS, USERS]))
+        meetings = self._started_meetings(db, version)
+        codes = [m["join_code"] for m in meetings]
+        if not codes:
+            return []
+
+        counters = self._counters(codes)
+
+        with self._lock:
+            due = (
+                time.monotonic() >= self._next_reconcile
+                or self._reconciled_epoch != epoch
+                or any(code not in self._measured for code in codes)
+            )
+        if due:
+            self._reconcile(db, codes, counters, epoch)
+        with self._lock:
+            corrections = self._corrections
+
+        result = []
+        for m in meetings:
+            code = m["join_code"]
+            live_fix, flags_fix = corrections.get(code, (0, 0))
+            result.append(
+                {
+                    **m,
+                    "live_attendees": max(0, counters[code][0] + live_fix),
+                    "last_chat_at": self._last_chat(db, code),
+                    "flag_count": max(0, counters[code][1] + flags_fix),
+                }
+            )
+        return result
+
+
+overview = Overview()
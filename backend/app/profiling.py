@@ -0,0 +1,294 @@
+"""Opt-in per-request profiling for slow or explicitly flagged requests.
+
+Off by default (PROFILING_ENABLED=false): the middleware is not installed and
+the hooks below reduce to a single ContextVar lookup.
+
+When enabled, every request carries a lightweight trace (SQL statements with
+timings, dependency calls such as JWT verification and AWS operations). The
+trace is written to PROFILE_DIR only if the request took longer than
+PROFILE_SLOW_MS, or if it was flagged for full profiling:
+
+- the request carries `X-Debug-Profile: <PROFILE_DEBUG_TOKEN>`, or
+- it was picked by random sampling (PROFILE_SAMPLE_RATE).
+
+Flagged requests are additionally stack-sampled by a background thread
+(statistical profiler) on every thread the request is seen running on.
+Files are rotated: only the newest PROFILE_MAX_FILES are kept.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+from .config import env_flag, env_float, env_int
+
+
+log = logging.getLogger(__name__)
+
+
+PROFILING_ENABLED = env_flag("PROFILING_ENABLED", False)
+PROFILE_SLOW_MS = env_float("PROFILE_SLOW_MS", 1000.0)
+PROFILE_SAMPLE_RATE = env_float("PROFILE_SAMPLE_RATE", 0.0)
+PROFILE_DEBUG_HEADER = (os.getenv("PROFILE_DEBUG_HEADER") or "x-debug-profile").strip().lower()
+PROFILE_DEBUG_TOKEN = (os.getenv("PROFILE_DEBUG_TOKEN") or "").strip()
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/exam-surveillance-profiles")
+PROFILE_MAX_FILES = env_int("PROFILE_MAX_FILES", 200)
+PROFILE_SAMPLE_INTERVAL_MS = env_float("PROFILE_SAMPLE_INTERVAL_MS", 5.0)
+
+_MAX_SQL_STATEMENTS = 200
+_MAX_SQL_CHARS = 500
+_MAX_STACK_DEPTH = 40
+
+
+class RequestTrace:
+    __slots__ = ("request_id", "started", "statements", "dependencies", "threads", "samples", "flagged")
+
+    def __init__(self, flagged: bool):
+        self.request_id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.statements: list[tuple[str, float]] = []
+        self.dependencies: list[tuple[str, str, float, str]] = []
+        # Thread idents this request has run on (event loop + threadpool workers).
+        self.threads: set[int] = {threading.get_ident()}
+        self.samples: dict[str, int] = {}
+        self.flagged = flagged
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("profiling_trace", default=None)
+
+
+def _mark_thread(trace: RequestTrace) -> None:
+    if trace.flagged:
+        trace.threads.add(threading.get_ident())
+
+
+def record_statement(statement: str, elapsed_s: float) -> None:
+    trace = _current.get()
+    if trace is None:
+        return
+    _mark_thread(trace)
+    if len(trace.statements) < _MAX_SQL_STATEMENTS:
+        trace.statements.append((statement, elapsed_s))
+
+
+def record_dependency(dependency: str, operation: str, elapsed_s: float, outcome: str) -> None:
+    trace = _current.get()
+    if trace is None:
+        return
+    _mark_thread(trace)
+    trace.dependencies.append((dependency, operation, elapsed_s, outcome))
+
+
+# --- statistical sampler (flagged requests only) ---
+
+
+class _Sampler:
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self._traces: set[RequestTrace] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, trace: RequestTrace) -> None:
+        with self._lock:
+            self._traces.add(trace)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, trace: RequestTrace) -> None:
+        with self._lock:
+            self._traces.discard(trace)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                traces = list(self._traces)
+                if not traces:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            for trace in traces:
+                for ident in list(trace.threads):
+                    if ident == own:
+                        continue
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+                    key = _stack_key(frame)
+                    trace.samples[key] = trace.samples.get(key, 0) + 1
+            time.sleep(self.interval_s)
+
+
+def _stack_key(frame) -> str:
+    parts = []
+    depth = 0
+    while frame is not None and depth < _MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+        depth += 1
+    # Root first, like collapsed-stack (flamegraph) format.
+    return ";".join(reversed(parts))
+
+
+_sampler = _Sampler(max(0.001, PROFILE_SAMPLE_INTERVAL_MS / 1000.0))
+
+
+# --- output ---
+
+_SLUG_RE = re.compile(r"[^A-Za-z0-9]+")
+_write_lock = threading.Lock()
+
+
+def _write_profile(document: dict) -> None:
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = _SLUG_RE.sub("-", document["route"]).strip("-")[:60] or "root"
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{document['method']}-{slug}-{document['request_id']}.json"
+        with open(os.path.join(PROFILE_DIR, name), "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False, separators=(",", ":"), default=str)
+
+        with _write_lock:
+            files = sorted(
+                (e for e in os.scandir(PROFILE_DIR) if e.is_file() and e.name.endswith(".json")),
+                key=lambda e: e.stat().st_mtime,
+            )
+            for entry in files[: max(0, len(files) - PROFILE_MAX_FILES)]:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+    except Exception as e:
+        log.warning("failed to write request profile: %s", e)
+
+
+def _build_document(trace: RequestTrace, scope, status: int, elapsed_s: float, trigger: str) -> dict:
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or scope.get("path", "")
+    sql_total = sum(t for _, t in trace.statements)
+    dep_total = sum(t for _, _, t, _ in trace.dependencies)
+
+    document = {
+        "request_id": trace.request_id,
+        "trigger": trigger,
+        "method": scope.get("method", ""),
+        "path": scope.get("path", ""),
+        "route": template,
+        "status": status,
+        "duration_ms": round(elapsed_s * 1000, 3),
+        "sql": {
+            "count": len(trace.statements),
+            "total_ms": round(sql_total * 1000, 3),
+            "statements": [
+                {"ms": round(t * 1000, 3), "sql": " ".join(s.split())[:_MAX_SQL_CHARS]} for s, t in trace.statements
+            ],
+        },
+        "dependencies": {
+            "total_ms": round(dep_total * 1000, 3),
+            "calls": [
+                {"dependency": d, "operation": op, "ms": round(t * 1000, 3), "outcome": outcome}
+                for d, op, t, outcome in trace.dependencies
+            ],
+        },
+    }
+    if trace.samples:
+        total = sum(trace.samples.values())
+        top = sorted(trace.samples.items(), key=lambda kv: kv[1], reverse=True)[:50]
+        document["stack_samples"] = {
+            "interval_ms": PROFILE_SAMPLE_INTERVAL_MS,
+            "total": total,
+            "top": [{"count": c, "stack": s} for s, c in top],
+        }
+    return document
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    def _flagged(self, scope) -> Optional[str]:
+        if PROFILE_DEBUG_TOKEN:
+            for key, value in scope.get("headers") or []:
+                if key == PROFILE_DEBUG_HEADER.encode("latin-1"):
+                    if value.decode("latin-1").strip() == PROFILE_DEBUG_TOKEN:
+                        return "header"
+                    break
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trigger = self._flagged(scope)
+        trace = RequestTrace(flagged=trigger is not None)
+        token = _current.set(trace)
+        if trace.flagged:
+            _sampler.add(trace)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if trace.flagged:
+                    headers = list(message.get("headers") or [])
+                    headers.append((b"x-profile-id", trace.request_id.encode()))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - trace.started
+            if trace.flagged:
+                _sampler.remove(trace)
+            _current.reset(token)
+
+            if trigger is None and elapsed * 1000 >= PROFILE_SLOW_MS:
+                trigger = "slow"
+            if trigger is not None:
+                from starlette.concurrency import run_in_threadpool
+
+                document = _build_document(trace, scope, status["code"], elapsed, trigger)
+                await run_in_threadpool(_write_profile, document)
+
+
+def instrument_engine(engine) -> None:
+    """Capture per-request SQL statements (only when profiling is enabled)."""
+    if not PROFILING_ENABLED:
+        return
+
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("_profiling_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("_profiling_query_start")
+        if stack:
+            record_statement(statement, time.perf_counter() - stack.pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        stack = conn.info.get("_profiling_query_start") if conn is not None else None
+        if stack:
+            record_statement(exception_context.statement or "", time.perf_counter() - stack.pop())
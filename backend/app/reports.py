@@ -0,0 +1,463 @@
+"""Post-exam review reports, built in the background.
+
+POST /scheduled-meetings/{join_code}/report queues a job (a `report_jobs`
+row) and returns its id; GET /reports/{job_id} is polled for the status and
+GET /reports/{job_id}/download serves the artifacts:
+
+- report.json: meeting, attendance summary (per examinee and roster),
+  attendance sessions, chat transcript, recordings index and flags;
+- report.zip: the same as CSV files (plus report.json).
+
+Jobs run on a small thread pool in the process that accepted them: building
+a report is database and S3 I/O, and the process-wide engine and clients
+can't be handed to a process pool. Job rows are in the database, so any
+worker can answer status polls and downloads (with local storage,
+REPORTS_DIR must then be shared, like ARCHIVE_DIR).
+
+Reports are cached: a job records the data versions it was built from
+(app.conditional counters of the meeting's chat logs, attendance and flags),
+and a request while those are unchanged returns the existing job. Recordings
+are uploaded straight to S3 and have no version, so `force=true` rebuilds.
+Ending a scheduled meeting queues its report (REPORTS_ON_END), so it is
+usually ready by the time a proctor opens it; the end also closes the
+attendance sessions still open, so that report is complete and the
+clients' leave calls don't make it stale.
+
+A graceful shutdown lets running jobs finish within the shutdown deadline and
+marks the rest failed. A job that was queued or running when its process
+died is reported as failed after REPORT_JOB_TIMEOUT_SECONDS. Either way the
+next request rebuilds.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import csv
+import io
+import logging
+import os
+import threading
+import uuid
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from . import metrics
+from .archive import (
+    ATTENDANCE,
+    CHAT_LOGS,
+    archived_meeting,
+    attendance_order,
+    chat_log_order,
+    max_archived_id,
+    read_archived,
+)
+from .aws_clients import get_s3
+from .conditional import attendance_key, chat_logs_key, flags_key, versions
+from .config import env_flag, env_float, env_int
+from .db import SessionLocal
+from .models import MeetingAttendanceSession, MeetingChatLog, MeetingFlag, ReportJob, ScheduledMeeting
+from .responses import dumps
+from .rosters import meeting_class_names, roster_status
+
+
+log = logging.getLogger(__name__)
+
+
+REPORTS_DIR = os.getenv("REPORTS_DIR", "reports")
+# When set, artifacts go to S3 (downloads redirect to presigned URLs).
+REPORTS_S3_BUCKET = (os.getenv("REPORTS_S3_BUCKET") or "").strip()
+REPORTS_S3_PREFIX = os.getenv("REPORTS_S3_PREFIX", "reports/")
+REPORTS_ON_END = env_flag("REPORTS_ON_END", True)
+REPORT_WORKERS = max(1, env_int("REPORT_WORKERS", 2))
+REPORT_JOB_TIMEOUT_SECONDS = env_float("REPORT_JOB_TIMEOUT_SECONDS", 900.0)
+REPORT_DOWNLOAD_URL_EXPIRES_SECONDS = env_int("REPORT_DOWNLOAD_URL_EXPIRES_SECONDS", 300)
+
+RECORDINGS_PREFIX = "proctor-recordings/"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JSON = "json"
+ZIP = "zip"
+CONTENT_TYPES = {JSON: "application/json", ZIP: "application/zip"}
+
+report_jobs_total = metrics.counter("report_jobs_total", "Report jobs by outcome", ("outcome",))
+
+
+# --- jobs ---
+
+
+def fingerprint(join_code: str) -> str:
+    """Versions of everything a report of `join_code` is built from."""
+    keys = [chat_logs_key(join_code), attendance_key(join_code), flags_key(join_code)]
+    return ".".join([versions.epoch()] + [str(v) for v in versions.get_many(keys)])
+
+
+def effective_status(job: ReportJob, now: Optional[datetime] = None) -> str:
+    """The job's status; unfinished jobs past the timeout count as failed (their process died)."""
+    if job.status in (QUEUED, RUNNING):
+        now = now or datetime.utcnow()
+        if job.created_at is not None and now - job.created_at > timedelta(seconds=REPORT_JOB_TIMEOUT_SECONDS):
+            return FAILED
+    return job.status
+
+
+def job_view(job: ReportJob) -> dict:
+    status = effective_status(job)
+    view = {
+        "job_id": job.id,
+        "join_code": job.join_code,
+        "status": status,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "error": job.error if status == FAILED else None,
+    }
+    if status == DONE:
+        view["json_url"] = f"/reports/{job.id}/download?format={JSON}"
+        view["zip_url"] = f"/reports/{job.id}/download?format={ZIP}"
+        view["json_bytes"] = job.json_bytes
+        view["zip_bytes"] = job.zip_bytes
+    return view
+
+
+def request_report(
+    db: Session, join_code: str, *, user_id: Optional[int] = None, force: bool = False
+) -> tuple[ReportJob, bool]:
+    """The meeting's report job for its current data, queueing one if needed.
+
+    Returns (job, created).
+    """
+    current = fingerprint(join_code)
+    if not force:
+        latest = db.scalars(
+            select(ReportJob).where(ReportJob.join_code == join_code).order_by(ReportJob.created_at.desc()).limit(1)
+        ).first()
+        if latest is not None and latest.fingerprint == current and effective_status(latest) != FAILED:
+            report_jobs_total.inc(outcome="cached")
+            return latest, False
+
+    job = ReportJob(
+        id=uuid.uuid4().hex,
+        join_code=join_code,
+        status=QUEUED,
+        fingerprint=current,
+        requested_by_user_id=user_id,
+        created_at=datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    _submit(job.id)
+    report_jobs_total.inc(outcome="queued")
+    return job, True
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+# Submitted, unfinished jobs: future -> job id.
+_pending: dict[Future, str] = {}
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+        return _pool
+
+
+def _submit(job_id: str) -> None:
+    # In the caller's context: the job's log records carry its request id.
+    future = _executor().submit(contextvars.copy_context().run, run_job, job_id)
+    with _pool_lock:
+        _pending[future] = job_id
+    future.add_done_callback(_forget)
+
+
+def _forget(future: Future) -> None:
+    with _pool_lock:
+        _pending.pop(future, None)
+
+
+def stop_reports(timeout: float = 0.0) -> None:
+    """Stop the pool at shutdown.
+
+    Running jobs get up to `timeout` seconds to finish. Queued jobs, and
+    running ones that don't finish in time, are marked failed right away so
+    the next request rebuilds them (instead of waiting for the job timeout).
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+        pending = dict(_pending)
+    if pool is None:
+        return
+    pool.shutdown(wait=False, cancel_futures=True)
+    wait([f for f in pending if not f.cancelled()], timeout=timeout)
+    interrupted = [job_id for f, job_id in pending.items() if not f.done() or f.cancelled()]
+    if interrupted:
+        _fail_interrupted(interrupted)
+
+
+def _fail_interrupted(job_ids: list[str]) -> None:
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(ReportJob)
+            .where(ReportJob.id.in_(job_ids), ReportJob.status.in_((QUEUED, RUNNING)))
+            .values(status=FAILED, error="Interrupted by shutdown", finished_at=datetime.utcnow())
+        )
+        db.commit()
+        report_jobs_total.inc(result.rowcount, outcome=FAILED)
+    except Exception as e:
+        log.warning("failed to mark interrupted report jobs: %s", e)
+    finally:
+        db.close()
+
+
+def run_job(job_id: str) -> None:
+    db = SessionLocal()
+    try:
+        job = db.get(ReportJob, job_id)
+        if job is None:
+            return
+        job.status = RUNNING
+        job.started_at = datetime.utcnow()
+        db.commit()
+        try:
+            report = build_report(db, job.join_code)
+            report["job_id"] = job.id
+            json_body = dumps(report)
+            zip_body = _zip(report, json_body)
+            _store(job, JSON, json_body)
+            job.storage = _store(job, ZIP, zip_body)
+            job.json_bytes = len(json_body)
+            job.zip_bytes = len(zip_body)
+            job.status = DONE
+            report_jobs_total.inc(outcome=DONE)
+        except Exception as e:
+            db.rollback()
+            job = db.get(ReportJob, job_id)
+            job.status = FAILED
+            job.error = str(e)[:1024]
+            report_jobs_total.inc(outcome=FAILED)
+            log.warning("report %s for %s failed: %s", job_id, job.join_code, e, exc_info=True)
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+# --- report contents ---
+
+
+_CHAT_COLUMNS = tuple(MeetingChatLog.__table__.c)
+_ATTENDANCE_COLUMNS = tuple(MeetingAttendanceSession.__table__.c)
+_FLAG_COLUMNS = tuple(c for c in MeetingFlag.__table__.c if c.key != "join_code")
+
+
+def _rows(db: Session, join_code: str, model, table: str, columns: tuple, order) -> list[dict]:
+    """All rows of a meeting in list-endpoint order, archived ones included."""
+    names = [c.key for c in columns]
+    archived = archived_meeting(db, join_code)
+    rows = read_archived(archived, table, columns) if archived is not None else []
+    stmt = (
+        select(*columns)
+        .where(model.join_code == join_code, model.id > max_archived_id(archived, table))
+        .order_by(*order())
+    )
+    rows += db.execute(stmt).all()
+    return [dict(zip(names, row)) for row in rows]
+
+
+_SUMMARY_FIELDS = [
+    "external_user_id",
+    "attendee_ids",
+    "user_id",
+    "role",
+    "sessions",
+    "first_joined_at",
+    "last_left_at",
+    "total_seconds",
+    "open",
+]
+
+
+def _ts(value: Any) -> str:
+    # Live rows carry datetimes, archived rows ISO 8601 strings.
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _attendance_summary(sessions: list[dict]) -> list[dict]:
+    """One entry per examinee (external user id, else attendee id), in first-join order."""
+    people: dict[str, dict] = {}
+    for s in sessions:
+        who = s.get("external_user_id") or s.get("attendee_id")
+        person = people.get(who)
+        if person is None:
+            person = people[who] = {
+                "external_user_id": s.get("external_user_id"),
+                "attendee_ids": [],
+                "user_id": s.get("user_id"),
+                "role": s.get("role"),
+                "sessions": 0,
+                "first_joined_at": s.get("joined_at"),
+                "last_left_at": None,
+                "total_seconds": 0,
+                "open": False,
+            }
+        person["sessions"] += 1
+        if s.get("attendee_id") not in person["attendee_ids"]:
+            person["attendee_ids"].append(s.get("attendee_id"))
+        person["user_id"] = person["user_id"] or s.get("user_id")
+        person["total_seconds"] += s.get("duration_seconds") or 0
+        if s.get("left_at") is None:
+            person["open"] = True
+        elif person["last_left_at"] is None or _ts(s["left_at"]) > _ts(person["last_left_at"]):
+            person["last_left_at"] = s["left_at"]
+    return list(people.values())
+
+
+def _roster(db: Session, meeting: ScheduledMeeting) -> dict:
+    """Expected examinees (meeting classes) that attended at some point, and those that never did."""
+    status = roster_status(db, meeting)
+    attended = status["present"] + [p for p in status["absent"] if p["disconnected"]]
+    never_joined = [p for p in status["absent"] if not p["disconnected"]]
+    return {
+        "expected_count": status["expected_count"],
+        "attended_count": len(attended),
+        "never_joined_count": len(never_joined),
+        "attended": attended,
+        "never_joined": never_joined,
+    }
+
+
+def _recordings(join_code: str) -> dict:
+    bucket = (os.getenv("RECORDINGS_S3_BUCKET") or "").strip()
+    if not bucket:
+        return {"bucket": None, "items": [], "error": "RECORDINGS_S3_BUCKET is not configured"}
+    s3 = get_s3()
+    items: list[dict] = []
+    params = {"Bucket": bucket, "Prefix": f"{RECORDINGS_PREFIX}{join_code}/"}
+    try:
+        while True:
+            page = s3.list_objects_v2(**params)
+            for obj in page.get("Contents") or []:
+                items.append({"key": obj["Key"], "size": obj.get("Size"), "last_modified": obj.get("LastModified")})
+            if not page.get("IsTruncated"):
+                break
+            params["ContinuationToken"] = page["NextContinuationToken"]
+    except Exception as e:
+        # The rest of the report is still useful.
+        return {"bucket": bucket, "items": items, "error": str(e)}
+    return {"bucket": bucket, "items": items, "error": None}
+
+
+def build_report(db: Session, join_code: str) -> dict[str, Any]:
+    meeting = db.scalars(select(ScheduledMeeting).where(ScheduledMeeting.join_code == join_code)).first()
+    if meeting is None:
+        raise LookupError("Scheduled meeting not found")
+    sessions = _rows(db, join_code, MeetingAttendanceSession, ATTENDANCE, _ATTENDANCE_COLUMNS, attendance_order)
+    chat = _rows(db, join_code, MeetingChatLog, CHAT_LOGS, _CHAT_COLUMNS, chat_log_order)
+    flags = [
+        dict(zip([c.key for c in _FLAG_COLUMNS], row))
+        for row in db.execute(
+            select(*_FLAG_COLUMNS).where(MeetingFlag.join_code == join_code).order_by(MeetingFlag.id.asc())
+        )
+    ]
+    return {
+        "generated_at": datetime.utcnow(),
+        "meeting": {
+            "join_code": meeting.join_code,
+            "title": meeting.title,
+            "teacher_name": meeting.teacher_name,
+            "scheduled_start_at": meeting.scheduled_start_at,
+            "scheduled_end_at": meeting.scheduled_end_at,
+            "status": meeting.status,
+            "class_names": meeting_class_names(db, [meeting.id]).get(meeting.id, []),
+        },
+        "attendance": {
+            "summary": _attendance_summary(sessions),
+            "roster": _roster(db, meeting),
+            "sessions": sessions,
+        },
+        "chat": chat,
+        "recordings": _recordings(join_code),
+        "flags": flags,
+    }
+
+
+def _csv(rows: list[dict], fields: list[str]) -> bytes:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({k: ";".join(v) if isinstance(v, list) else v for k, v in row.items()})
+    # BOM so spreadsheet apps read the Japanese text as UTF-8.
+    return out.getvalue().encode("utf-8-sig")
+
+
+def _zip(report: dict, json_body: bytes) -> bytes:
+    attendance = report["attendance"]
+    roster = [dict(p, attended=True) for p in attendance["roster"]["attended"]]
+    roster += [dict(p, attended=False) for p in attendance["roster"]["never_joined"]]
+    files = {
+        "report.json": json_body,
+        "attendance_summary.csv": _csv(attendance["summary"], _SUMMARY_FIELDS),
+        "attendance_sessions.csv": _csv(attendance["sessions"], [c.key for c in _ATTENDANCE_COLUMNS]),
+        "roster.csv": _csv(roster, ["id", "username", "display_name", "class_name", "first_joined_at", "attended"]),
+        "chat.csv": _csv(report["chat"], [c.key for c in _CHAT_COLUMNS]),
+        "recordings.csv": _csv(report["recordings"]["items"], ["key", "size", "last_modified"]),
+        "flags.csv": _csv(report["flags"], [c.key for c in _FLAG_COLUMNS]),
+    }
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, body in files.items():
+            zf.writestr(name, body)
+    return buf.getvalue()
+
+
+# --- storage ---
+
+
+def artifact_path(job: ReportJob, fmt: str) -> str:
+    return os.path.join(REPORTS_DIR, job.join_code, f"{job.id}.{fmt}")
+
+
+def artifact_key(job: ReportJob, fmt: str) -> str:
+    return f"{REPORTS_S3_PREFIX}{job.join_code}/{job.id}.{fmt}"
+
+
+def _store(job: ReportJob, fmt: str, body: bytes) -> str:
+    if REPORTS_S3_BUCKET:
+        get_s3().put_object(
+            Bucket=REPORTS_S3_BUCKET, Key=artifact_key(job, fmt), Body=body, ContentType=CONTENT_TYPES[fmt]
+        )
+        return "s3"
+    path = artifact_path(job, fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(body)
+    os.replace(tmp, path)
+    return "local"
+
+
+def download_url(job: ReportJob, fmt: str) -> str:
+    """Presigned S3 URL of an artifact (storage 's3')."""
+    return get_s3().generate_presigned_url(
+        ClientMethod="get_object",
+        Params={
+            "Bucket": REPORTS_S3_BUCKET,
+            "Key": artifact_key(job, fmt),
+            "ResponseContentDisposition": f'attachment; filename="report-{job.join_code}.{fmt}"',
+        },
+        ExpiresIn=REPORT_DOWNLOAD_URL_EXPIRES_SECONDS,
+    )
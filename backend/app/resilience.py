@@ -0,0 +1,295 @@
+"""Retries, jittered backoff and circuit breakers for AWS calls.
+
+Every AWS client from app.aws_clients is wrapped in `ResilientClient`, so
+Chime / Cognito / S3 calls share one policy:
+
+- errors are classified as not_found, throttled, transient or client
+  (see `classify`); only throttled/transient failures are retried, with
+  full-jitter exponential backoff bounded by a per-call deadline;
+- operations that are not safe to repeat after a server-side failure
+  (e.g. AdminCreateUser) are only retried on throttling, where the request
+  was rejected before doing anything;
+- a per-service circuit breaker opens after consecutive throttled/transient
+  failures and fails fast with `CircuitOpenError` until a cooldown passes,
+  then lets a single probe through (half-open).
+
+botocore's own retries are disabled for these clients (see aws_clients) so
+attempts aren't multiplied. After retries are exhausted the original
+exception is re-raised, so existing `except ClientError` handling keeps
+working; `http_exception` maps any of these errors to an HTTP response.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+from .config import env_float, env_int
+from .metrics import counter, gauge
+
+
+AWS_RETRY_MAX_ATTEMPTS = env_int("AWS_RETRY_MAX_ATTEMPTS", 4)
+AWS_RETRY_BASE_SECONDS = env_float("AWS_RETRY_BASE_SECONDS", 0.1)
+AWS_RETRY_MAX_BACKOFF_SECONDS = env_float("AWS_RETRY_MAX_BACKOFF_SECONDS", 2.0)
+# Total time budget per logical call, including backoff sleeps.
+AWS_CALL_DEADLINE_SECONDS = env_float("AWS_CALL_DEADLINE_SECONDS", 8.0)
+AWS_BREAKER_FAILURE_THRESHOLD = env_int("AWS_BREAKER_FAILURE_THRESHOLD", 5)
+AWS_BREAKER_COOLDOWN_SECONDS = env_float("AWS_BREAKER_COOLDOWN_SECONDS", 10.0)
+
+NOT_FOUND = "not_found"
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+CLIENT = "client"
+
+_NOT_FOUND_CODES = {"NotFoundException", "ResourceNotFoundException", "NoSuchKey", "NoSuchBucket"}
+_THROTTLE_CODES = {
+    "ThrottlingException",
+    "ThrottledException",
+    "ThrottledClientException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "SlowDown",
+}
+_TRANSIENT_CODES = {
+    "ServiceUnavailable",
+    "ServiceUnavailableException",
+    "ServiceFailureException",
+    "InternalServerError",
+    "InternalErrorException",
+    "InternalFailure",
+    "RequestTimeout",
+    "RequestTimeoutException",
+}
+# botocore transport errors (matched by name to avoid importing botocore here).
+_TRANSIENT_EXCEPTIONS = {
+    "EndpointConnectionError",
+    "ConnectTimeoutError",
+    "ReadTimeoutError",
+    "ConnectionClosedError",
+    "ProxyConnectionError",
+    "HTTPClientError",
+    # requests (JWKS fetch)
+    "ConnectionError",
+    "Timeout",
+}
+
+# Operations that must not be repeated after an ambiguous server-side failure.
+_NON_IDEMPOTENT = {"admin_create_user"}
+# Client methods that don't call AWS (pure local work) are passed through.
+_LOCAL_METHODS = {"generate_presigned_url", "generate_presigned_post", "get_paginator", "get_waiter", "can_paginate", "close"}
+
+AWS_RETRIES = counter("aws_retries_total", "AWS call retries.", ("service", "operation", "reason"))
+AWS_BREAKER_REJECTIONS = counter(
+    "aws_circuit_rejections_total", "AWS calls rejected by an open circuit breaker.", ("service",)
+)
+
+
+def _error_code(exc: BaseException) -> str:
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        return str((response.get("Error") or {}).get("Code") or "")
+    return ""
+
+
+def _http_status(exc: BaseException) -> int:
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        status = (response.get("ResponseMetadata") or {}).get("HTTPStatusCode")
+    else:
+        # requests.HTTPError carries the Response object.
+        status = getattr(response, "status_code", None)
+    try:
+        return int(status or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def classify(exc: BaseException) -> str:
+    if isinstance(exc, CircuitOpenError):
+        return TRANSIENT
+    code = _error_code(exc)
+    if code in _NOT_FOUND_CODES:
+        return NOT_FOUND
+    if code in _THROTTLE_CODES:
+        return THROTTLED
+    status = _http_status(exc)
+    if code in _TRANSIENT_CODES or status >= 500:
+        return TRANSIENT
+    if status == 429:
+        return THROTTLED
+    if code or status:
+        return CLIENT
+    if any(cls.__name__ in _TRANSIENT_EXCEPTIONS for cls in type(exc).__mro__):
+        return TRANSIENT
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return TRANSIENT
+    return CLIENT
+
+
+def is_unavailable(exc: BaseException) -> bool:
+    """Throttling / outage (incl. open circuit), as opposed to a real error."""
+    return classify(exc) in (THROTTLED, TRANSIENT)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, service: str, retry_after: float):
+        super().__init__(f"{service} is temporarily unavailable (circuit open)")
+        self.service = service
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, service: str, failure_threshold: int, cooldown_seconds: float):
+        self.service = service
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.cooldown_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            retry_after = max(0.0, self.cooldown_seconds - (now - self.opened_at))
+        AWS_BREAKER_REJECTIONS.inc(service=self.service)
+        raise CircuitOpenError(self.service, retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+_STATE_VALUES = {CircuitBreaker.CLOSED: 0.0, CircuitBreaker.HALF_OPEN: 1.0, CircuitBreaker.OPEN: 2.0}
+_breakers_lock = threading.Lock()
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(service: str) -> CircuitBreaker:
+    breaker = _breakers.get(service)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(service)
+            if breaker is None:
+                breaker = CircuitBreaker(service, AWS_BREAKER_FAILURE_THRESHOLD, AWS_BREAKER_COOLDOWN_SECONDS)
+                _breakers[service] = breaker
+    return breaker
+
+
+def reset_breakers() -> None:
+    with _breakers_lock:
+        _breakers.clear()
+
+
+gauge(
+    "aws_circuit_state",
+    "AWS circuit breaker state per service (0=closed, 1=half-open, 2=open).",
+    ("service",),
+    collect=lambda: {(b.service,): _STATE_VALUES[b.state] for b in list(_breakers.values())},
+)
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter: uniform(0, min(cap, base * 2^attempt)).
+    return random.uniform(0, min(AWS_RETRY_MAX_BACKOFF_SECONDS, AWS_RETRY_BASE_SECONDS * (2**attempt)))
+
+
+def call(
+    service: str,
+    operation: str,
+    fn: Callable[..., Any],
+    *args: Any,
+    deadline_seconds: Optional[float] = None,
+    **kwargs: Any,
+) -> Any:
+    """Run one AWS operation under the retry policy and the service's breaker."""
+    breaker = breaker_for(service)
+    deadline = time.monotonic() + (AWS_CALL_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            kind = classify(e)
+            if kind not in (THROTTLED, TRANSIENT):
+                # NotFound / validation errors: the service itself is answering.
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+
+            attempt += 1
+            retryable = kind == THROTTLED or operation not in _NON_IDEMPOTENT
+            delay = _backoff(attempt)
+            if not retryable or attempt >= AWS_RETRY_MAX_ATTEMPTS or time.monotonic() + delay >= deadline:
+                raise
+            AWS_RETRIES.inc(service=service, operation=operation, reason=kind)
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+
+class ResilientClient:
+    """Proxy applying `call` to every AWS operation of a client."""
+
+    def __init__(self, client, service: str):
+        self._client = client
+        self._service = service
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_") or name in _LOCAL_METHODS:
+            return attr
+
+        def wrapped(*args, **kwargs):
+            return call(self._service, name, attr, *args, **kwargs)
+
+        return wrapped
+
+
+def http_exception(exc: BaseException, detail: Optional[str] = None) -> HTTPException:
+    """Map an AWS call failure to the HTTP error returned to clients."""
+    if isinstance(exc, HTTPException):
+        return exc
+    kind = classify(exc)
+    if kind == NOT_FOUND:
+        return HTTPException(status_code=404, detail=detail or "Meeting not found")
+    if kind in (THROTTLED, TRANSIENT):
+        retry_after = getattr(exc, "retry_after", None)
+        retry_after = max(1, math.ceil(retry_after)) if retry_after is not None else 2
+        return HTTPException(
+            status_code=503,
+            detail="AWS is temporarily unavailable, please retry shortly",
+            headers={"Retry-After": str(retry_after)},
+        )
+    return HTTPException(status_code=500, detail=detail or str(exc))
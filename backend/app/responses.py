@@ -0,0 +1,52 @@
+"""Fast JSON responses for large list endpoints.
+
+FastAPI's default path runs every returned value through `jsonable_encoder`
+(and `response_model` validation when declared), which is slow for thousands
+of rows with datetimes. List endpoints instead build plain dicts from
+column-projected query rows and return `FastJSONResponse`, which serializes
+them in one pass.
+
+orjson is used when installed; otherwise the stdlib encoder with a datetime
+fallback produces the same wire format (compact, UTF-8, ISO 8601 datetimes).
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Iterable, Sequence
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        # Naive datetimes stay naive (no offset), matching jsonable_encoder output.
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def rows_to_dicts(rows: Iterable[Sequence[Any]], keys: Sequence[str]) -> list[dict]:
+    """Zip column-projected rows (in select order) with output field names."""
+    return [dict(zip(keys, row)) for row in rows]
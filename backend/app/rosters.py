@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import (
+    ExamClass,
+    MeetingAttendanceSession,
+    ScheduledMeeting,
+    ScheduledMeetingClass,
+    User,
+    UserClassMembership,
+)
+
+
+def _normalize_class_names(names: Iterable[Optional[str]]) -> list[str]:
+    seen: dict[str, None] = {}
+    for name in names:
+        value = (name or "").strip()
+        if value and len(value) <= 255:
+            seen.setdefault(value, None)
+    return list(seen)
+
+
+def _get_or_create_classes(db: Session, names: list[str]) -> list[ExamClass]:
+    if not names:
+        return []
+    rows = db.query(ExamClass).filter(ExamClass.name.in_(names)).all()
+    by_name = {r.name: r for r in rows}
+    for name in names:
+        if name in by_name:
+            continue
+        try:
+            # Savepoint: a concurrent request may create the same class first.
+            with db.begin_nested():
+                row = ExamClass(name=name)
+                db.add(row)
+            by_name[name] = row
+        except IntegrityError:
+            by_name[name] = db.query(ExamClass).filter(ExamClass.name == name).one()
+    return [by_name[n] for n in names]
+
+
+def set_user_class(db: Session, user: User, class_name: Optional[str]) -> None:
+    """Mirror users.class_name into the membership table (caller commits)."""
+    names = _normalize_class_names([class_name]) if user.role == "examinee" else []
+    classes = _get_or_create_classes(db, names)
+
+    if user.id is None:
+        db.flush()
+    db.query(UserClassMembership).filter(UserClassMembership.user_id == user.id).delete(
+        synchronize_session=False
+    )
+    for c in classes:
+        db.add(UserClassMembership(user_id=user.id, class_id=c.id))
+
+
+def set_meeting_classes(db: Session, meeting: ScheduledMeeting, class_names: Iterable[Optional[str]]) -> list[str]:
+    """Replace the expected classes of a scheduled meeting (caller commits)."""
+    names = _normalize_class_names(class_names)
+    classes = _get_or_create_classes(db, names)
+
+    if meeting.id is None:
+        db.flush()
+    db.query(ScheduledMeetingClass).filter(ScheduledMeetingClass.scheduled_meeting_id == meeting.id).delete(
+        synchronize_session=False
+    )
+    for c in classes:
+        db.add(ScheduledMeetingClass(scheduled_meeting_id=meeting.id, class_id=c.id))
+    return names
+
+
+def meeting_class_names(db: Session, meeting_ids: list[int]) -> dict[int, list[str]]:
+    if not meeting_ids:
+        return {}
+    rows = (
+        db.query(ScheduledMeetingClass.scheduled_meeting_id, ExamClass.name)
+        .join(ExamClass, ExamClass.id == ScheduledMeetingClass.class_id)
+        .filter(ScheduledMeetingClass.scheduled_meeting_id.in_(meeting_ids))
+        .order_by(ExamClass.name.asc())
+        .all()
+    )
+    result: dict[int, list[str]] = {}
+    for meeting_id, name in rows:
+        result.setdefault(meeting_id, []).append(name)
+    return result
+
+
+def roster_status(db: Session, meeting: ScheduledMeeting) -> dict:
+    """Expected vs present vs absent for one meeting.
+
+    Single query: expected users (meeting classes -> memberships -> users)
+    LEFT JOIN attendance sessions on (join_code, user_id).
+    """
+    s = MeetingAttendanceSession
+    rows = (
+        db.query(
+            User.id,
+            User.email,
+            User.user_name,
+            User.class_name,
+            func.count(s.id).label("sessions"),
+            func.max(case((s.left_at.is_(None), 1), else_=0)).label("online"),
+            func.min(s.joined_at).label("first_joined_at"),
+        )
+        .select_from(ScheduledMeetingClass)
+        .join(UserClassMembership, UserClassMembership.class_id == ScheduledMeetingClass.class_id)
+        .join(User, User.id == UserClassMembership.user_id)
+        .outerjoin(s, and_(s.join_code == meeting.join_code, s.user_id == User.id))
+        .filter(ScheduledMeetingClass.scheduled_meeting_id == meeting.id)
+        .group_by(User.id, User.email, User.user_name, User.class_name)
+        .order_by(User.class_name.asc(), User.user_name.asc(), User.id.asc())
+        .all()
+    )
+
+    present: list[dict] = []
+    absent: list[dict] = []
+    for r in rows:
+        item = {
+            "id": r.id,
+            "username": r.email,
+            "display_name": r.user_name,
+            "class_name": r.class_name,
+            "first_joined_at": r.first_joined_at,
+            # Joined at some point but currently has no open session.
+            "disconnected": bool(r.sessions) and not r.online,
+        }
+        if r.sessions and r.online:
+            present.append(item)
+        else:
+            absent.append(item)
+
+    return {
+        "join_code": meeting.join_code,
+        "expected_count": len(rows),
+        "present_count": len(present),
+        "absent_count": len(absent),
+        "present": present,
+        "absent": absent,
+    }
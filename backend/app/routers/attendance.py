@@ -1,19 +1,50 @@
 from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from sqlalchemy import desc
 from sqlalchemy.orm import Session
 
-from ..auth import require_proctor
-from ..db import get_db
-from ..models import MeetingAttendanceSession
+from .. import flags, overview
+from ..archive import ATTENDANCE, archived_meeting, attendance_order, max_archived_id, read_archived
+from ..auth import get_optional_user, require_proctor
+from ..conditional import attendance_key, bump, cache_headers, etag_for, not_modified
+from ..db import get_db, get_read_db, route_read
+from ..models import MeetingAttendanceSession, User
+from ..responses import FastJSONResponse, rows_to_dicts
 
 
 router = APIRouter(tags=["attendance"])
 
 
+_ATTENDANCE_FIELDS = (
+    "id",
+    "join_code",
+    "chime_meeting_id",
+    "attendee_id",
+    "external_user_id",
+    "role",
+    "joined_at",
+    "left_at",
+    "duration_seconds",
+)
+
+
+# Projected columns, in output field order.
+_ATTENDANCE_COLUMNS = (
+    MeetingAttendanceSession.id,
+    MeetingAttendanceSession.join_code,
+    MeetingAttendanceSession.chime_meeting_id,
+    MeetingAttendanceSession.attendee_id,
+    MeetingAttendanceSession.external_user_id,
+    MeetingAttendanceSession.role,
+    MeetingAttendanceSession.joined_at,
+    MeetingAttendanceSession.left_at,
+    MeetingAttendanceSession.duration_seconds,
+)
+
+
 class AttendanceJoinRequest(BaseModel):
     join_code: str
     chime_meeting_id: Optional[str] = None
@@ -28,7 +59,11 @@ class AttendanceLeaveRequest(BaseModel):
 
 
 @router.post("/attendance/join")
-def attendance_join(request: AttendanceJoinRequest, db: Session = Depends(get_db)):
+def attendance_join(
+    request: AttendanceJoinRequest,
+    db: Session = Depends(get_db),
+    user: Optional[User] = Depends(get_optional_user),
+):
     join_code = (request.join_code or "").strip()
     attendee_id = (request.attendee_id or "").strip()
     if not join_code:
@@ -46,6 +81,11 @@ def attendance_join(request: AttendanceJoinRequest, db: Session = Depends(get_db
         .one_or_none()
     )
     if existing is not None:
+        if user is not None and existing.user_id is None:
+            existing.user_id = user.id
+            db.add(existing)
+            db.commit()
+            bump(attendance_key(join_code))
         return {
             "id": existing.id,
             "join_code": existing.join_code,
@@ -58,12 +98,16 @@ def attendance_join(request: AttendanceJoinRequest, db: Session = Depends(get_db
         chime_meeting_id=(request.chime_meeting_id or "").strip() or None,
         attendee_id=attendee_id,
         external_user_id=(request.external_user_id or "").strip() or None,
+        user_id=user.id if user is not None else None,
         role=(request.role or "examinee").strip() or "examinee",
         joined_at=datetime.utcnow(),
     )
     db.add(row)
     db.commit()
+    bump(attendance_key(join_code))
     db.refresh(row)
+    overview.record_join(join_code, row.role)
+    flags.record_join(db, join_code, attendee_id, row.external_user_id, row.role)
     return {"id": row.id, "join_code": row.join_code, "attendee_id": row.attendee_id, "joined_at": row.joined_at}
 
 
@@ -97,7 +141,10 @@ def attendance_leave(request: AttendanceLeaveRequest, db: Session = Depends(get_
 
     db.add(row)
     db.commit()
+    bump(attendance_key(join_code))
     db.refresh(row)
+    overview.record_leave(join_code, row.role)
+    flags.record_leave(db, join_code, attendee_id, row.external_user_id, row.role)
     return {
         "ok": True,
         "updated": True,
@@ -111,29 +158,33 @@ def attendance_leave(request: AttendanceLeaveRequest, db: Session = Depends(get_
 
 
 @router.get("/attendance/{join_code}")
-def list_attendance_sessions(join_code: str, user=Depends(require_proctor), db: Session = Depends(get_db)):
+def list_attendance_sessions(
+    join_code: str,
+    request: Request,
+    user=Depends(require_proctor),
+    db: Session = Depends(get_read_db),
+):
     code = (join_code or "").strip()
     if not code:
         raise HTTPException(status_code=400, detail="join_code is required")
 
-    rows = (
-        db.query(MeetingAttendanceSession)
+    etag = etag_for(request, attendance_key(code))
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    route_read(db, attendance_key(code))
+
+    archived = archived_meeting(db, code)
+    query = (
+        db.query(*_ATTENDANCE_COLUMNS)
         .filter(MeetingAttendanceSession.join_code == code)
-        .order_by(MeetingAttendanceSession.joined_at.asc())
-        .all()
+        .order_by(*attendance_order())
     )
-
-    return [
-        {
-            "id": r.id,
-            "join_code": r.join_code,
-            "chime_meeting_id": r.chime_meeting_id,
-            "attendee_id": r.attendee_id,
-            "external_user_id": r.external_user_id,
-            "role": r.role,
-            "joined_at": r.joined_at,
-            "left_at": r.left_at,
-            "duration_seconds": r.duration_seconds,
-        }
-        for r in rows
-    ]
+    if archived is None:
+        rows = query.all()
+    else:
+        # Archived meeting: rows from the archive file, then any written after archival.
+        rows = read_archived(archived, ATTENDANCE, _ATTENDANCE_COLUMNS)
+        rows += query.filter(MeetingAttendanceSession.id > max_archived_id(archived, ATTENDANCE)).all()
+
+    return FastJSONResponse(rows_to_dicts(rows, _ATTENDANCE_FIELDS), headers=cache_headers(etag))
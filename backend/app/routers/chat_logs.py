@@ -1,21 +1,57 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from .. import chat_search, flags, overview
+from ..archive import CHAT_LOGS, archived_meeting, chat_log_order, max_archived_id, read_archived
 from ..auth import require_proctor
-from ..db import get_db
+from ..conditional import bump, cache_headers, chat_logs_key, etag_for, not_modified
+from ..db import get_db, get_read_db, route_read
 from ..models import MeetingChatLog
+from ..responses import FastJSONResponse, rows_to_dicts
 
 
 router = APIRouter(tags=["chat-logs"])
 
 
+# Output field names, in the same order as the projected columns below.
+_CHAT_LOG_FIELDS = (
+    "id",
+    "join_code",
+    "message_id",
+    "ts",
+    "type",
+    "from_role",
+    "from_attendee_id",
+    "to_role",
+    "to_attendee_id",
+    "text",
+    "created_at",
+)
+
+
+# Projected columns, in output field order.
+_CHAT_LOG_COLUMNS = (
+    MeetingChatLog.id,
+    MeetingChatLog.join_code,
+    MeetingChatLog.message_id,
+    MeetingChatLog.sent_at,
+    MeetingChatLog.msg_type,
+    MeetingChatLog.from_role,
+    MeetingChatLog.from_attendee_id,
+    MeetingChatLog.to_role,
+    MeetingChatLog.to_attendee_id,
+    MeetingChatLog.text,
+    MeetingChatLog.created_at,
+)
+
+
 def _parse_iso_datetime(value: Optional[str]) -> Optional[datetime]:
     if not value:
         return None
@@ -80,7 +116,10 @@ def create_chat_log(request: ChatLogCreateRequest, db: Session = Depends(get_db)
     db.add(row)
     try:
         db.commit()
+        bump(chat_logs_key(join_code))
         db.refresh(row)
+        overview.record_chat(join_code, row.created_at)
+        flags.record_chat(db, join_code, row.from_role, row.from_attendee_id, row.to_role, row.to_attendee_id)
     except IntegrityError:
         # Idempotent on (join_code, message_id)
         db.rollback()
@@ -109,11 +148,55 @@ def create_chat_log(request: ChatLogCreateRequest, db: Session = Depends(get_db)
     }
 
 
+@router.get("/chat-logs/search")
+def search_chat_logs(
+    user=Depends(require_proctor),
+    db: Session = Depends(get_read_db),
+    q: str = Query(..., min_length=1, max_length=200),
+    join_code: Optional[str] = Query(None, max_length=64),
+    role: Optional[Literal["proctor", "examinee"]] = Query(None),
+    since: Optional[str] = Query(None),
+    until: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0, le=10000),
+):
+    words = chat_search.query_words(q)
+    if not words:
+        raise HTTPException(status_code=400, detail="q needs at least one word of 2+ characters")
+    code = (join_code or "").strip() or None
+    since_at = _parse_iso_datetime(since)
+    until_at = _parse_iso_datetime(until)
+    if (since and since_at is None) or (until and until_at is None):
+        raise HTTPException(status_code=400, detail="since / until must be ISO 8601 datetimes")
+
+    route_read(db, *([chat_logs_key(code)] if code else []))
+    result = chat_search.search(
+        db,
+        _CHAT_LOG_COLUMNS,
+        words,
+        join_code=code,
+        role=role,
+        since=since_at,
+        until=until_at,
+        limit=limit,
+        offset=offset,
+    )
+    rows = result.rows
+    headers = {}
+    if result.truncated:
+        headers["X-Search-Truncated"] = "true"
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Offset"] = str(offset + limit)
+    return FastJSONResponse(rows_to_dicts(rows, _CHAT_LOG_FIELDS + ("score",)), headers=headers)
+
+
 @router.get("/chat-logs/{join_code}")
 def list_chat_logs(
     join_code: str,
+    request: Request,
     user=Depends(require_proctor),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     limit: int = Query(500, ge=1, le=5000),
     offset: int = Query(0, ge=0),
 ):
@@ -121,33 +204,24 @@ def list_chat_logs(
     if not code:
         raise HTTPException(status_code=400, detail="join_code is required")
 
-    rows = (
-        db.query(MeetingChatLog)
+    etag = etag_for(request, chat_logs_key(code))
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    route_read(db, chat_logs_key(code))
+
+    archived = archived_meeting(db, code)
+    query = (
+        db.query(*_CHAT_LOG_COLUMNS)
         .filter(MeetingChatLog.join_code == code)
-        .order_by(
-            MeetingChatLog.sent_at.is_(None).asc(),
-            MeetingChatLog.sent_at.asc(),
-            MeetingChatLog.created_at.asc(),
-            MeetingChatLog.id.asc(),
-        )
-        .offset(offset)
-        .limit(limit)
-        .all()
+        .order_by(*chat_log_order())
     )
-
-    return [
-        {
-            "id": r.id,
-            "join_code": r.join_code,
-            "message_id": r.message_id,
-            "ts": r.sent_at,
-            "type": r.msg_type,
-            "from_role": r.from_role,
-            "from_attendee_id": r.from_attendee_id,
-            "to_role": r.to_role,
-            "to_attendee_id": r.to_attendee_id,
-            "text": r.text,
-            "created_at": r.created_at,
-        }
-        for r in rows
-    ]
+    if archived is None:
+        rows = query.offset(offset).limit(limit).all()
+    else:
+        # Archived meeting: rows from the archive file, then any written after archival.
+        rows = read_archived(archived, CHAT_LOGS, _CHAT_LOG_COLUMNS)
+        rows += query.filter(MeetingChatLog.id > max_archived_id(archived, CHAT_LOGS)).all()
+        rows = rows[offset : offset + limit]
+
+    return FastJSONResponse(rows_to_dicts(rows, _CHAT_LOG_FIELDS), headers=cache_headers(etag))
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..auth import require_proctor
+from ..db import get_db
+from ..models import ExamClass, UserClassMembership
+
+router = APIRouter(tags=["classes"])
+
+
+@router.get("/classes")
+def list_classes(
+    _user=Depends(require_proctor),
+    db: Session = Depends(get_db),
+):
+    rows = (
+        db.query(ExamClass.id, ExamClass.name, func.count(UserClassMembership.user_id).label("member_count"))
+        .outerjoin(UserClassMembership, UserClassMembership.class_id == ExamClass.id)
+        .group_by(ExamClass.id, ExamClass.name)
+        .order_by(ExamClass.name.asc())
+        .all()
+    )
+    return [{"id": r.id, "name": r.name, "member_count": r.member_count} for r in rows]
@@ -4,14 +4,20 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from ..admission import admit
 from ..auth import get_current_user_record
 from ..chime_client import (
     _get_or_create_chime_meeting,
     active_meetings,
+    attendee_cache,
+    create_attendee_cached,
     get_chime_client,
+    meeting_status,
 )
+from ..conditional import MEETING_STATUS, SCHEDULED_MEETINGS, bump
 from ..db import get_db
 from ..models import ScheduledMeeting, User
+from ..resilience import NOT_FOUND, classify, http_exception
 
 router = APIRouter(tags=["meetings"])
 
@@ -54,6 +60,12 @@ def guest_join_meeting(
         if scheduled.status != "started" or not scheduled.chime_meeting_id:
             raise HTTPException(status_code=403, detail="Meeting not started")
 
+        # Reconnect: served from the cache without calling Chime (or admission).
+        cached = attendee_cache.get(scheduled.chime_meeting_id, external_user_id)
+        if cached is not None and cached.get("Meeting"):
+            return cached
+
+        admit(scheduled.join_code)
         resp = _get_or_create_chime_meeting(
             external_meeting_id=scheduled.join_code,
             region=scheduled.region,
@@ -69,13 +81,9 @@ def guest_join_meeting(
             scheduled.chime_meeting_id = meeting_id
             db.add(scheduled)
             db.commit()
+            bump(MEETING_STATUS)
 
-        try:
-            attendee_resp = client.create_attendee(MeetingId=meeting_id, ExternalUserId=external_user_id)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-
-        return {"Meeting": meeting_obj, "Attendee": attendee_resp.get("Attendee")}
+        return create_attendee_cached(meeting_id, external_user_id, meeting_obj)
 
     # Legacy unscheduled meeting: only join if it already exists in cache.
     cached = active_meetings.get(external_id)
@@ -84,21 +92,23 @@ def guest_join_meeting(
 
     cached_meeting_id = (cached.get("Meeting") or {}).get("MeetingId")
     if not cached_meeting_id:
-        active_meetings.pop(external_id, None)
+        active_meetings.discard(external_id, None)
         raise HTTPException(status_code=404, detail="Meeting not found")
 
-    try:
-        client.get_meeting(MeetingId=cached_meeting_id)
-    except Exception:
-        active_meetings.pop(external_id, None)
-        raise HTTPException(status_code=404, detail="Meeting not found")
+    cached_attendee = attendee_cache.get(cached_meeting_id, external_user_id)
+    if cached_attendee is not None and cached_attendee.get("Meeting"):
+        return cached_attendee
 
+    admit(external_id)
     try:
-        attendee_resp = client.create_attendee(MeetingId=cached_meeting_id, ExternalUserId=external_user_id)
+        client.get_meeting(MeetingId=cached_meeting_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        if classify(e) == NOT_FOUND:
+            active_meetings.discard(external_id, cached_meeting_id)
+            attendee_cache.forget_meeting(cached_meeting_id)
+        raise http_exception(e)
 
-    return {"Meeting": cached.get("Meeting"), "Attendee": attendee_resp.get("Attendee")}
+    return create_attendee_cached(cached_meeting_id, external_user_id, cached.get("Meeting"))
 
 
 @router.post("/meetings")
@@ -121,6 +131,7 @@ def create_meeting(
             if scheduled.status == "ended":
                 raise HTTPException(status_code=400, detail="Meeting already ended")
 
+            admit(scheduled.join_code, proctor=True)
             resp = _get_or_create_chime_meeting(
                 external_meeting_id=scheduled.join_code,
                 region=scheduled.region,
@@ -132,6 +143,8 @@ def create_meeting(
             scheduled.status = "started"
             db.add(scheduled)
             db.commit()
+            bump(SCHEDULED_MEETINGS, MEETING_STATUS)
+            meeting_status.put(scheduled.chime_meeting_id, scheduled.join_code, scheduled.status)
             return resp
 
         # Examinee (or other users) can join only after started.
@@ -140,6 +153,7 @@ def create_meeting(
         if scheduled.status != "started" or not scheduled.chime_meeting_id:
             raise HTTPException(status_code=403, detail="Meeting not started")
 
+        admit(scheduled.join_code)
         resp = _get_or_create_chime_meeting(
             external_meeting_id=scheduled.join_code,
             region=scheduled.region,
@@ -150,18 +164,25 @@ def create_meeting(
             scheduled.chime_meeting_id = meeting_obj.get("MeetingId")
             db.add(scheduled)
             db.commit()
+            bump(MEETING_STATUS)
         return resp
 
-    # Unscheduled (legacy) behavior: in-memory cache
-    if external_id in active_meetings:
-        cached = active_meetings[external_id]
+    # Unscheduled (legacy) behavior: meeting registry shared by all workers
+    admit(external_id, proctor=user.get("role") == "proctor")
+    cached = active_meetings.get(external_id)
+    if cached is not None:
         try:
             cached_meeting_id = cached.get("Meeting", {}).get("MeetingId")
             if cached_meeting_id:
                 client.get_meeting(MeetingId=cached_meeting_id)
                 return cached
-        except Exception:
-            active_meetings.pop(external_id, None)
+            active_meetings.discard(external_id, None)
+        except Exception as e:
+            if classify(e) != NOT_FOUND:
+                # Don't replace a live meeting because AWS is throttling.
+                raise http_exception(e)
+            active_meetings.discard(external_id, cached_meeting_id)
+            attendee_cache.forget_meeting(cached_meeting_id)
 
     try:
         response = client.create_meeting(
@@ -169,10 +190,10 @@ def create_meeting(
             MediaRegion=request.region,
             ExternalMeetingId=external_id,
         )
-        active_meetings[external_id] = response
-        return response
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_exception(e)
+    # Concurrent creates (any worker): everyone uses the first registered meeting.
+    return active_meetings.setdefault(external_id, response)
 
 
 @router.post("/meetings/{meeting_id}/attendees")
@@ -182,19 +203,16 @@ def create_attendee(
     user: dict = Depends(get_current_user_record),
     db: Session = Depends(get_db),
 ):
-    client = get_chime_client()
-
     # If this MeetingId belongs to an ended scheduled meeting, block re-join.
-    scheduled = (
-        db.query(ScheduledMeeting)
-        .filter(ScheduledMeeting.chime_meeting_id == meeting_id)
-        .one_or_none()
-    )
+    # Join storms hit the per-worker map, not scheduled_meetings.
+    scheduled = meeting_status.lookup(db, meeting_id)
     if scheduled is not None and scheduled.status == "ended":
         raise HTTPException(status_code=403, detail="Meeting ended")
 
-    try:
-        response = client.create_attendee(MeetingId=meeting_id, ExternalUserId=request.external_user_id)
-        return response
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    cached = attendee_cache.get(meeting_id, request.external_user_id)
+    if cached is not None:
+        return {"Attendee": cached["Attendee"]}
+
+    admit(scheduled.join_code if scheduled is not None else meeting_id, proctor=user.get("role") == "proctor")
+    joined = create_attendee_cached(meeting_id, request.external_user_id)
+    return {"Attendee": joined["Attendee"]}
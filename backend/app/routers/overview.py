@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from ..auth import require_proctor
+from ..db import get_db
+from ..overview import overview
+from ..responses import FastJSONResponse
+
+
+router = APIRouter(tags=["overview"])
+
+
+@router.get("/overview")
+def get_overview(
+    user=Depends(require_proctor),
+    db: Session = Depends(get_db),
+):
+    # Counters first, tables only when the meeting list changed or to reconcile (app/overview.py).
+    return FastJSONResponse(overview.snapshot(db))
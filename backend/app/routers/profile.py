@@ -5,8 +5,10 @@ from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from ..auth import get_current_user_record
+from ..conditional import USERS, bump
 from ..db import get_db
 from ..models import User
+from ..rosters import set_user_class
 
 router = APIRouter(tags=["profile"])
 
@@ -56,7 +58,9 @@ def upsert_profile(
 
     record.user_name = display_name
     db.add(record)
+    set_user_class(db, record, record.class_name)
     db.commit()
+    bump(USERS)
     db.refresh(record)
 
     return {
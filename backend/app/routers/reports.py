@@ -0,0 +1,50 @@
+import os
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, RedirectResponse
+from sqlalchemy.orm import Session
+
+from ..auth import require_proctor
+from ..db import get_db
+from ..models import ReportJob
+from ..reports import CONTENT_TYPES, DONE, JSON, artifact_path, download_url, effective_status, job_view
+from ..responses import FastJSONResponse
+
+
+router = APIRouter(tags=["reports"])
+
+
+def _job_or_404(db: Session, job_id: str) -> ReportJob:
+    job = db.get(ReportJob, (job_id or "").strip())
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+
+@router.get("/reports/{job_id}")
+def get_report_job(
+    job_id: str,
+    user=Depends(require_proctor),
+    db: Session = Depends(get_db),
+):
+    # Primary: polled right after the job row was written.
+    return FastJSONResponse(job_view(_job_or_404(db, job_id)))
+
+
+@router.get("/reports/{job_id}/download")
+def download_report(
+    job_id: str,
+    user=Depends(require_proctor),
+    db: Session = Depends(get_db),
+    format: Literal["json", "zip"] = Query(JSON),
+):
+    job = _job_or_404(db, job_id)
+    if effective_status(job) != DONE:
+        raise HTTPException(status_code=409, detail=f"Report is {effective_status(job)}")
+    if job.storage == "s3":
+        return RedirectResponse(download_url(job, format), status_code=307)
+    path = artifact_path(job, format)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Report artifact not found")
+    return FileResponse(path, media_type=CONTENT_TYPES[format], filename=f"report-{job.join_code}.{format}")
@@ -1,8 +1,27 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+
+from ..health import monitor
+from ..responses import FastJSONResponse
 
 router = APIRouter(tags=["root"])
 
+# Probe results change between polls; never serve them from a cache.
+_NO_STORE = {"Cache-Control": "no-store"}
+
 
 @router.get("/")
 def read_root():
     return {"message": "Exam Surveillance API is running"}
+
+
+@router.get("/healthz")
+async def healthz():
+    """Liveness (always 200 while serving) with the last dependency probe results."""
+    return Response(content=monitor.health(), media_type="application/json", headers=_NO_STORE)
+
+
+@router.get("/readyz")
+async def readyz():
+    """Readiness: started, not shutting down, and critical probes passing."""
+    status_code, body = monitor.readiness()
+    return FastJSONResponse(body, status_code=status_code, headers=_NO_STORE)
@@ -1,22 +1,45 @@
 from datetime import datetime
+import logging
 import os
 import re
 import uuid
 from typing import Optional
 
-import boto3
-from botocore.config import Config
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from .. import audit
+from ..admission import admit
 from ..auth import get_current_user_record, require_proctor
-from ..chime_client import _generate_join_code, _get_or_create_chime_meeting, get_chime_client
-from ..db import get_db
-from ..models import ScheduledMeeting
+from ..aws_clients import get_s3
+from ..chime_client import (
+    _generate_join_code,
+    _get_or_create_chime_meeting,
+    attendee_cache,
+    get_chime_client,
+    meeting_status,
+)
+from ..conditional import (
+    MEETING_STATUS,
+    SCHEDULED_MEETINGS,
+    attendance_key,
+    bump,
+    cache_headers,
+    etag_for,
+    flags_key,
+    not_modified,
+)
+from ..db import get_db, get_read_db, route_read
+from ..models import MeetingAttendanceSession, MeetingFlag, ScheduledMeeting, ScheduledMeetingClass
+from ..reports import REPORTS_ON_END, job_view, request_report
+from ..responses import FastJSONResponse, rows_to_dicts
+from ..rosters import meeting_class_names, roster_status, set_meeting_classes
 
 router = APIRouter(tags=["scheduled-meetings"])
 
+log = logging.getLogger(__name__)
+
 
 class ScheduledMeetingCreateRequest(BaseModel):
     title: Optional[str] = None
@@ -24,6 +47,8 @@ class ScheduledMeetingCreateRequest(BaseModel):
     scheduled_start_at: Optional[datetime] = None
     scheduled_end_at: Optional[datetime] = None
     region: str = "us-east-1"
+    # Expected examinee classes (roster); optional
+    class_names: Optional[list[str]] = None
 
 
 class ScheduledMeetingUpdateRequest(BaseModel):
@@ -31,6 +56,7 @@ class ScheduledMeetingUpdateRequest(BaseModel):
     teacher_name: Optional[str] = None
     scheduled_start_at: Optional[datetime] = None
     scheduled_end_at: Optional[datetime] = None
+    class_names: Optional[list[str]] = None
 
 
 class ScheduledMeetingResponse(BaseModel):
@@ -41,6 +67,7 @@ class ScheduledMeetingResponse(BaseModel):
     scheduled_end_at: Optional[datetime] = None
     region: str
     status: str
+    class_names: list[str] = []
 
 
 class ScheduledMeetingStartResponse(BaseModel):
@@ -99,8 +126,14 @@ def create_scheduled_meeting(
         status="scheduled",
     )
     db.add(row)
+    db.flush()
+    class_names = set_meeting_classes(db, row, request.class_names or [])
     db.commit()
+    bump(SCHEDULED_MEETINGS)
     db.refresh(row)
+    audit.record(
+        user, "scheduled_meeting.create", audit.SCHEDULED_MEETING, row.join_code, title=row.title, class_names=class_names
+    )
 
     return ScheduledMeetingResponse(
         join_code=row.join_code,
@@ -110,31 +143,59 @@ def create_scheduled_meeting(
         scheduled_end_at=row.scheduled_end_at,
         region=row.region,
         status=row.status,
+        class_names=class_names,
     )
 
 
 @router.get("/scheduled-meetings", response_model=list[ScheduledMeetingResponse])
 def list_scheduled_meetings(
+    request: Request,
     user=Depends(get_current_user_record),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     # MVP: proctor can list scheduled meetings. examinee gets empty.
     if user.get("role") != "proctor":
         return []
 
-    rows = db.query(ScheduledMeeting).order_by(ScheduledMeeting.created_at.desc()).all()
-    return [
-        ScheduledMeetingResponse(
-            join_code=r.join_code,
-            title=r.title,
-            teacher_name=getattr(r, "teacher_name", None),
-            scheduled_start_at=r.scheduled_start_at,
-            scheduled_end_at=r.scheduled_end_at,
-            region=r.region,
-            status=r.status,
+    etag = etag_for(request, SCHEDULED_MEETINGS)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    route_read(db, SCHEDULED_MEETINGS)
+
+    # response_model documents the shape; rows are projected and serialized
+    # directly instead of being hydrated and re-validated.
+    rows = (
+        db.query(
+            ScheduledMeeting.id,
+            ScheduledMeeting.join_code,
+            ScheduledMeeting.title,
+            ScheduledMeeting.teacher_name,
+            ScheduledMeeting.scheduled_start_at,
+            ScheduledMeeting.scheduled_end_at,
+            ScheduledMeeting.region,
+            ScheduledMeeting.status,
         )
-        for r in rows
-    ]
+        .order_by(ScheduledMeeting.created_at.desc())
+        .all()
+    )
+    class_names = meeting_class_names(db, [r.id for r in rows])
+    return FastJSONResponse(
+        [
+            {
+                "join_code": r.join_code,
+                "title": r.title,
+                "teacher_name": r.teacher_name,
+                "scheduled_start_at": r.scheduled_start_at,
+                "scheduled_end_at": r.scheduled_end_at,
+                "region": r.region,
+                "status": r.status,
+                "class_names": class_names.get(r.id, []),
+            }
+            for r in rows
+        ],
+        headers=cache_headers(etag),
+    )
 
 
 @router.post("/scheduled-meetings/{join_code}/start", response_model=ScheduledMeetingStartResponse)
@@ -149,6 +210,7 @@ def start_scheduled_meeting(
     if row.status == "ended":
         raise HTTPException(status_code=400, detail="Meeting already ended")
 
+    admit(row.join_code, proctor=True)
     resp = _get_or_create_chime_meeting(
         external_meeting_id=row.join_code,
         region=row.region,
@@ -158,13 +220,45 @@ def start_scheduled_meeting(
     meeting_obj = resp.get("Meeting") or {}
     if meeting_obj.get("MeetingId"):
         row.chime_meeting_id = meeting_obj.get("MeetingId")
+    previous_status = row.status
     row.status = "started"
     db.add(row)
     db.commit()
+    bump(SCHEDULED_MEETINGS, MEETING_STATUS)
+    meeting_status.put(row.chime_meeting_id, row.join_code, row.status)
+    audit.record(
+        user,
+        "scheduled_meeting.start",
+        audit.SCHEDULED_MEETING,
+        row.join_code,
+        previous_status=previous_status,
+        chime_meeting_id=row.chime_meeting_id,
+    )
 
     return ScheduledMeetingStartResponse(join_code=row.join_code, meeting=resp)
 
 
+def _close_open_sessions(db: Session, join_code: str) -> int:
+    """Close the attendance sessions still open when the exam ends.
+
+    Ending deletes the Chime meeting, so everyone leaves now; recording it here
+    means the report queued on end is complete (no `open` examinees) and
+    isn't made stale by the clients' own /attendance/leave calls, which then
+    find nothing to close. No flags: leaving at the end isn't an absence.
+    """
+    now = datetime.utcnow()
+    rows = (
+        db.query(MeetingAttendanceSession)
+        .filter(MeetingAttendanceSession.join_code == join_code)
+        .filter(MeetingAttendanceSession.left_at.is_(None))
+        .all()
+    )
+    for session in rows:
+        session.left_at = now
+        session.duration_seconds = max(0, int((now - (session.joined_at or now)).total_seconds()))
+    return len(rows)
+
+
 @router.post("/scheduled-meetings/{join_code}/end", response_model=ScheduledMeetingEndResponse)
 def end_scheduled_meeting(
     join_code: str,
@@ -181,10 +275,16 @@ def end_scheduled_meeting(
 
     row.status = "ended"
     db.add(row)
+    closed = _close_open_sessions(db, row.join_code)
     db.commit()
+    bump(SCHEDULED_MEETINGS, MEETING_STATUS)
+    if closed:
+        bump(attendance_key(row.join_code))
 
     chime_deleted = False
     meeting_id = (row.chime_meeting_id or "").strip()
+    meeting_status.put(meeting_id, row.join_code, row.status)
+    attendee_cache.forget_meeting(meeting_id)
     if meeting_id:
         try:
             client = get_chime_client()
@@ -193,6 +293,14 @@ def end_scheduled_meeting(
         except Exception:
             # Best-effort: DB gate is the source of truth.
             chime_deleted = False
+    audit.record(user, "scheduled_meeting.end", audit.SCHEDULED_MEETING, row.join_code, chime_deleted=chime_deleted)
+
+    if REPORTS_ON_END:
+        # Precompute the review report; best-effort like the Chime cleanup.
+        try:
+            request_report(db, row.join_code, user_id=user["user"].id)
+        except Exception as e:
+            log.warning("failed to queue report for %s: %s", row.join_code, e)
 
     return ScheduledMeetingEndResponse(join_code=row.join_code, status=row.status, chime_deleted=chime_deleted)
 
@@ -209,8 +317,17 @@ def delete_scheduled_meeting(
     if row.created_by_user_id != user["user"].id:
         raise HTTPException(status_code=403, detail="Not allowed")
 
+    db.query(ScheduledMeetingClass).filter(ScheduledMeetingClass.scheduled_meeting_id == row.id).delete(
+        synchronize_session=False
+    )
+    meeting_id = row.chime_meeting_id
+    title, status = row.title, row.status
     db.delete(row)
     db.commit()
+    bump(SCHEDULED_MEETINGS, MEETING_STATUS)
+    meeting_status.forget(meeting_id)
+    attendee_cache.forget_meeting(meeting_id)
+    audit.record(user, "scheduled_meeting.delete", audit.SCHEDULED_MEETING, join_code, title=title, status=status)
     return {"ok": True}
 
 
@@ -242,10 +359,18 @@ def update_scheduled_meeting(
         row.scheduled_start_at = request.scheduled_start_at
     if "scheduled_end_at" in fields_set:
         row.scheduled_end_at = request.scheduled_end_at
+    changes = {}
+    if "class_names" in fields_set:
+        changes["class_names"] = set_meeting_classes(db, row, request.class_names or [])
 
     db.add(row)
     db.commit()
+    bump(SCHEDULED_MEETINGS)
     db.refresh(row)
+    for field in ("title", "teacher_name", "scheduled_start_at", "scheduled_end_at"):
+        if field in fields_set:
+            changes[field] = getattr(row, field)
+    audit.record(user, "scheduled_meeting.update", audit.SCHEDULED_MEETING, row.join_code, changes=changes)
 
     return ScheduledMeetingResponse(
         join_code=row.join_code,
@@ -255,6 +380,89 @@ def update_scheduled_meeting(
         scheduled_end_at=row.scheduled_end_at,
         region=row.region,
         status=row.status,
+        class_names=meeting_class_names(db, [row.id]).get(row.id, []),
+    )
+
+
+@router.get("/scheduled-meetings/{join_code}/roster-status")
+def get_roster_status(
+    join_code: str,
+    user=Depends(require_proctor),
+    db: Session = Depends(get_db),
+):
+    row = db.query(ScheduledMeeting).filter(ScheduledMeeting.join_code == join_code).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Scheduled meeting not found")
+
+    return roster_status(db, row)
+
+
+_FLAG_FIELDS = (
+    "id",
+    "kind",
+    "attendee_id",
+    "external_user_id",
+    "related_attendee_id",
+    "event_count",
+    "first_event_at",
+    "last_event_at",
+    "created_at",
+)
+
+# Projected columns, in output field order.
+_FLAG_COLUMNS = (
+    MeetingFlag.id,
+    MeetingFlag.kind,
+    MeetingFlag.attendee_id,
+    MeetingFlag.external_user_id,
+    MeetingFlag.related_attendee_id,
+    MeetingFlag.event_count,
+    MeetingFlag.first_event_at,
+    MeetingFlag.last_event_at,
+    MeetingFlag.created_at,
+)
+
+
+@router.get("/scheduled-meetings/{join_code}/flags")
+def list_meeting_flags(
+    join_code: str,
+    request: Request,
+    user=Depends(require_proctor),
+    db: Session = Depends(get_read_db),
+    kind: Optional[str] = Query(None, max_length=32),
+    after_id: Optional[int] = Query(None, ge=0),
+):
+    code = (join_code or "").strip()
+    etag = etag_for(request, flags_key(code))
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    route_read(db, flags_key(code))
+
+    # Legacy join codes have flags too, so no scheduled-meeting lookup.
+    query = db.query(*_FLAG_COLUMNS).filter(MeetingFlag.join_code == code)
+    if kind:
+        query = query.filter(MeetingFlag.kind == kind)
+    if after_id is not None:
+        query = query.filter(MeetingFlag.id > after_id)
+    rows = query.order_by(MeetingFlag.id.asc()).all()
+    return FastJSONResponse(rows_to_dicts(rows, _FLAG_FIELDS), headers=cache_headers(etag))
+
+
+@router.post("/scheduled-meetings/{join_code}/report")
+def create_meeting_report(
+    join_code: str,
+    user=Depends(require_proctor),
+    db: Session = Depends(get_db),
+    force: bool = Query(False),
+):
+    row = db.query(ScheduledMeeting).filter(ScheduledMeeting.join_code == join_code).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Scheduled meeting not found")
+
+    job, created = request_report(db, row.join_code, user_id=user["user"].id, force=force)
+    return FastJSONResponse(
+        job_view(job), status_code=202 if created else 200, headers={"Location": f"/reports/{job.id}"}
     )
 
 
@@ -282,11 +490,10 @@ def presign_proctor_recording_upload(
     safe_name = _safe_filename(request.file_name or "")
     key = f"proctor-recordings/{join_code}/{uuid.uuid4().hex}-{safe_name}"
 
-    s3 = boto3.client(
-        "s3",
-        region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"),
-        config=Config(signature_version="s3v4"),
-    )
+    try:
+        s3 = get_s3()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to presign upload url: {e}")
     expires_in = 15 * 60
     try:
         url = s3.generate_presigned_url(
@@ -1,18 +1,27 @@
 from typing import Literal, Optional
 
-import boto3
-from botocore.exceptions import ClientError
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
+from .. import audit
 from ..auth import COGNITO_REGION, COGNITO_USER_POOL_ID, require_proctor
-from ..db import get_db
-from ..models import ScheduledMeeting, User
+from ..aws_clients import get_cognito
+from ..conditional import USERS, bump, cache_headers, etag_for, not_modified
+from ..db import get_db, get_read_db, route_read
+from ..models import ScheduledMeeting, User, UserClassMembership
+from ..resilience import http_exception, is_unavailable
+from ..responses import FastJSONResponse, rows_to_dicts
+from ..rosters import set_user_class
 
 router = APIRouter(tags=["users"])
 
 
+# Wire names (legacy: username/display_name), in projected column order.
+_USER_FIELDS = ("id", "username", "role", "display_name", "class_name", "created_at", "updated_at")
+
+
 class InviteUserRequest(BaseModel):
     email: str
     role: Literal["proctor", "examinee"]
@@ -32,32 +41,79 @@ def _normalize_email(value: str) -> str:
     return s
 
 
+def _like_prefix(value: str) -> str:
+    # Escape LIKE wildcards so user input is always a literal prefix.
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
+
 @router.get("/users")
 def list_users(
+    request: Request,
     _user=Depends(require_proctor),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    role: Optional[Literal["proctor", "examinee"]] = Query(None),
+    class_name: Optional[str] = Query(None, max_length=255),
+    q: Optional[str] = Query(None, max_length=255),
+    after_id: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
 ):
-    users = db.query(User).order_by(User.id.asc()).all()
-    result = []
-    for u in users:
-        result.append(
-            {
-                "id": u.id,
-                "username": u.email,
-                "role": u.role,
-                "display_name": u.user_name,
-                "class_name": u.class_name,
-                "created_at": u.created_at.isoformat() if u.created_at else None,
-                "updated_at": u.updated_at.isoformat() if u.updated_at else None,
-            }
+    etag = etag_for(request, USERS)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    route_read(db, USERS)
+
+    # Project only the columns we serialize (no ORM identity-map hydration).
+    query = db.query(
+        User.id,
+        User.email,
+        User.role,
+        User.user_name,
+        User.class_name,
+        User.created_at,
+        User.updated_at,
+    )
+
+    if role is not None:
+        query = query.filter(User.role == role)
+
+    if class_name is not None:
+        query = query.filter(User.class_name == ((class_name or "").strip() or None))
+
+    prefix = (q or "").strip()
+    if prefix:
+        pattern = _like_prefix(prefix)
+        # email is stored lower-cased; user_name is matched as typed.
+        query = query.filter(
+            or_(
+                User.email.like(pattern.lower(), escape="\\"),
+                User.user_name.like(pattern, escape="\\"),
+            )
         )
-    return result
+
+    # Keyset pagination on the primary key (stable under concurrent inserts).
+    if after_id is not None:
+        query = query.filter(User.id > after_id)
+
+    query = query.order_by(User.id.asc())
+    if limit is not None:
+        # Fetch one extra row to know whether another page exists.
+        query = query.limit(limit + 1)
+
+    rows = query.all()
+    headers = cache_headers(etag)
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-After-Id"] = str(rows[-1].id)
+
+    return FastJSONResponse(rows_to_dicts(rows, _USER_FIELDS), headers=headers)
 
 
 @router.post("/users")
 def invite_user(
     request: InviteUserRequest,
-    _user=Depends(require_proctor),
+    user=Depends(require_proctor),
     db: Session = Depends(get_db),
 ):
     if not COGNITO_USER_POOL_ID:
@@ -66,9 +122,11 @@ def invite_user(
     email = _normalize_email(request.email)
     role = request.role
 
-    client = boto3.client("cognito-idp", region_name=COGNITO_REGION)
+    # botocore is imported lazily (with the client) to keep worker import cheap.
+    from botocore.exceptions import ClientError
 
     try:
+        client = get_cognito(COGNITO_REGION)
         client.admin_create_user(
             UserPoolId=COGNITO_USER_POOL_ID,
             Username=email,
@@ -82,19 +140,28 @@ def invite_user(
         code = (e.response or {}).get("Error", {}).get("Code")
         if code == "UsernameExistsException":
             raise HTTPException(status_code=409, detail="User already exists")
+        if is_unavailable(e):
+            raise http_exception(e)
         raise HTTPException(status_code=500, detail=f"Cognito error: {code or 'unknown'}")
-    except Exception:
+    except Exception as e:
+        if is_unavailable(e):
+            raise http_exception(e)
         raise HTTPException(status_code=500, detail="Failed to create Cognito user")
 
     record = db.query(User).filter(User.email == email).one_or_none()
+    previous_role = None
     if record is None:
         record = User(email=email, role=role)
     else:
+        previous_role = record.role
         record.role = role
 
     db.add(record)
+    set_user_class(db, record, record.class_name)
     db.commit()
+    bump(USERS)
     db.refresh(record)
+    audit.record(user, "user.invite", audit.USER, record.email, role=record.role, previous_role=previous_role)
 
     return {
         "ok": True,
@@ -132,18 +199,30 @@ def delete_user(
     if has_meetings:
         raise HTTPException(status_code=409, detail="User has scheduled meetings")
 
-    client = boto3.client("cognito-idp", region_name=COGNITO_REGION)
+    from botocore.exceptions import ClientError
+
     try:
+        client = get_cognito(COGNITO_REGION)
         client.admin_delete_user(UserPoolId=COGNITO_USER_POOL_ID, Username=normalized)
     except ClientError as e:
         code = (e.response or {}).get("Error", {}).get("Code")
         if code != "UserNotFoundException":
+            if is_unavailable(e):
+                raise http_exception(e)
             raise HTTPException(status_code=500, detail=f"Cognito error: {code or 'unknown'}")
-    except Exception:
+    except Exception as e:
+        if is_unavailable(e):
+            raise http_exception(e)
         raise HTTPException(status_code=500, detail="Failed to delete Cognito user")
 
+    db.query(UserClassMembership).filter(UserClassMembership.user_id == record.id).delete(
+        synchronize_session=False
+    )
+    role = record.role
     db.delete(record)
     db.commit()
+    bump(USERS)
+    audit.record(user, "user.delete", audit.USER, normalized, role=role)
 
     return {"ok": True}
 
@@ -162,6 +241,7 @@ def update_user(
     if record is None:
         raise HTTPException(status_code=404, detail="User not found")
 
+    before = {"role": record.role, "class_name": record.class_name}
     if request.role is not None:
         if current_email and normalized == current_email and request.role != record.role:
             raise HTTPException(status_code=400, detail="You cannot change your own role")
@@ -176,8 +256,15 @@ def update_user(
         record.class_name = None
 
     db.add(record)
+    set_user_class(db, record, record.class_name)
     db.commit()
+    bump(USERS)
     db.refresh(record)
+    # {field: [before, after]} of what actually changed.
+    changes = {k: [v, getattr(record, k)] for k, v in before.items() if getattr(record, k) != v}
+    if changes:
+        action = "user.role_change" if "role" in changes else "user.update"
+        audit.record(user, action, audit.USER, record.email, changes=changes)
 
     return {
         "id": record.id,
@@ -0,0 +1,56 @@
+"""Seed dev-friendly default users (idempotent, opt-in).
+
+Usage: `python -m app.seed` (after migrations have run).
+"""
+
+from .db import SessionLocal
+from .models import User
+
+
+# Note: the app's role vocabulary is 'proctor' | 'examinee'.
+SEED_USERS = [
+    {
+        "email": "fukukaranimube+proctor@gmail.com",
+        "role": "proctor",
+        "user_name": "山田太郎",
+    },
+    {
+        "email": "fukukaranimube+student@gmail.com",
+        # System uses 'examinee' for students.
+        "role": "examinee",
+        "user_name": "田中花子",
+    },
+]
+
+
+def seed_default_users() -> int:
+    created = 0
+    with SessionLocal.begin() as db:
+        for u in SEED_USERS:
+            email = str(u.get("email") or "").strip().lower()
+            role = str(u.get("role") or "").strip() or "examinee"
+            user_name = (str(u.get("user_name") or "").strip() or None)
+
+            if not email:
+                continue
+
+            record = db.query(User).filter(User.email == email).one_or_none()
+            if record is None:
+                db.add(User(email=email, role=role, user_name=user_name))
+                created += 1
+            else:
+                # Don't overwrite existing role/name; only fill missing display name.
+                if record.user_name is None and user_name is not None:
+                    record.user_name = user_name
+                    db.add(record)
+    return created
+
+
+if __name__ == "__main__":
+    from .db import init_db
+    from .logs import configure_logging
+
+    configure_logging(background=False)
+
+    init_db()
+    print(f"Seeded {seed_default_users()} user(s)")
@@ -0,0 +1,339 @@
+"""State shared by all workers / nodes behind the load balancer.
+
+State that must agree across processes goes through one backend selected by
+SHARED_STATE_URL:
+
+- unset or `memory://`: in-process (a single worker; the dev default).
+- `sql://`: a `shared_state` table in the application database
+  (DATABASE_URL). MySQL for several nodes, or a SQLite file for several
+  local workers.
+- `redis://host:6379/0` (or `rediss://`): any Redis-protocol server (Redis,
+  Valkey, ElastiCache); needs the optional `redis` package.
+
+What lives here: the legacy meeting registry (app.chime_client), ETag version
+counters (app.conditional), idempotency records (app.idempotency),
+suspicious-activity windows (app.flags) and startup leadership (`run_once`,
+used by init_db). Per-process caches that stay
+correct without sharing (JWKS, attendee credentials, boto3 clients) don't.
+
+Values are bytes with an optional TTL; counters are separate integers that
+never expire.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional
+
+from sqlalchemy import BigInteger, Column, Float, LargeBinary, MetaData, String, Table, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateTable
+from starlette.concurrency import run_in_threadpool
+
+from .config import env_float, env_int
+
+
+log = logging.getLogger(__name__)
+
+
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "").strip()
+# Key prefix, so one Redis can serve several deployments.
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "exam:")
+SHARED_STATE_MEMORY_MAX_ENTRIES = env_int("SHARED_STATE_MEMORY_MAX_ENTRIES", 100000)
+SHARED_STATE_TIMEOUT_SECONDS = env_float("SHARED_STATE_TIMEOUT_SECONDS", 2.0)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class MemoryBackend:
+    """In-process backend: correct only while a single worker serves traffic."""
+
+    shared = False
+
+    def __init__(self, max_entries: int = SHARED_STATE_MEMORY_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._values: "OrderedDict[str, tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float) -> Optional[bytes]:
+        item = self._values.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= now:
+            del self._values[key]
+            return None
+        return item[0]
+
+    def _store(self, key: str, value: bytes, ttl: Optional[float], now: float) -> None:
+        self._values[key] = (value, now + ttl if ttl else None)
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_entries:
+            self._values.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(key, time.monotonic())
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._store(key, value, ttl, time.monotonic())
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._live(key, now) is not None:
+                return False
+            self._store(key, value, ttl, now)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = self._counters.get(key, 0) + 1
+            self._counters[key] = value
+            return value
+
+    def counters(self, keys: Iterable[str]) -> list[int]:
+        return [self._counters.get(k, 0) for k in keys]
+
+
+class SqlBackend:
+    """`shared_state` table in the application database."""
+
+    shared = True
+    # Expired rows are deleted at most this often (on writes).
+    PURGE_INTERVAL_SECONDS = 60.0
+
+    def __init__(self, engine=None):
+        if engine is None:
+            from .db import engine
+        self.engine = engine
+        self.table = Table(
+            "shared_state",
+            MetaData(),
+            Column("name", String(255), primary_key=True),
+            Column("value", LargeBinary().with_variant(mysql.MEDIUMBLOB(), "mysql"), nullable=True),
+            Column("counter", BigInteger, nullable=False, default=0),
+            # Wall clock (time.time()), comparable across nodes.
+            Column("expires_at", Float, nullable=True),
+        )
+        self._ready = False
+        self._last_purge = 0.0
+
+    def _ensure_table(self) -> None:
+        # Not a migration: init_db's leader election needs it before migrating.
+        if self._ready:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(CreateTable(self.table, if_not_exists=True))
+        self._ready = True
+
+    def _maybe_purge(self, conn, now: float) -> None:
+        if now - self._last_purge < self.PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        t = self.table
+        conn.execute(t.delete().where(t.c.expires_at.is_not(None), t.c.expires_at <= now))
+
+    def get(self, key: str) -> Optional[bytes]:
+        self._ensure_table()
+        t = self.table
+        with self.engine.connect() as conn:
+            row = conn.execute(select(t.c.value, t.c.expires_at).where(t.c.name == key)).first()
+        if row is None or (row.expires_at is not None and row.expires_at <= time.time()):
+            return None
+        return row.value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._ensure_table()
+        t = self.table
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        for _ in range(2):
+            try:
+                with self.engine.begin() as conn:
+                    self._maybe_purge(conn, now)
+                    updated = conn.execute(
+                        t.update().where(t.c.name == key).values(value=value, expires_at=expires_at)
+                    ).rowcount
+                    if not updated:
+                        conn.execute(t.insert().values(name=key, value=value, counter=0, expires_at=expires_at))
+                return
+            except IntegrityError:
+                # Raced with another insert; the update wins on retry.
+                continue
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        self._ensure_table()
+        t = self.table
+        now = time.time()
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(t.delete().where(t.c.name == key, t.c.expires_at.is_not(None), t.c.expires_at <= now))
+                conn.execute(
+                    t.insert().values(name=key, value=value, counter=0, expires_at=now + ttl if ttl else None)
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    def delete(self, key: str) -> None:
+        self._ensure_table()
+        with self.engine.begin() as conn:
+            conn.execute(self.table.delete().where(self.table.c.name == key))
+
+    def incr(self, key: str) -> int:
+        self._ensure_table()
+        t = self.table
+        for _ in range(2):
+            try:
+                with self.engine.begin() as conn:
+                    updated = conn.execute(t.update().where(t.c.name == key).values(counter=t.c.counter + 1)).rowcount
+                    if not updated:
+                        conn.execute(t.insert().values(name=key, value=None, counter=1, expires_at=None))
+                    return int(conn.execute(select(t.c.counter).where(t.c.name == key)).scalar())
+            except IntegrityError:
+                continue
+        raise RuntimeError(f"Failed to increment shared counter {key!r}")
+
+    def counters(self, keys: Iterable[str]) -> list[int]:
+        keys = list(keys)
+        self._ensure_table()
+        t = self.table
+        with self.engine.connect() as conn:
+            rows = dict(conn.execute(select(t.c.name, t.c.counter).where(t.c.name.in_(keys))).all())
+        return [int(rows.get(k) or 0) for k in keys]
+
+
+class RedisBackend:
+    """Any Redis-protocol server (requires the optional `redis` package)."""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = SHARED_STATE_PREFIX):
+        try:
+            import redis
+        except ImportError as e:  # optional dependency
+            raise RuntimeError("SHARED_STATE_URL is a redis:// URL but the `redis` package is not installed") from e
+        self._client = redis.Redis.from_url(
+            url,
+            socket_timeout=SHARED_STATE_TIMEOUT_SECONDS,
+            socket_connect_timeout=SHARED_STATE_TIMEOUT_SECONDS,
+        )
+        self._prefix = prefix
+
+    @staticmethod
+    def _px(ttl: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl * 1000)) if ttl else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(self._prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._client.set(self._prefix + key, value, px=self._px(ttl))
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(self._client.set(self._prefix + key, value, px=self._px(ttl), nx=True))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self._prefix + key)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(self._prefix + key))
+
+    def counters(self, keys: Iterable[str]) -> list[int]:
+        keys = list(keys)
+        if not keys:
+            return []
+        return [int(v or 0) for v in self._client.mget([self._prefix + k for k in keys])]
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def create_backend(url: str = SHARED_STATE_URL):
+    if not url or url.startswith("memory:"):
+        return MemoryBackend()
+    if url in ("sql", "sql://"):
+        return SqlBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise RuntimeError(f"Unsupported SHARED_STATE_URL: {url!r}")
+
+
+_backend_lock = threading.Lock()
+_backend = None
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+
+def set_backend(instance) -> None:
+    """Replace the backend (benchmarks / checks)."""
+    global _backend
+    with _backend_lock:
+        _backend = instance
+
+
+def close_backend() -> None:
+    """Release the backend's connections at shutdown (it reconnects if used again)."""
+    close = getattr(_backend, "close", None)
+    if close is not None:
+        close()
+
+
+async def run(fn: Callable[..., Any], *args: Any) -> Any:
+    """Call a backend method from async code without blocking the event loop."""
+    if not backend().shared:
+        return fn(*args)
+    return await run_in_threadpool(fn, *args)
+
+
+def run_once(name: str, fn: Callable[[], Any], *, lease_seconds: float, done_ttl_seconds: float = 300.0) -> bool:
+    """Startup leader election: one process runs `fn`, the others wait for it.
+
+    The leader holds a lease while `fn` runs and leaves a short-lived "done"
+    marker; processes starting while the marker exists skip `fn`. If the
+    leader dies, its lease expires and a waiting process takes over. `fn`
+    must be safe to run again later (the marker is only a startup hint).
+    Returns True if this process ran `fn`.
+    """
+    state = backend()
+    lease_key = f"leader:{name}"
+    done_key = f"done:{name}"
+    deadline = time.monotonic() + lease_seconds * 2
+    while True:
+        if state.get(done_key) is not None:
+            return False
+        if state.add(lease_key, WORKER_ID.encode(), ttl=lease_seconds):
+            if state.get(done_key) is not None:
+                # The leader finished between our check and taking the lease.
+                state.delete(lease_key)
+                return False
+            if state.shared:
+                log.info("%s: elected leader (%s)", name, WORKER_ID)
+            try:
+                fn()
+                state.set(done_key, WORKER_ID.encode(), ttl=done_ttl_seconds)
+            finally:
+                state.delete(lease_key)
+            return True
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"{name}: timed out waiting for the leader")
+        time.sleep(0.1)
@@ -0,0 +1,207 @@
+"""Archival / retention check for chat logs and attendance.
+
+Runs the app in process on a fresh SQLite file, fills an ended exam with
+chat logs and attendance sessions, ages it past ARCHIVE_AFTER_DAYS and runs
+app.archive.run_archive_pass. Verifies:
+
+- the exam's rows move into gzip NDJSON files under the month directory and
+  are deleted from the tables (in bounded batches);
+- GET /chat-logs/{join_code} and GET /attendance/{join_code} return
+  byte-identical bodies (and ETags) from the archive, including paging;
+- a chat message written after archival is kept in the table and listed
+  after the archived ones;
+- a pass interrupted after writing the files finishes the deletes later;
+- exams that ended recently are left alone;
+- archives past ARCHIVE_RETENTION_DAYS are deleted.
+
+Exits non-zero if any check fails.
+
+Usage (from backend/):
+    python -m bench.archive
+    python -m bench.archive --messages 20000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_workdir = tempfile.mkdtemp(prefix="exam-archive-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'app.db')}"
+os.environ["ARCHIVE_DIR"] = os.path.join(_workdir, "archive")
+os.environ["REPORTS_DIR"] = os.path.join(_workdir, "reports")
+os.environ["ARCHIVE_AFTER_DAYS"] = "30"
+os.environ["ARCHIVE_RETENTION_DAYS"] = "365"
+os.environ["ARCHIVE_BATCH_SIZE"] = "500"
+os.environ["ARCHIVE_BATCH_PAUSE_SECONDS"] = "0"
+# Dev auth bypass: every caller is "dev-user", made a proctor here.
+os.environ["COGNITO_USER_POOL_ID"] = ""
+os.environ["DEFAULT_PROCTOR_USERS"] = "dev-user"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+async def run(messages: int, sessions: int) -> list[str]:
+    from sqlalchemy import func, select, update
+
+    from app import archive
+    from app.db import SessionLocal
+    from app.models import ArchivedMeeting, MeetingAttendanceSession, MeetingChatLog, ScheduledMeeting
+    from bench.asgi import AsgiClient
+    from bench.fakes import install_fakes
+    from main import app
+
+    install_fakes()
+    failures: list[str] = []
+
+    def check(name: str, ok: bool, info: str = "") -> None:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({info})' if info else ''}")
+        if not ok:
+            failures.append(name)
+
+    def count(model, join_code: str) -> int:
+        with SessionLocal() as db:
+            return db.scalar(select(func.count()).select_from(model).where(model.join_code == join_code))
+
+    def fill(join_code: str, base: datetime) -> None:
+        with SessionLocal() as db:
+            db.execute(
+                MeetingChatLog.__table__.insert(),
+                [
+                    {
+                        "join_code": join_code,
+                        "message_id": f"m{i}",
+                        "msg_type": "broadcast" if i % 3 else "direct",
+                        "from_role": "examinee",
+                        "from_attendee_id": f"att-{i % sessions}",
+                        "to_role": "proctor",
+                        "text": f"message {i} ✓",
+                        # Some without client timestamps (listed last).
+                        "sent_at": base + timedelta(seconds=i) if i % 10 else None,
+                    }
+                    for i in range(messages)
+                ],
+            )
+            db.execute(
+                MeetingAttendanceSession.__table__.insert(),
+                [
+                    {
+                        "join_code": join_code,
+                        "attendee_id": f"att-{i}",
+                        "external_user_id": f"student-{i}#Student {i}",
+                        "role": "examinee",
+                        "joined_at": base + timedelta(seconds=i),
+                        "left_at": base + timedelta(minutes=50),
+                        "duration_seconds": 3000 - i,
+                    }
+                    for i in range(sessions)
+                ],
+            )
+            db.commit()
+
+    def age(join_code: str, days: int) -> None:
+        with SessionLocal() as db:
+            db.execute(
+                update(ScheduledMeeting)
+                .where(ScheduledMeeting.join_code == join_code)
+                .values(updated_at=datetime.utcnow() - timedelta(days=days))
+            )
+            db.commit()
+
+    async with AsgiClient(app) as client:
+
+        async def ended_exam(title: str, days_ago: int) -> str:
+            created = await client.request("POST", "/scheduled-meetings", json_body={"title": title})
+            join_code = created.json()["join_code"]
+            await client.request("POST", f"/scheduled-meetings/{join_code}/start", json_body={})
+            fill(join_code, datetime.utcnow() - timedelta(days=days_ago))
+            await client.request("POST", f"/scheduled-meetings/{join_code}/end", json_body={})
+            age(join_code, days_ago)
+            return join_code
+
+        async def lists(join_code: str) -> list:
+            return [
+                await client.request("GET", f"/chat-logs/{join_code}", params={"limit": 5000}),
+                await client.request("GET", f"/chat-logs/{join_code}", params={"limit": 100, "offset": 250}),
+                await client.request("GET", f"/attendance/{join_code}"),
+            ]
+
+        old = await ended_exam("Old exam", 45)
+        interrupted = await ended_exam("Interrupted exam", 40)
+        recent = await ended_exam("Recent exam", 3)
+        before = await lists(old)
+
+        # A pass that died after writing the files, before deleting anything.
+        with SessionLocal() as db:
+            archive.archive_meeting(db, db.scalars(select(ScheduledMeeting).filter_by(join_code=interrupted)).one())
+
+        started = time.perf_counter()
+        summary = archive.run_archive_pass()
+        elapsed = time.perf_counter() - started
+        rows = 2 * (messages + sessions)
+        check(
+            "ended exams are moved out of the tables",
+            count(MeetingChatLog, old) == 0
+            and count(MeetingAttendanceSession, old) == 0
+            and summary["deleted_rows"] == rows,
+            f"{summary}, {rows / elapsed:,.0f} rows/s",
+        )
+        check(
+            "interrupted pass is finished by the next one",
+            count(MeetingChatLog, interrupted) == 0 and count(MeetingAttendanceSession, interrupted) == 0,
+        )
+        check(
+            "recently ended exam is left alone",
+            count(MeetingChatLog, recent) == messages and count(MeetingAttendanceSession, recent) == sessions,
+        )
+        month = os.path.join(os.environ["ARCHIVE_DIR"], (datetime.utcnow()).strftime("%Y-%m"))
+        files = sorted(os.listdir(month)) if os.path.isdir(month) else []
+        check("archives are gzip NDJSON files in the month directory", len(files) == 4, f"{month}: {files}")
+
+        after = await lists(old)
+        same = [a.status == b.status == 200 and a.body == b.body for a, b in zip(after, before)]
+        check(
+            "list endpoints read archived exams through, byte-identical",
+            all(same) and after[0].headers.get("etag") == before[0].headers.get("etag"),
+            f"chat={same[0]}, chat page={same[1]}, attendance={same[2]}, {len(after[0].body):,} bytes",
+        )
+
+        late = await client.request(
+            "POST", "/chat-logs", json_body={"join_code": old, "message_id": "late", "text": "after archival"}
+        )
+        archive.run_archive_pass()
+        listed = (await client.request("GET", f"/chat-logs/{old}", params={"limit": 5000})).json()
+        check(
+            "message written after archival is kept and listed last",
+            late.status == 200 and count(MeetingChatLog, old) == 1 and listed[-1]["message_id"] == "late"
+            and len(listed) == messages + 1,
+            f"listed={len(listed)}",
+        )
+
+    archive.run_archive_pass(now=datetime.utcnow() + timedelta(days=400))
+    with SessionLocal() as db:
+        remaining = db.scalar(select(func.count()).select_from(ArchivedMeeting))
+    left = os.listdir(month) if os.path.isdir(month) else []
+    check(
+        "archives past ARCHIVE_RETENTION_DAYS are deleted",
+        remaining == 0 and not [f for f in left if old in f or interrupted in f],
+        f"index rows={remaining}, files={len(left)}",
+    )
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=3000, help="chat messages per exam")
+    parser.add_argument("--sessions", type=int, default=200, help="attendance sessions per exam")
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args.messages, args.sessions))
+    print(f"\n{len(failures)} check(s) failed" if failures else "\nall checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
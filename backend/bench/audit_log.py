@@ -0,0 +1,333 @@
+"""Structured logging / audit trail check (app/logs.py, app/audit.py).
+
+Runs the app in process on a fresh SQLite file with fakes, with stderr (the
+log writer's stream) captured, and verifies:
+
+- every response has an X-Request-ID: the client's if valid, else a new one;
+- log lines are JSON and carry the request id, also when logged from the
+  threadpool and from the report job thread;
+- the access log samples the high-volume routes and keeps server errors and
+  slow requests;
+- a stalled log stream doesn't slow requests down: records are dropped and
+  counted once the queue is full;
+- meeting create / update / start / end / delete and a user's role change
+  are in audit_events with actor, target, details and request id, written in
+  a few multi-row INSERTs instead of one per action;
+- events recorded while the database is unavailable are kept and written
+  once it is back; what is buffered at shutdown is written;
+- no print() is left outside the CLI entry points.
+
+Exits non-zero if any check fails.
+
+Usage (from backend/):
+    python -m bench.audit_log
+"""
+
+import ast
+import asyncio
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+_workdir = tempfile.mkdtemp(prefix="exam-audit-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'app.db')}"
+os.environ["REPORTS_DIR"] = os.path.join(_workdir, "reports")
+os.environ["REPORTS_ON_END"] = "1"
+os.environ["AUDIT_FLUSH_INTERVAL_SECONDS"] = "0.5"
+os.environ["LOG_QUEUE_SIZE"] = "200"
+os.environ["LOG_SLOW_REQUEST_SECONDS"] = "0.2"
+os.environ["LOG_ACCESS_HIGH_VOLUME_SAMPLE_RATE"] = "0.05"
+# Dev auth bypass: every caller is "dev-user", made a proctor here.
+os.environ["COGNITO_USER_POOL_ID"] = ""
+os.environ["DEFAULT_PROCTOR_USERS"] = "dev-user"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+class CapturedStream(io.TextIOBase):
+    """Stands in for stderr; `delay` simulates a stalled log shipper."""
+
+    def __init__(self):
+        self.lines: list[str] = []
+        self.delay = 0.0
+        self._buffer = ""
+        self._lock = threading.Lock()
+
+    def write(self, data: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self._buffer += data
+            *lines, self._buffer = self._buffer.split("\n")
+            self.lines.extend(lines)
+        return len(data)
+
+    def records(self) -> list[dict]:
+        with self._lock:
+            return [json.loads(line) for line in self.lines if line.startswith("{")]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.lines.clear()
+
+
+def prints_outside_cli() -> list[str]:
+    found = []
+    for path in sorted((BACKEND / "app").rglob("*.py")):
+        tree = ast.parse(path.read_text(encoding="utf-8"))
+        main_blocks = [
+            node
+            for node in tree.body
+            if isinstance(node, ast.If) and "__main__" in ast.unparse(node.test)
+        ]
+        in_main = {id(n) for block in main_blocks for n in ast.walk(block)}
+        for node in ast.walk(tree):
+            if (
+                isinstance(node, ast.Call)
+                and getattr(node.func, "id", None) == "print"
+                and id(node) not in in_main
+            ):
+                found.append(f"{path.relative_to(BACKEND)}:{node.lineno}")
+    return found
+
+
+async def run() -> list[str]:
+    from fastapi import Response
+    from sqlalchemy import event, select
+
+    from app import audit, logs, reports
+    from app.db import SessionLocal, engine
+    from app.models import AuditEvent, User
+    from bench.asgi import AsgiClient
+    from bench.fakes import install_fakes
+    from main import app
+
+    install_fakes()
+    failures: list[str] = []
+
+    def check(name: str, ok: bool, info: str = "") -> None:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({info})' if info else ''}")
+        if not ok:
+            failures.append(name)
+
+    async def slow() -> dict:
+        await asyncio.sleep(0.25)
+        return {}
+
+    app.add_api_route("/attendance/bench/slow", slow)
+    app.add_api_route("/attendance/bench/error", lambda: Response(status_code=500))
+
+    audit_inserts: list[int] = []
+
+    def count_inserts(conn, cursor, sql, params, context, executemany):
+        if sql.lstrip().upper().startswith("INSERT INTO AUDIT_EVENTS"):
+            audit_inserts.append(len(params) if executemany else 1)
+
+    event.listen(engine, "before_cursor_execute", count_inserts)
+
+    stream = CapturedStream()
+    stderr, sys.stderr = sys.stderr, stream
+    client = AsgiClient(app)
+    try:
+        await client.startup()
+
+        # Request ids.
+        given = await client.request("GET", "/healthz", headers={"X-Request-ID": "lb-1234.abc"})
+        generated = await client.request("GET", "/healthz")
+        invalid = await client.request("GET", "/healthz", headers={"X-Request-ID": "bad id\twith spaces"})
+        check(
+            "X-Request-ID: kept when valid, generated otherwise",
+            given.headers.get("x-request-id") == "lb-1234.abc"
+            and len(generated.headers.get("x-request-id", "")) == 32
+            and invalid.headers.get("x-request-id", "") not in ("", "bad id\twith spaces"),
+            f"{given.headers.get('x-request-id')}, {generated.headers.get('x-request-id')}",
+        )
+
+        # Audited actions, each with its own request id.
+        ids: dict[str, str] = {}
+
+        async def action(name: str, method: str, path: str, **kwargs):
+            response = await client.request(method, path, headers={"X-Request-ID": f"req-{name}"}, **kwargs)
+            ids[name] = f"req-{name}"
+            return response
+
+        code = (await action("create", "POST", "/scheduled-meetings", json_body={"title": "Midterm"})).json()["join_code"]
+        await action("update", "PATCH", f"/scheduled-meetings/{code}", json_body={"title": "Midterm (room B)"})
+        await action("start", "POST", f"/scheduled-meetings/{code}/start", json_body={})
+        await action("end", "POST", f"/scheduled-meetings/{code}/end", json_body={})
+        # Ended twice: the idempotent no-op is not an action.
+        await client.request("POST", f"/scheduled-meetings/{code}/end", json_body={})
+        await action("delete", "DELETE", f"/scheduled-meetings/{code}")
+        with SessionLocal() as db:
+            db.add(User(email="examinee@example.com", role="examinee", class_name="A"))
+            db.commit()
+        await action("role", "PATCH", "/users/examinee@example.com", json_body={"role": "proctor"})
+
+        # A burst of audited actions: batched.
+        await asyncio.sleep(0.8)
+        audit_inserts.clear()
+        codes = []
+        for i in range(60):
+            created = await client.request("POST", "/scheduled-meetings", json_body={"title": f"Exam {i}"})
+            codes.append(created.json()["join_code"])
+        await asyncio.sleep(0.8)
+        statements, rows = len(audit_inserts), sum(audit_inserts)
+
+        with SessionLocal() as db:
+            events = db.scalars(select(AuditEvent).where(AuditEvent.request_id.like("req-%")).order_by(AuditEvent.id)).all()
+        got = [(e.action, e.request_id) for e in events]
+        want = [
+            ("scheduled_meeting.create", "req-create"),
+            ("scheduled_meeting.update", "req-update"),
+            ("scheduled_meeting.start", "req-start"),
+            ("scheduled_meeting.end", "req-end"),
+            ("scheduled_meeting.delete", "req-delete"),
+            ("user.role_change", "req-role"),
+        ]
+        role = events[-1] if events else None
+        check(
+            "meeting actions and role changes are audited with actor, target and request id",
+            got == want
+            and all(e.actor == "dev-user" and e.actor_user_id for e in events)
+            and all(e.target_id == code for e in events[:5])
+            and role is not None
+            and role.target_id == "examinee@example.com"
+            and json.loads(role.details) == {"changes": {"role": ["examinee", "proctor"], "class_name": ["A", None]}},
+            f"{got}",
+        )
+        check(
+            "audit events are written in batches",
+            rows == 60 and statements <= 10,
+            f"{rows} events in {statements} INSERT statement(s)",
+        )
+
+        # Request ids in the log lines, from the threadpool and the report thread.
+        await asyncio.sleep(0.3)
+        records = stream.records()
+        audit_lines = [r for r in records if r["logger"] == "app.audit" and r.get("request_id", "").startswith("req-")]
+        await client.request(
+            "POST", f"/scheduled-meetings/{codes[0]}/end", json_body={}, headers={"X-Request-ID": "req-report"}
+        )
+        build = reports.build_report
+
+        def failing(db, join_code):
+            raise RuntimeError("bench: report failed")
+
+        reports.build_report = failing
+        try:
+            await client.request(
+                "POST", f"/scheduled-meetings/{codes[1]}/end", json_body={}, headers={"X-Request-ID": "req-report"}
+            )
+            await asyncio.sleep(0.5)
+        finally:
+            reports.build_report = build
+        report_jobs = {r.get("request_id") for r in stream.records() if r["logger"] == "app.reports"}
+        check(
+            "log lines are JSON with the request id (threadpool and report thread)",
+            len(audit_lines) == 6
+            and {r["request_id"] for r in audit_lines} == set(ids.values())
+            and "req-report" in report_jobs,
+            f"{len(records)} records, audit ids {sorted(r['request_id'] for r in audit_lines)}, report job ids {report_jobs}",
+        )
+
+        # Access log sampling.
+        stream.clear()
+        for _ in range(2000):
+            await client.request("GET", "/healthz")
+        for _ in range(20):
+            await client.request("GET", "/scheduled-meetings")
+        await client.request("GET", "/attendance/bench/slow")
+        await client.request("GET", "/attendance/bench/error")
+        await asyncio.sleep(0.3)
+        access = [r for r in stream.records() if r["logger"] == "app.access"]
+        by_route: dict[str, list[dict]] = {}
+        for r in access:
+            by_route.setdefault(r["route"], []).append(r)
+        health = by_route.get("/healthz", [])
+        check(
+            "access log samples high-volume routes, keeps errors and slow requests",
+            30 <= len(health) <= 200
+            and all(r.get("sample_rate") == 0.05 for r in health)
+            and len(by_route.get("/scheduled-meetings", [])) == 20
+            and len(by_route.get("/attendance/bench/slow", [])) == 1
+            and [r["level"] for r in by_route.get("/attendance/bench/error", [])] == ["warning"],
+            f"/healthz {len(health)} of 2000, /scheduled-meetings {len(by_route.get('/scheduled-meetings', []))} of 20,"
+            f" {sorted(by_route)}",
+        )
+
+        # Stalled log stream: requests don't wait for it.
+        async def timed(n: int) -> float:
+            samples = []
+            for _ in range(n):
+                started = time.perf_counter()
+                await client.request("GET", "/scheduled-meetings")
+                samples.append(time.perf_counter() - started)
+            return statistics.median(samples)
+
+        baseline = await timed(300)
+        dropped = logs.records_dropped_total._values.get((), 0.0)
+        stream.delay = 0.02
+        stalled = await timed(600)
+        stream.delay = 0.0
+        dropped = logs.records_dropped_total._values.get((), 0.0) - dropped
+        check(
+            "a stalled log stream drops records instead of slowing requests",
+            dropped > 0 and stalled < baseline * 1.5 + 0.0005,
+            f"p50 {baseline * 1000:.2f} ms -> {stalled * 1000:.2f} ms while stalled, {dropped:.0f} records dropped",
+        )
+
+        # Database unavailable at flush time: kept, written later.
+        session_factory = audit.SessionLocal
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
+        audit.SessionLocal = sessionmaker(bind=create_engine(f"sqlite:///{os.path.join(_workdir, 'missing', 'app.db')}"))
+        for c in codes[2:7]:
+            await client.request("DELETE", f"/scheduled-meetings/{c}", headers={"X-Request-ID": "req-outage"})
+        await asyncio.sleep(0.8)
+        kept = len(audit._pending)
+        audit.SessionLocal = session_factory
+        await asyncio.sleep(1.3)
+
+        def outage_rows() -> int:
+            with SessionLocal() as db:
+                return len(db.scalars(select(AuditEvent.id).where(AuditEvent.request_id == "req-outage")).all())
+
+        written = outage_rows()
+        check(
+            "events recorded while the database is down are written once it is back",
+            kept == 5 and written == 5,
+            f"{kept} kept during the outage, {written} written after",
+        )
+
+        # Shutdown drains the buffer.
+        for c in codes[7:12]:
+            await client.request("DELETE", f"/scheduled-meetings/{c}", headers={"X-Request-ID": "req-shutdown"})
+        pending = len(audit._pending)
+        await client.shutdown()
+        with SessionLocal() as db:
+            drained = len(db.scalars(select(AuditEvent.id).where(AuditEvent.request_id == "req-shutdown")).all())
+        check("shutdown writes the buffered events", pending == 5 and drained == 5, f"{pending} buffered, {drained} written")
+    finally:
+        sys.stderr = stderr
+
+    leftovers = prints_outside_cli()
+    check("no print() outside the CLI entry points", not leftovers, ", ".join(leftovers))
+    return failures
+
+
+def main() -> int:
+    failures = asyncio.run(run())
+    print(f"\n{len(failures)} check(s) failed" if failures else "\nall checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
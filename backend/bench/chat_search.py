@@ -0,0 +1,276 @@
+"""Chat log search check (GET /chat-logs/search).
+
+Runs the app in process on a fresh SQLite file (the in-process bigram index
+of app.chat_search; MySQL uses the ngram FULLTEXT index of migration 006
+instead), seeds --messages chat messages over --meetings exams, mixed
+Japanese / English, and verifies:
+
+- Japanese (no word boundaries) and English queries find every message that
+  contains all query words, and nothing else;
+- results are ranked (a message that repeats the word ranks above one that
+  mentions it once) and full-width / upper-case input matches;
+- the join_code, role and since / until filters;
+- pagination with X-Next-Offset covers the result set exactly once;
+- a message posted after the index was built is found by the next search;
+- a query without a searchable word is rejected (400);
+- with a small CHAT_SEARCH_MAX_CANDIDATES, a join_code search still finds
+  every match of that exam, and a search stopped by the cap is flagged
+  (X-Search-Truncated);
+- ids of deleted / archived rows are evicted from the index.
+
+Then times a mix of queries and prints p50 / p95.
+
+Exits non-zero if any check fails.
+
+Usage (from backend/):
+    python -m bench.chat_search
+    python -m bench.chat_search --messages 200000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_workdir = tempfile.mkdtemp(prefix="exam-search-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'app.db')}"
+# Dev auth bypass: every caller is "dev-user", made a proctor here.
+os.environ["COGNITO_USER_POOL_ID"] = ""
+os.environ["DEFAULT_PROCTOR_USERS"] = "dev-user"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+PHRASES = (
+    "問題3の答えがわかりません",
+    "トイレに行ってもいいですか",
+    "カメラが映りません",
+    "音声が聞こえません",
+    "試験時間はあと何分ですか",
+    "Question about problem 3",
+    "My camera is not working",
+    "Can I go to the restroom",
+    "The audio keeps cutting out",
+    "How much time is left",
+)
+BASE = datetime(2026, 4, 1, 9, 0, 0)
+
+
+async def run(messages: int, meetings: int, rounds: int) -> list[str]:
+    from sqlalchemy import delete, func, select
+
+    from app import chat_search
+    from app.db import SessionLocal
+    from app.models import MeetingChatLog
+    from bench.asgi import AsgiClient
+    from bench.fakes import install_fakes
+    from main import app
+
+    install_fakes()
+    failures: list[str] = []
+    rng = random.Random(11)
+    join_codes = [f"exam-{i:04d}" for i in range(meetings)]
+
+    def check(name: str, ok: bool, info: str = "") -> None:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({info})' if info else ''}")
+        if not ok:
+            failures.append(name)
+
+    rows = []
+    for i in range(messages):
+        examinee = i % 4 != 0
+        text = rng.choice(PHRASES)
+        if i % 50 == 0:
+            text = f"{text} {text}"
+        rows.append(
+            {
+                "join_code": join_codes[i % meetings],
+                "message_id": f"m{i}",
+                "msg_type": "direct",
+                "from_role": "examinee" if examinee else "proctor",
+                "from_attendee_id": f"att-{i % 40}",
+                "to_role": "proctor" if examinee else "examinee",
+                "text": text,
+                "sent_at": BASE + timedelta(seconds=i),
+            }
+        )
+
+    def expected(*words: str, join_code=None, role=None, since=None, until=None) -> set[str]:
+        return {
+            r["message_id"]
+            for r in rows
+            if all(w in r["text"].casefold() for w in words)
+            and (join_code is None or r["join_code"] == join_code)
+            and (role is None or r["from_role"] == role)
+            and (since is None or r["sent_at"] >= since)
+            and (until is None or r["sent_at"] < until)
+        }
+
+    async with AsgiClient(app) as client:
+        # Seeded once startup has created the schema.
+        with SessionLocal() as db:
+            for start in range(0, len(rows), 5000):
+                db.execute(MeetingChatLog.__table__.insert(), rows[start : start + 5000])
+            db.commit()
+        print(f"{messages:,} messages over {meetings} exams")
+
+        async def search_all(**params) -> list[dict]:
+            found, offset = [], 0
+            while True:
+                resp = await client.request("GET", "/chat-logs/search", params={**params, "limit": 200, "offset": offset})
+                if resp.status != 200:
+                    return found
+                found += resp.json()
+                next_offset = resp.headers.get("x-next-offset")
+                if not next_offset:
+                    return found
+                offset = int(next_offset)
+
+        started = time.perf_counter()
+        first = await client.request("GET", "/chat-logs/search", params={"q": "カメラ"})
+        print(f"first search (builds the index): {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        cases = {
+            "Japanese phrase": ({"q": "答えがわかりません"}, ("答えがわかりません",)),
+            "Japanese words (AND)": ({"q": "音声 聞こえ"}, ("音声", "聞こえ")),
+            "English words (AND)": ({"q": "camera working"}, ("camera", "working")),
+            "full-width / upper-case input": ({"q": "ＣＡＭＥＲＡ"}, ("camera",)),
+        }
+        for name, (params, words) in cases.items():
+            found = await search_all(**params)
+            ids = [r["message_id"] for r in found]
+            want = expected(*words)
+            check(f"{name} finds exactly the matching messages", set(ids) == want and len(ids) == len(want),
+                  f"{len(ids)} found, {len(want)} expected")
+
+        ranked = (await client.request("GET", "/chat-logs/search", params={"q": "カメラ", "limit": 5})).json()
+        check(
+            "repeated words rank first",
+            first.status == 200 and all(r["text"].count("カメラ") == 2 for r in ranked)
+            and all(a["score"] >= b["score"] for a, b in zip(ranked, ranked[1:])),
+            f"top scores={[r['score'] for r in ranked]}",
+        )
+
+        since, until = BASE + timedelta(seconds=messages // 4), BASE + timedelta(seconds=messages // 2)
+        filtered = await search_all(
+            q="time", join_code=join_codes[1], role="examinee",
+            since=since.isoformat() + "Z", until=until.isoformat() + "Z",
+        )
+        want = expected("time", join_code=join_codes[1], role="examinee", since=since, until=until)
+        check(
+            "join_code / role / since / until filters",
+            {r["message_id"] for r in filtered} == want and want,
+            f"{len(filtered)} found, {len(want)} expected",
+        )
+
+        pages = await search_all(q="problem")
+        ids = [r["message_id"] for r in pages]
+        check(
+            "pagination covers the results exactly once",
+            len(ids) == len(set(ids)) == len(expected("problem")),
+            f"{len(ids)} rows",
+        )
+
+        posted = await client.request(
+            "POST", "/chat-logs",
+            json_body={"join_code": join_codes[0], "message_id": "late", "text": "ネットワークが不安定です"},
+        )
+        late = (await client.request("GET", "/chat-logs/search", params={"q": "不安定"})).json()
+        check(
+            "a new message is found by the next search",
+            posted.status == 200 and [r["message_id"] for r in late] == ["late"],
+            f"{[r['message_id'] for r in late]}",
+        )
+
+        rejected = await client.request("GET", "/chat-logs/search", params={"q": "a"})
+        check("query without a searchable word is rejected", rejected.status == 400, f"status={rejected.status}")
+
+        # The cap applies after the filters: an exam's matches are all
+        # found even though most newer matches are in other exams.
+        cap = chat_search.CHAT_SEARCH_MAX_CANDIDATES
+        chat_search.CHAT_SEARCH_MAX_CANDIDATES = 1000
+        try:
+            scoped = await client.request(
+                "GET", "/chat-logs/search", params={"q": "カメラ", "join_code": join_codes[0], "limit": 200}
+            )
+            unscoped = await client.request("GET", "/chat-logs/search", params={"q": "カメラ"})
+        finally:
+            chat_search.CHAT_SEARCH_MAX_CANDIDATES = cap
+        want = expected("カメラ", join_code=join_codes[0])
+        check(
+            "capped search: join_code matches complete, truncation flagged",
+            {r["message_id"] for r in scoped.json()} == want
+            and "x-search-truncated" not in scoped.headers
+            and unscoped.headers.get("x-search-truncated") == "true",
+            f"{len(scoped.json())} of {len(want)} found in {join_codes[0]},"
+            f" unscoped truncated={unscoped.headers.get('x-search-truncated')}",
+        )
+
+        queries = ["カメラ", "答え", "トイレ", "問題3", "camera", "restroom", "audio cutting", "time left"]
+        timings = []
+        for _ in range(rounds):
+            for q in queries:
+                params = {"q": q}
+                if rng.random() < 0.5:
+                    params["join_code"] = rng.choice(join_codes)
+                started = time.perf_counter()
+                await client.request("GET", "/chat-logs/search", params=params)
+                timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(
+            f"\n{len(timings)} searches: p50 {statistics.median(timings) * 1000:.1f} ms,"
+            f" p95 {timings[int(len(timings) * 0.95) - 1] * 1000:.1f} ms\n"
+        )
+
+        # Archived exams (every row gone) and deleted rows are evicted.
+        index = chat_search.bigram_index
+        archived, thinned = join_codes[1:21], join_codes[21]
+        with SessionLocal() as db:
+            db.execute(delete(MeetingChatLog).where(MeetingChatLog.join_code.in_(archived)))
+            thinned_rows = db.execute(
+                select(MeetingChatLog.id, MeetingChatLog.message_id).where(
+                    MeetingChatLog.join_code == thinned, MeetingChatLog.id % 2 == 0
+                )
+            ).all()
+            removed = {row_id for row_id, _ in thinned_rows}
+            db.execute(delete(MeetingChatLog).where(MeetingChatLog.id.in_(removed)))
+            db.commit()
+            live = db.scalar(select(func.count()).select_from(MeetingChatLog))
+        prune = chat_search.CHAT_SEARCH_PRUNE_SECONDS
+        chat_search.CHAT_SEARCH_PRUNE_SECONDS = 0
+        try:
+            after = await search_all(q="カメラ")
+        finally:
+            chat_search.CHAT_SEARCH_PRUNE_SECONDS = prune
+        stale = sum(1 for posting in index._postings.values() for i in posting if i in removed)
+        check(
+            "ids of deleted / archived rows are evicted",
+            index._documents == live
+            and not any(code in index._meetings for code in archived)
+            and not removed & index._meetings.get(thinned, set())
+            and stale == 0
+            and {r["message_id"] for r in after} == {
+                r["message_id"] for r in rows if "カメラ" in r["text"] and r["join_code"] not in archived
+            } - {message_id for _, message_id in thinned_rows},
+            f"indexed {index._documents:,} of {live:,} rows, {stale} stale postings",
+        )
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000, help="seeded chat messages")
+    parser.add_argument("--meetings", type=int, default=100, help="exams the messages are spread over")
+    parser.add_argument("--rounds", type=int, default=20, help="timed rounds of the query mix")
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args.messages, args.meetings, args.rounds))
+    print(f"{len(failures)} check(s) failed" if failures else "all checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
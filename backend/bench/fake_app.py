@@ -0,0 +1,20 @@
+"""ASGI entry point for real worker processes running against the fakes.
+
+    BENCH_SHARED_CHIME_PATH=/tmp/chime.db uvicorn bench.fake_app:app --port 8001
+    BENCH_SHARED_CHIME_PATH=/tmp/chime.db gunicorn -c gunicorn.conf.py bench.fake_app:app
+
+Chime is a SharedFakeChime on BENCH_SHARED_CHIME_PATH (a SQLite file), so
+every worker sees the same meetings, as with real Chime. S3 and Cognito are
+the in-process fakes. Used by bench.multiworker.
+"""
+
+import os
+
+from bench.fakes import install_fakes
+from main import app  # noqa: F401  (the ASGI app served by this module)
+
+
+install_fakes(
+    aws_latency_ms=float(os.getenv("BENCH_AWS_LATENCY_MS", "0")),
+    shared_chime_path=os.environ["BENCH_SHARED_CHIME_PATH"],
+)
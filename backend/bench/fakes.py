@@ -0,0 +1,367 @@
+"""Local stand-ins for AWS Chime, S3 and Cognito, plus a local JWKS.
+
+Used by the benchmark/load-test harness to drive the real app without any
+network access. The fakes mimic the response shapes the routers read.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+
+def _client_error(code: str, operation: str, status: int = 400) -> Exception:
+    # Same exception type boto3 raises, so the routers' handling is exercised.
+    from botocore.exceptions import ClientError
+
+    return ClientError({"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, operation)
+
+
+class _FakeService:
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_s = max(0.0, latency_ms) / 1000.0
+        self.calls: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _call(self, operation: str) -> None:
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def close(self) -> None:
+        # boto3 clients release their HTTP pool here; the fakes hold none.
+        pass
+
+
+class FakeChime(_FakeService):
+    def __init__(self, latency_ms: float = 0.0, region: str = "us-east-1"):
+        super().__init__(latency_ms)
+        self.region = region
+        self.meetings: dict[str, dict] = {}
+        # (meeting_id, external_user_id) -> attendee; Chime returns the same attendee on repeat.
+        self.attendees: dict[tuple[str, str], dict] = {}
+
+    def create_meeting(self, *, ClientRequestToken: str, MediaRegion: str, ExternalMeetingId: str, **_):
+        self._call("create_meeting")
+        meeting_id = str(uuid.uuid4())
+        meeting = {
+            "MeetingId": meeting_id,
+            "ExternalMeetingId": ExternalMeetingId,
+            "MediaRegion": MediaRegion,
+            "MediaPlacement": {
+                "AudioHostUrl": f"{meeting_id}.k.m1.ue1.app.chime.aws:3478",
+                "SignalingUrl": f"wss://signal.m1.ue1.app.chime.aws/control/{meeting_id}",
+            },
+        }
+        with self._lock:
+            self.meetings[meeting_id] = meeting
+        return {"Meeting": meeting}
+
+    def get_meeting(self, *, MeetingId: str, **_):
+        self._call("get_meeting")
+        meeting = self.meetings.get(MeetingId)
+        if meeting is None:
+            raise _client_error("NotFoundException", "GetMeeting", 404)
+        return {"Meeting": meeting}
+
+    def delete_meeting(self, *, MeetingId: str, **_):
+        self._call("delete_meeting")
+        with self._lock:
+            self.meetings.pop(MeetingId, None)
+        return {}
+
+    def create_attendee(self, *, MeetingId: str, ExternalUserId: str, **_):
+        self._call("create_attendee")
+        if MeetingId not in self.meetings:
+            raise _client_error("NotFoundException", "CreateAttendee", 404)
+        key = (MeetingId, ExternalUserId)
+        with self._lock:
+            attendee = self.attendees.get(key)
+            if attendee is None:
+                attendee = {
+                    "ExternalUserId": ExternalUserId,
+                    "AttendeeId": str(uuid.uuid4()),
+                    "JoinToken": uuid.uuid4().hex,
+                }
+                self.attendees[key] = attendee
+        return {"Attendee": attendee}
+
+
+class SharedFakeChime(FakeChime):
+    """FakeChime backed by a SQLite file, shared by several worker processes.
+
+    Like real Chime, a meeting created through one worker exists for all of
+    them (bench.multiworker). Call counts are recorded in the file too.
+    """
+
+    def __init__(self, path: str, latency_ms: float = 0.0, region: str = "us-east-1"):
+        super().__init__(latency_ms, region)
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS meetings (meeting_id TEXT PRIMARY KEY, body TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS attendees (
+                    meeting_id TEXT NOT NULL, external_user_id TEXT NOT NULL, body TEXT NOT NULL,
+                    PRIMARY KEY (meeting_id, external_user_id)
+                );
+                CREATE TABLE IF NOT EXISTS calls (operation TEXT PRIMARY KEY, n INTEGER NOT NULL);
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _call(self, operation: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO calls (operation, n) VALUES (?, 1) ON CONFLICT(operation) DO UPDATE SET n = n + 1",
+                (operation,),
+            )
+        super()._call(operation)
+
+    def create_meeting(self, **kwargs):
+        resp = super().create_meeting(**kwargs)
+        meeting = resp["Meeting"]
+        with self._connect() as conn:
+            conn.execute("INSERT INTO meetings (meeting_id, body) VALUES (?, ?)", (meeting["MeetingId"], json.dumps(meeting)))
+        return resp
+
+    def get_meeting(self, *, MeetingId: str, **_):
+        self._call("get_meeting")
+        with self._connect() as conn:
+            row = conn.execute("SELECT body FROM meetings WHERE meeting_id = ?", (MeetingId,)).fetchone()
+        if row is None:
+            raise _client_error("NotFoundException", "GetMeeting", 404)
+        return {"Meeting": json.loads(row[0])}
+
+    def delete_meeting(self, *, MeetingId: str, **_):
+        self._call("delete_meeting")
+        with self._connect() as conn:
+            conn.execute("DELETE FROM meetings WHERE meeting_id = ?", (MeetingId,))
+        return {}
+
+    def create_attendee(self, *, MeetingId: str, ExternalUserId: str, **_):
+        self._call("create_attendee")
+        attendee = {"ExternalUserId": ExternalUserId, "AttendeeId": str(uuid.uuid4()), "JoinToken": uuid.uuid4().hex}
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM meetings WHERE meeting_id = ?", (MeetingId,)).fetchone() is None:
+                raise _client_error("NotFoundException", "CreateAttendee", 404)
+            # Chime returns the existing attendee for a repeated ExternalUserId.
+            conn.execute(
+                "INSERT OR IGNORE INTO attendees (meeting_id, external_user_id, body) VALUES (?, ?, ?)",
+                (MeetingId, ExternalUserId, json.dumps(attendee)),
+            )
+            row = conn.execute(
+                "SELECT body FROM attendees WHERE meeting_id = ? AND external_user_id = ?", (MeetingId, ExternalUserId)
+            ).fetchone()
+        return {"Attendee": json.loads(row[0])}
+
+    def totals(self) -> dict[str, int]:
+        """Call counts across all processes."""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT operation, n FROM calls").fetchall())
+
+    def meeting_count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM meetings").fetchone()[0]
+
+
+class FakeS3(_FakeService):
+    def __init__(self, latency_ms: float = 0.0):
+        super().__init__(latency_ms)
+        # (bucket, key) -> (body, last modified)
+        self.objects: dict[tuple[str, str], tuple[bytes, datetime]] = {}
+
+    def generate_presigned_url(self, *, ClientMethod: str, Params: dict, ExpiresIn: int = 900, **_):
+        self._call("generate_presigned_url")
+        return f"https://{Params['Bucket']}.s3.local/{Params['Key']}?X-Amz-Expires={ExpiresIn}&X-Amz-Signature=fake"
+
+    def put_object(self, *, Bucket: str, Key: str, Body: bytes = b"", **_):
+        self._call("put_object")
+        self.objects[(Bucket, Key)] = (bytes(Body), datetime.now(timezone.utc))
+        return {"ETag": '"fake"'}
+
+    def list_objects_v2(self, *, Bucket: str, Prefix: str = "", MaxKeys: int = 1000, ContinuationToken: str = "", **_):
+        self._call("list_objects_v2")
+        keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix) and k > ContinuationToken)
+        page = keys[:MaxKeys]
+        response = {
+            "Contents": [
+                {"Key": k, "Size": len(self.objects[(Bucket, k)][0]), "LastModified": self.objects[(Bucket, k)][1]}
+                for k in page
+            ],
+            "IsTruncated": len(keys) > MaxKeys,
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1]
+        return response
+
+
+class FakeCognito(_FakeService):
+    def __init__(self, latency_ms: float = 0.0):
+        super().__init__(latency_ms)
+        self.users: set[str] = set()
+
+    def admin_create_user(self, *, UserPoolId: str, Username: str, **_):
+        self._call("admin_create_user")
+        with self._lock:
+            if Username in self.users:
+                raise _client_error("UsernameExistsException", "AdminCreateUser")
+            self.users.add(Username)
+        return {"User": {"Username": Username}}
+
+    def admin_delete_user(self, *, UserPoolId: str, Username: str, **_):
+        self._call("admin_delete_user")
+        with self._lock:
+            if Username not in self.users:
+                raise _client_error("UserNotFoundException", "AdminDeleteUser")
+            self.users.discard(Username)
+        return {}
+
+
+class FaultInjector:
+    """Wraps a fake client and makes selected calls fail like AWS would.
+
+    Faults are either scripted per operation (consumed in order; None lets a
+    call through) or drawn at random with `error_rate`. Fault kinds:
+    throttle, unavailable, not_found, connection.
+    """
+
+    def __init__(self, client, *, error_rate: float = 0.0, fault: str = "throttle", seed: int = 0):
+        self._client = client
+        self.error_rate = error_rate
+        self.fault = fault
+        self._rng = random.Random(seed)
+        self._script: dict[str, list[Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self.injected: dict[str, int] = {}
+        self.passed: dict[str, int] = {}
+
+    def script(self, operation: str, *faults: Optional[str]) -> "FaultInjector":
+        with self._lock:
+            self._script.setdefault(operation, []).extend(faults)
+        return self
+
+    def fail_always(self, fault: Optional[str]) -> None:
+        """Make every call fail with `fault` (None restores normal behaviour)."""
+        with self._lock:
+            self._script.clear()
+            self.fault = fault or self.fault
+            self.error_rate = 1.0 if fault else 0.0
+
+    def _next_fault(self, operation: str) -> Optional[str]:
+        with self._lock:
+            queue = self._script.get(operation)
+            if queue:
+                return queue.pop(0)
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return self.fault
+            return None
+
+    def _raise(self, fault: str, operation: str) -> None:
+        if fault == "connection":
+            from botocore.exceptions import EndpointConnectionError
+
+            raise EndpointConnectionError(endpoint_url="https://fake.amazonaws.com")
+        code, status = {
+            "throttle": ("ThrottlingException", 400),
+            "unavailable": ("ServiceUnavailableException", 503),
+            "not_found": ("NotFoundException", 404),
+        }[fault]
+        raise _client_error(code, operation, status)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_") or name == "close":
+            return attr
+
+        def call(*args, **kwargs):
+            fault = self._next_fault(name)
+            with self._lock:
+                counts = self.injected if fault else self.passed
+                counts[name] = counts.get(name, 0) + 1
+            if fault:
+                self._raise(fault, name)
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class LocalJwks:
+    """RSA key pair + JWKS for signing Cognito-like ID tokens locally."""
+
+    def __init__(self, kid: str = "bench-key"):
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from jose import jwk
+
+        self.kid = kid
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self._private_pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        public_pem = key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        public_jwk = jwk.construct(public_pem, "RS256").to_dict()
+        public_jwk = {k: (v.decode() if isinstance(v, bytes) else v) for k, v in public_jwk.items()}
+        public_jwk.update({"kid": kid, "use": "sig", "alg": "RS256"})
+        self.jwks = {"keys": [public_jwk]}
+
+    def token(self, *, email: str, issuer: str, audience: str, ttl_seconds: int = 3600, sub: Optional[str] = None) -> str:
+        from jose import jwt
+
+        now = int(time.time())
+        claims = {
+            "sub": sub or str(uuid.uuid5(uuid.NAMESPACE_URL, email)),
+            "email": email,
+            "aud": audience,
+            "iss": issuer,
+            "token_use": "id",
+            "iat": now,
+            "exp": now + ttl_seconds,
+        }
+        return jwt.encode(claims, self._private_pem, algorithm="RS256", headers={"kid": self.kid})
+
+
+def install_fakes(
+    *,
+    aws_latency_ms: float = 0.0,
+    cognito_region: Optional[str] = None,
+    aws_error_rate: float = 0.0,
+    aws_fault: str = "throttle",
+    shared_chime_path: Optional[str] = None,
+) -> dict:
+    """Register fakes in app.aws_clients; returns them by service name.
+
+    With `aws_error_rate` > 0 every fake is wrapped in a FaultInjector.
+    With `shared_chime_path`, Chime is a SharedFakeChime on that file.
+    """
+    from app.aws_clients import CHIME_SERVICE, COGNITO_SERVICE, S3_SERVICE, set_client
+
+    chime = SharedFakeChime(shared_chime_path, aws_latency_ms) if shared_chime_path else FakeChime(aws_latency_ms)
+    fakes = {
+        CHIME_SERVICE: chime,
+        S3_SERVICE: FakeS3(aws_latency_ms),
+        COGNITO_SERVICE: FakeCognito(aws_latency_ms),
+    }
+    if aws_error_rate > 0:
+        fakes = {
+            name: FaultInjector(fake, error_rate=aws_error_rate, fault=aws_fault, seed=i)
+            for i, (name, fake) in enumerate(fakes.items())
+        }
+    set_client(CHIME_SERVICE, fakes[CHIME_SERVICE])
+    set_client(S3_SERVICE, fakes[S3_SERVICE])
+    set_client(COGNITO_SERVICE, fakes[COGNITO_SERVICE], cognito_region)
+    return fakes
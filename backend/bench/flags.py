@@ -0,0 +1,222 @@
+"""Suspicious-activity flag check (app/flags.py).
+
+Runs the app in process on a fresh SQLite file with short windows, drives the
+attendance / chat write endpoints like examinees would and verifies:
+
+- FLAG_DISCONNECT_COUNT leaves within the window raise one
+  repeated_disconnects flag (further leaves in the window stay quiet);
+- rejoining after FLAG_ABSENCE_SECONDS raises long_absence;
+- an examinee still away in a started exam is flagged by the sweeper, but
+  not in an ended exam;
+- examinee-to-examinee direct messages are flagged once per pair, proctor
+  messages never;
+- a message burst raises one message_burst flag;
+- GET /scheduled-meetings/{join_code}/flags lists them (after_id, ETag / 304);
+- per-examinee state stays bounded however many events it has seen.
+
+Then times the per-event cost on the write path.
+
+Exits non-zero if any check fails.
+
+Usage (from backend/):
+    python -m bench.flags
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_workdir = tempfile.mkdtemp(prefix="exam-flags-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'app.db')}"
+os.environ["REPORTS_DIR"] = os.path.join(_workdir, "reports")
+os.environ["FLAG_DISCONNECT_COUNT"] = "3"
+os.environ["FLAG_DISCONNECT_WINDOW_SECONDS"] = "60"
+os.environ["FLAG_ABSENCE_SECONDS"] = "0.3"
+os.environ["FLAG_BURST_COUNT"] = "5"
+os.environ["FLAG_BURST_WINDOW_SECONDS"] = "10"
+# The check calls the sweep itself.
+os.environ["FLAG_SWEEP_INTERVAL_SECONDS"] = "3600"
+# Dev auth bypass: every caller is "dev-user", made a proctor here.
+os.environ["COGNITO_USER_POOL_ID"] = ""
+os.environ["DEFAULT_PROCTOR_USERS"] = "dev-user"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+async def run() -> list[str]:
+    from app import flags, shared_state
+    from app.db import SessionLocal
+    from bench.asgi import AsgiClient
+    from bench.fakes import install_fakes
+    from main import app
+
+    install_fakes()
+    failures: list[str] = []
+
+    def check(name: str, ok: bool, info: str = "") -> None:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({info})' if info else ''}")
+        if not ok:
+            failures.append(name)
+
+    async with AsgiClient(app) as client:
+
+        async def exam(title: str) -> str:
+            created = await client.request("POST", "/scheduled-meetings", json_body={"title": title})
+            join_code = created.json()["join_code"]
+            await client.request("POST", f"/scheduled-meetings/{join_code}/start", json_body={})
+            return join_code
+
+        async def join(join_code: str, attendee_id: str, role: str = "examinee") -> None:
+            await client.request(
+                "POST",
+                "/attendance/join",
+                json_body={"join_code": join_code, "attendee_id": attendee_id, "role": role,
+                           "external_user_id": f"{attendee_id}#Student"},
+            )
+
+        async def leave(join_code: str, attendee_id: str) -> None:
+            await client.request("POST", "/attendance/leave", json_body={"join_code": join_code, "attendee_id": attendee_id})
+
+        async def chat(join_code: str, sender: str, to_role: str, to: str = None, from_role: str = "examinee") -> None:
+            chat.n += 1
+            await client.request(
+                "POST",
+                "/chat-logs",
+                json_body={"join_code": join_code, "message_id": f"m{chat.n}", "text": "hello", "type": "direct",
+                           "fromRole": from_role, "fromAttendeeId": sender, "toRole": to_role, "toAttendeeId": to},
+            )
+
+        chat.n = 0
+
+        async def flag_list(join_code: str, **params) -> list[dict]:
+            return (await client.request("GET", f"/scheduled-meetings/{join_code}/flags", params=params)).json()
+
+        def kinds(rows: list[dict], attendee_id: str) -> list[str]:
+            return [r["kind"] for r in rows if r["attendee_id"] == attendee_id]
+
+        code = await exam("Flagged exam")
+
+        # Flaky connection: four drops in quick succession.
+        for _ in range(4):
+            await join(code, "flaky")
+            await leave(code, "flaky")
+        await join(code, "flaky")
+        listed = await flag_list(code)
+        check(
+            "repeated disconnects raise one flag",
+            kinds(listed, "flaky") == ["repeated_disconnects"]
+            and next(r for r in listed if r["attendee_id"] == "flaky")["event_count"] == 3,
+            f"{kinds(listed, 'flaky')}",
+        )
+
+        # Away past the threshold, then back.
+        await join(code, "wanderer")
+        await leave(code, "wanderer")
+        await join(code, "steady")
+        await leave(code, "steady")
+        await join(code, "steady")  # back immediately: no absence
+        await asyncio.sleep(0.4)
+        await join(code, "wanderer")
+        listed = await flag_list(code)
+        wanderer = [r for r in listed if r["attendee_id"] == "wanderer"]
+        check(
+            "rejoining after a long absence raises long_absence",
+            [r["kind"] for r in wanderer] == ["long_absence"] and wanderer[0]["last_event_at"] is not None
+            and not kinds(listed, "steady"),
+            f"wanderer={[r['kind'] for r in wanderer]}, steady={kinds(listed, 'steady')}",
+        )
+
+        # Still away: the sweeper flags it, but not in an ended exam.
+        ended = await exam("Ended exam")
+        await join(code, "gone")
+        await leave(code, "gone")
+        await join(ended, "done")
+        await leave(ended, "done")
+        await client.request("POST", f"/scheduled-meetings/{ended}/end", json_body={})
+        await asyncio.sleep(0.4)
+        swept = flags.sweep_absences()
+        gone = [r for r in await flag_list(code) if r["attendee_id"] == "gone"]
+        await join(code, "gone")  # returns later: not flagged twice
+        gone_after = [r for r in await flag_list(code) if r["attendee_id"] == "gone"]
+        check(
+            "sweeper flags examinees still away in a running exam only",
+            swept == 1 and [r["kind"] for r in gone] == ["long_absence"] and gone[0]["last_event_at"] is None
+            and len(gone_after) == 1 and await flag_list(ended) == [],
+            f"swept={swept}, gone={[r['kind'] for r in gone_after]}",
+        )
+
+        # Direct messages.
+        for _ in range(3):
+            await chat(code, "whisperer", "examinee", "accomplice")
+        await chat(code, "whisperer", "examinee", "other")
+        await chat(code, "proctor-1", "examinee", "whisperer", from_role="proctor")
+        await chat(code, "asker", "proctor")
+        listed = await flag_list(code)
+        dms = [(r["attendee_id"], r["related_attendee_id"]) for r in listed if r["kind"] == "examinee_direct_message"]
+        check(
+            "examinee direct messages are flagged once per pair",
+            dms == [("whisperer", "accomplice"), ("whisperer", "other")],
+            f"{dms}",
+        )
+
+        # A burst of messages.
+        for _ in range(7):
+            await chat(code, "spammer", "proctor")
+        listed = await flag_list(code)
+        check(
+            "a message burst raises one flag",
+            kinds(listed, "spammer") == ["message_burst"] and not kinds(listed, "asker"),
+            f"{kinds(listed, 'spammer')}",
+        )
+
+        # Listing: incremental polling and conditional GET.
+        full = await client.request("GET", f"/scheduled-meetings/{code}/flags")
+        newer = await flag_list(code, after_id=listed[-2]["id"])
+        again = await client.request(
+            "GET", f"/scheduled-meetings/{code}/flags", headers={"If-None-Match": full.headers.get("etag", "")}
+        )
+        await chat(code, "whisperer", "examinee", "third")
+        changed = await client.request(
+            "GET", f"/scheduled-meetings/{code}/flags", headers={"If-None-Match": full.headers.get("etag", "")}
+        )
+        check(
+            "flag list supports after_id and ETag / 304",
+            len(newer) == 1 and again.status == 304 and changed.status == 200,
+            f"after_id rows={len(newer)}, unchanged={again.status}, after new flag={changed.status}",
+        )
+
+        # Bounded state: thousands of events, constant size.
+        with SessionLocal() as db:
+            for _ in range(2000):
+                flags.record_leave(db, code, "bounded", None, "examinee")
+                flags.record_chat(db, code, "examinee", "bounded", "proctor", None)
+        sizes = [
+            len(shared_state.backend().get(flags._state_key(kind, code, "bounded")) or b"")
+            for kind in ("att", "chat")
+        ]
+        check(
+            "per-examinee state stays bounded",
+            sizes == [8 * (4 + 3), 8 * (1 + 5)],
+            f"{sizes} bytes after 2,000 leaves and messages",
+        )
+
+    # Per-event cost on the write path (no flag raised).
+    with SessionLocal() as db:
+        n = 20000
+        started = time.perf_counter()
+        for i in range(n):
+            flags.record_chat(db, "timing", "examinee", f"att-{i % 500}", "proctor", None)
+        per_event = (time.perf_counter() - started) / n
+    print(f"\nper chat event: {per_event * 1e6:.1f} µs (in-process shared state)")
+    return failures
+
+
+def main() -> int:
+    failures = asyncio.run(run())
+    print(f"\n{len(failures)} check(s) failed" if failures else "\nall checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""Health / readiness check (app/health.py).
+
+Runs the app in process on a fresh SQLite file with fakes and a small DB
+pool, drives probe rounds by hand and verifies:
+
+- after startup every probe passes: /healthz "ok", /readyz 200;
+- the endpoints run no SQL and no AWS call (timed over many calls);
+- an unreachable database fails readiness (/healthz stays 200, "degraded");
+- a hanging probe is reported as timed out and not started again while
+  its thread is still blocked;
+- a saturated pool fails readiness without waiting for a connection;
+- an unreachable Chime only degrades /healthz (readiness unaffected);
+- stale JWKS keys are fetched again, and kept when that fails;
+- with no keys cached, token checks fail fast (never fetch inline) until
+  the jwks probe loads them;
+- results the loop stopped refreshing fail readiness.
+
+Exits non-zero if any check fails.
+
+Usage (from backend/):
+    python -m bench.health
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_workdir = tempfile.mkdtemp(prefix="exam-health-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'app.db')}"
+os.environ["DB_POOL_SIZE"] = "2"
+os.environ["DB_MAX_OVERFLOW"] = "1"
+os.environ["HEALTH_PROBE_TIMEOUT_SECONDS"] = "0.5"
+# The check runs the probe rounds itself.
+os.environ["HEALTH_PROBE_INTERVAL_SECONDS"] = "3600"
+os.environ["HEALTH_AWS_PROBE_INTERVAL_SECONDS"] = "3600"
+os.environ["AWS_RETRY_MAX_ATTEMPTS"] = "1"
+os.environ["COGNITO_USER_POOL_ID"] = ""
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+async def run() -> list[str]:
+    from fastapi import HTTPException
+    from sqlalchemy import create_engine, event
+
+    from app import auth, db, health
+    from app.aws_clients import CHIME_SERVICE, set_client
+    from app.health import monitor
+    from app.resilience import reset_breakers
+    from bench.asgi import AsgiClient
+    from bench.fakes import FaultInjector, LocalJwks, install_fakes
+    from main import app
+
+    fakes = install_fakes()
+    chime = fakes[CHIME_SERVICE]
+    failures: list[str] = []
+
+    def check(name: str, ok: bool, info: str = "") -> None:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({info})' if info else ''}")
+        if not ok:
+            failures.append(name)
+
+    statements: list[str] = []
+    event.listen(db.engine, "before_cursor_execute", lambda conn, cursor, sql, *a: statements.append(sql))
+
+    async with AsgiClient(app) as client:
+
+        async def status() -> tuple[int, dict, int, dict]:
+            ready = await client.request("GET", "/readyz")
+            healthz = await client.request("GET", "/healthz")
+            return ready.status, ready.json(), healthz.status, healthz.json()
+
+        ready, ready_body, live, report = await status()
+        check(
+            "after startup every probe passes",
+            ready == 200 and live == 200 and report["status"] == "ok"
+            and sorted(report["checks"]) == ["chime", "database", "db_pool", "jwks", "shared_state"],
+            f"readyz={ready}, checks={ {k: v['ok'] for k, v in report['checks'].items()} }",
+        )
+
+        # Cost: the endpoints only read the last results.
+        statements.clear()
+        chime_calls = chime.calls.get("get_meeting", 0)
+        samples = []
+        for _ in range(2000):
+            started = time.perf_counter()
+            await client.request("GET", "/readyz")
+            await client.request("GET", "/healthz")
+            samples.append((time.perf_counter() - started) / 2)
+        check(
+            "health endpoints run no SQL and no AWS call",
+            not statements and chime.calls.get("get_meeting", 0) == chime_calls,
+            f"p50 {statistics.median(samples) * 1e6:.0f} µs per call through the ASGI stack,"
+            f" {len(statements)} statements",
+        )
+
+        # Database unreachable.
+        primary = db.engine
+        db.engine = create_engine(f"sqlite:///{os.path.join(_workdir, 'missing', 'app.db')}")
+        await monitor.run_due(force=True)
+        ready, ready_body, live, report = await status()
+        db.engine = primary
+        await monitor.run_due(force=True)
+        recovered = (await client.request("GET", "/readyz")).status
+        check(
+            "unreachable database fails readiness, liveness stays 200",
+            ready == 503 and ready_body.get("failing") == ["database"] and live == 200
+            and report["status"] == "degraded" and recovered == 200,
+            f"readyz={ready} {ready_body}, healthz={live} {report['status']}, recovered={recovered}",
+        )
+
+        # A probe that hangs: reported as timed out, not piled up.
+        probe = next(p for p in monitor.probes if p.name == "database")
+        calls = []
+
+        def hanging() -> dict:
+            calls.append(1)
+            time.sleep(1.5)
+            return {}
+
+        probe.check = hanging
+        started = time.perf_counter()
+        await monitor.run_due(force=True)
+        elapsed = time.perf_counter() - started
+        await monitor.run_due(force=True)
+        error = monitor.results["database"].get("error", "")
+        await asyncio.sleep(1.2)
+        probe.check = health.check_database
+        await monitor.run_due(force=True)
+        check(
+            "a hanging probe times out and is not started again while blocked",
+            elapsed < 1.0 and "timed out" in error and len(calls) == 1 and monitor.results["database"]["ok"],
+            f"round took {elapsed:.2f}s, started {len(calls)}x, error={error!r}",
+        )
+
+        # Saturated pool: every connection checked out.
+        held = [db.engine.connect() for _ in range(3)]
+        started = time.perf_counter()
+        await monitor.run_due(force=True)
+        elapsed = time.perf_counter() - started
+        ready, ready_body, _, report = await status()
+        for conn in held:
+            conn.close()
+        await monitor.run_due(force=True)
+        recovered = (await client.request("GET", "/readyz")).status
+        check(
+            "a saturated pool fails readiness without waiting for a connection",
+            ready == 503 and ready_body.get("failing") == ["db_pool"]
+            and report["checks"]["database"].get("skipped") == "pool saturated"
+            and elapsed < 0.5 and recovered == 200,
+            f"readyz={ready} {ready_body}, round {elapsed * 1000:.0f} ms, recovered={recovered}",
+        )
+
+        # Chime unreachable: degraded, still ready.
+        broken = FaultInjector(chime)
+        broken.fail_always("connection")
+        set_client(CHIME_SERVICE, broken)
+        await monitor.run_due(force=True)
+        ready, _, live, report = await status()
+        set_client(CHIME_SERVICE, chime)
+        reset_breakers()
+        await monitor.run_due(force=True)
+        check(
+            "unreachable Chime degrades /healthz but keeps the worker ready",
+            ready == 200 and live == 200 and report["status"] == "degraded" and not report["checks"]["chime"]["ok"]
+            and monitor.results["chime"]["ok"],
+            f"readyz={ready}, chime={report['checks']['chime'].get('error')}",
+        )
+
+        # JWKS: stale keys are fetched again; kept if that fails.
+        old, new = LocalJwks("old-key").jwks, LocalJwks("new-key").jwks
+        fetch = auth._fetch_jwks
+        auth.COGNITO_USER_POOL_ID = "us-east-1_bench"
+        try:
+            auth._jwks, auth._jwks_fetched_at = old, time.monotonic() - health.JWKS_MAX_AGE_SECONDS - 1
+            auth._fetch_jwks = lambda: new
+            await monitor.run_due(force=True)
+            rotated = auth.get_jwks()["keys"][0]["kid"]
+            auth._jwks_fetched_at = time.monotonic() - health.JWKS_MAX_AGE_SECONDS - 1
+
+            def unreachable():
+                raise ConnectionError("cognito unreachable")
+
+            auth._fetch_jwks = unreachable
+            await monitor.run_due(force=True)
+            kept = auth.get_jwks()["keys"][0]["kid"]
+            jwks = monitor.results["jwks"]
+
+            # No keys (startup fetch failed) and Cognito hanging: requests
+            # fail fast instead of fetching on the event loop.
+            signer = LocalJwks("late-key")
+            token = signer.token(email="examinee@example.com", issuer=auth.COGNITO_ISSUER, audience="bench-client")
+            auth.COGNITO_APP_CLIENT_ID = "bench-client"
+            auth._jwks, auth._jwks_fetched_at = None, None
+            fetches = []
+
+            def hanging_fetch():
+                fetches.append(1)
+                time.sleep(0.3)
+                raise TimeoutError("cognito timed out")
+
+            auth._fetch_jwks = hanging_fetch
+            started = time.perf_counter()
+            denied = []
+            for _ in range(20):
+                try:
+                    await auth.get_current_user(f"Bearer {token}")
+                except HTTPException as e:
+                    denied.append(e.status_code)
+            request_ms = (time.perf_counter() - started) * 1000
+            request_fetches = len(fetches)
+            auth._fetch_jwks = lambda: signer.jwks
+            reset_breakers()
+            await monitor.run_due(force=True)
+            recovered = (await auth.get_current_user(f"Bearer {token}")).get("email")
+        finally:
+            auth._fetch_jwks = fetch
+            auth.COGNITO_USER_POOL_ID = ""
+            auth.COGNITO_APP_CLIENT_ID = None
+            reset_breakers()
+        check(
+            "stale JWKS keys are fetched again, and kept when that fails",
+            rotated == "new-key" and kept == "new-key" and jwks["ok"] and jwks.get("refresh") == "failed",
+            f"after refresh={rotated}, after failed refresh={kept}",
+        )
+        check(
+            "missing JWKS: requests fail fast without fetching, the probe loads the keys",
+            denied == [401] * 20 and request_fetches == 0 and request_ms < 100
+            and recovered == "examinee@example.com",
+            f"20 requests in {request_ms:.1f} ms, {request_fetches} fetches on the request path, after probe={recovered}",
+        )
+
+        # The loop stopped refreshing: results go stale.
+        for result in monitor.results.values():
+            result["_at"] -= 4 * 3600
+        monitor._build()
+        ready, ready_body, _, _ = await status()
+        await monitor.run_due(force=True)
+        check(
+            "results the loop stopped refreshing fail readiness",
+            ready == 503 and set(ready_body.get("failing", [])) == {"database", "db_pool", "shared_state"},
+            f"readyz={ready} {ready_body}",
+        )
+    return failures
+
+
+def main() -> int:
+    failures = asyncio.run(run())
+    print(f"\n{len(failures)} check(s) failed" if failures else "\nall checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Import-time regression check for the API worker.
+
+Imports `main` in fresh interpreters and reports the median wall time. Exits
+non-zero if the median exceeds --max-ms, or if AWS SDK modules (boto3 /
+botocore) were imported eagerly; they must only load on first AWS use.
+
+Usage (from backend/):
+    python -m bench.import_time --runs 7 --max-ms 1500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_SNIPPET = """
+import json, sys, time
+t0 = time.perf_counter()
+import main  # noqa: F401
+elapsed = (time.perf_counter() - t0) * 1000
+eager = sorted(m for m in ("boto3", "botocore") if m in sys.modules)
+print(json.dumps({"import_ms": elapsed, "eager_aws_modules": eager}))
+"""
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--max-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500")))
+    args = parser.parse_args()
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # No DB/AWS access is needed just to import the app.
+    env = dict(os.environ, DATABASE_URL=os.getenv("DATABASE_URL", "sqlite://"))
+
+    samples = []
+    eager: list[str] = []
+    for _ in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _SNIPPET],
+            cwd=backend_dir,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result["import_ms"])
+        eager = result["eager_aws_modules"]
+
+    median = statistics.median(samples)
+    print(f"import main: median {median:.1f} ms, min {min(samples):.1f} ms, max {max(samples):.1f} ms ({args.runs} runs)")
+
+    failed = False
+    if eager:
+        print(f"FAIL: AWS SDK imported eagerly: {', '.join(eager)}")
+        failed = True
+    if median > args.max_ms:
+        print(f"FAIL: median import time {median:.1f} ms exceeds budget {args.max_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""Startup / shutdown check (app/lifecycle.py).
+
+Verifies the orchestrator on its own:
+
+- components start in dependency order and stop in reverse;
+- unknown dependencies and cycles are refused;
+- a failing start stops what already started and fails the startup;
+- a stop hook that hangs is cut off at the shutdown deadline and the
+  remaining hooks still run;
+
+then the app (in process, fresh SQLite file, fakes):
+
+- GET /readyz is 503 before startup, 200 once started and 503 while
+  shutting down; GET /healthz is 200 throughout;
+- shutdown lets the running report job finish, marks the queued ones failed
+  at once, and disposes the database pool;
+
+and a real uvicorn process (bench.fake_app): ready, then SIGTERM exits
+cleanly through the same shutdown.
+
+Exits non-zero if any check fails.
+
+Usage (from backend/):
+    python -m bench.lifecycle
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+_workdir = tempfile.mkdtemp(prefix="exam-lifecycle-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'app.db')}"
+os.environ["REPORTS_DIR"] = os.path.join(_workdir, "reports")
+os.environ["REPORTS_ON_END"] = "0"
+os.environ["REPORT_WORKERS"] = "1"
+os.environ["SHUTDOWN_TIMEOUT_SECONDS"] = "5"
+# Dev auth bypass: every caller is "dev-user", made a proctor here.
+os.environ["COGNITO_USER_POOL_ID"] = ""
+os.environ["DEFAULT_PROCTOR_USERS"] = "dev-user"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+async def check_orchestrator(check) -> None:
+    from app.lifecycle import STOPPED, Lifecycle
+
+    events: list[str] = []
+
+    def component(lc: Lifecycle, name: str, after=(), fail=False, hang=False) -> None:
+        def start():
+            if fail:
+                raise RuntimeError(f"{name} unavailable")
+            events.append(f"start {name}")
+
+        async def stop():
+            if hang:
+                await asyncio.sleep(60)
+            events.append(f"stop {name}")
+
+        lc.register(name, start=start, stop=stop, after=after)
+
+    lc = Lifecycle()
+    component(lc, "loop", after=("db", "cache"))
+    component(lc, "db")
+    component(lc, "cache", after=("db",))
+    await lc.startup()
+    ready = lc.ready
+    await lc.shutdown()
+    check(
+        "start in dependency order, stop in reverse",
+        ready and events == ["start db", "start cache", "start loop", "stop loop", "stop cache", "stop db"],
+        ", ".join(events),
+    )
+
+    refused = []
+    for deps in ({"a": ("missing",)}, {"a": ("b",), "b": ("a",)}):
+        lc = Lifecycle()
+        for name, after in deps.items():
+            lc.register(name, after=after)
+        try:
+            lc.order()
+        except RuntimeError as e:
+            refused.append(str(e))
+    check("unknown dependencies and cycles are refused", len(refused) == 2, "; ".join(refused))
+
+    events.clear()
+    lc = Lifecycle()
+    component(lc, "db")
+    component(lc, "cache", after=("db",))
+    component(lc, "broken", after=("cache",), fail=True)
+    try:
+        await lc.startup()
+        raised = False
+    except RuntimeError:
+        raised = True
+    check(
+        "a failing start stops what started and fails the startup",
+        raised and lc.state == STOPPED and events == ["start db", "start cache", "stop cache", "stop db"],
+        ", ".join(events),
+    )
+
+    events.clear()
+    lc = Lifecycle(shutdown_timeout=0.5)
+    component(lc, "db")
+    component(lc, "stuck", after=("db",), hang=True)
+    await lc.startup()
+    started = time.perf_counter()
+    await lc.shutdown()
+    elapsed = time.perf_counter() - started
+    check(
+        "a hanging stop is cut off at the deadline, later stops still run",
+        elapsed < 1.0 and events[-1] == "stop db",
+        f"shutdown took {elapsed:.2f}s, {events}",
+    )
+
+
+async def check_app(check) -> None:
+    from sqlalchemy import select
+
+    from app import reports
+    from app.db import SessionLocal, engine
+    from app.lifecycle import lifecycle
+    from app.models import ReportJob
+    from bench.asgi import AsgiClient
+    from bench.fakes import install_fakes
+    from main import app
+
+    install_fakes()
+    client = AsgiClient(app)
+    before = (await client.request("GET", "/readyz")).status
+
+    # Last registered, so stopped first: sees the app as it starts shutting down.
+    during: list[int] = []
+
+    async def probe() -> None:
+        during.append((await client.request("GET", "/readyz")).status)
+        during.append((await client.request("GET", "/healthz")).status)
+
+    lifecycle.register("bench_probe", stop=probe)
+
+    # Slow reports, so one is running and the others are queued at shutdown.
+    build_report = reports.build_report
+
+    def slow_build(db, join_code):
+        time.sleep(1.0)
+        return build_report(db, join_code)
+
+    reports.build_report = slow_build
+
+    await client.startup()
+    after = (await client.request("GET", "/readyz")).status
+    jobs = []
+    for i in range(3):
+        code = (await client.request("POST", "/scheduled-meetings", json_body={"title": f"Exam {i}"})).json()["join_code"]
+        await client.request("POST", f"/scheduled-meetings/{code}/end", json_body={})
+        jobs.append((await client.request("POST", f"/scheduled-meetings/{code}/report")).json()["job_id"])
+    await asyncio.sleep(0.2)
+
+    started = time.perf_counter()
+    await client.shutdown()
+    elapsed = time.perf_counter() - started
+    reports.build_report = build_report
+    idle, in_use = engine.pool.checkedin(), engine.pool.checkedout()
+
+    check(
+        "readiness: 503 before startup, 200 when started, 503 while stopping (liveness 200)",
+        before == 503 and after == 200 and during == [503, 200],
+        f"before={before}, started={after}, stopping={during}",
+    )
+    with SessionLocal() as db:
+        rows = {j.id: j for j in db.scalars(select(ReportJob).where(ReportJob.id.in_(jobs)))}
+    statuses = [rows[j].status for j in jobs]
+    check(
+        "shutdown finishes the running report and fails the queued ones",
+        statuses == ["done", "failed", "failed"]
+        and all(rows[j].error == "Interrupted by shutdown" for j in jobs[1:])
+        and elapsed < 3.0,
+        f"{statuses} in {elapsed:.2f}s",
+    )
+    check("database pool disposed", idle == 0 and in_use == 0, f"idle={idle}, in use={in_use}")
+
+
+def check_process(check) -> None:
+    from bench.multiworker import _free_port, _request
+
+    port = _free_port()
+    log_path = os.path.join(_workdir, "uvicorn.log")
+    env = dict(os.environ, BENCH_SHARED_CHIME_PATH=os.path.join(_workdir, "chime.db"))
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "bench.fake_app:app", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=backend_dir,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    try:
+        deadline = time.monotonic() + 60
+        ready = False
+        while not ready and time.monotonic() < deadline:
+            try:
+                ready = _request(port, "GET", "/readyz").status == 200
+            except OSError:
+                pass
+            if not ready:
+                time.sleep(0.2)
+        started = time.perf_counter()
+        proc.send_signal(signal.SIGTERM)
+        code = proc.wait(timeout=30)
+        elapsed = time.perf_counter() - started
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    output = open(log_path, encoding="utf-8", errors="replace").read()
+    check(
+        "uvicorn worker: ready, then SIGTERM shuts down cleanly",
+        # uvicorn re-raises the signal once shut down.
+        ready
+        and code in (0, -signal.SIGTERM)
+        and "Application shutdown complete" in output
+        and not any(f'"level":"{level}"' in output for level in ("warning", "error")),
+        f"exit={code} after {elapsed:.2f}s",
+    )
+
+
+async def run() -> list[str]:
+    failures: list[str] = []
+
+    def check(name: str, ok: bool, info: str = "") -> None:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({info})' if info else ''}")
+        if not ok:
+            failures.append(name)
+
+    await check_orchestrator(check)
+    await check_app(check)
+    check_process(check)
+    return failures
+
+
+def main() -> int:
+    failures = asyncio.run(run())
+    print(f"\n{len(failures)} check(s) failed" if failures else "\nall checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""Attendee gate check: POST /meetings/{meeting_id}/attendees by Chime MeetingId.
+
+Runs the app in process on a fresh SQLite file with fakes and --meetings
+scheduled meetings, and verifies:
+
+- started meetings admit attendees, ended ones get 403, unknown ids (legacy
+  meetings) pass the gate as before;
+- a join storm on a started meeting runs no scheduled_meetings query (the
+  per-worker map answers) and reads the shared version at most once per
+  MEETING_STATUS_RECHECK_SECONDS;
+- creating another exam (a scheduled-meetings bump) keeps the map;
+- an exam ended by another worker (row + meeting-status bump only) is
+  refused once the version is rechecked; a deleted one no longer maps to
+  its exam;
+- a meeting recreated after Chime dropped it is in the map under its new id
+  (no query), and the old id is no longer served from the map;
+- lookups that miss the map use ix_scheduled_meetings_chime_meeting_id.
+
+Then times the gate lookup: the old unindexed query, the indexed fallback,
+and a map hit.
+
+Exits non-zero if any check fails.
+
+Usage (from backend/):
+    python -m bench.meeting_gate
+    python -m bench.meeting_gate --meetings 50000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+_workdir = tempfile.mkdtemp(prefix="exam-gate-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'app.db')}"
+os.environ["REPORTS_ON_END"] = "0"
+os.environ["ADMISSION_ENABLED"] = "0"
+os.environ["MEETING_STATUS_RECHECK_SECONDS"] = "0.2"
+# Dev auth bypass: every caller is "dev-user", made a proctor here.
+os.environ["COGNITO_USER_POOL_ID"] = ""
+os.environ["DEFAULT_PROCTOR_USERS"] = "dev-user"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+INDEX = "ix_scheduled_meetings_chime_meeting_id"
+
+
+async def run(meetings: int) -> list[str]:
+    from sqlalchemy import event, insert, text, update
+
+    from app.aws_clients import CHIME_SERVICE
+    from app.chime_client import attendee_cache, meeting_status
+    from app.chime_client import MEETING_STATUS_RECHECK_SECONDS
+    from app.conditional import MEETING_STATUS, bump, versions
+    from app.db import SessionLocal, engine
+    from app.models import ScheduledMeeting
+    from bench.asgi import AsgiClient
+    from bench.fakes import install_fakes
+    from main import app
+
+    chime = install_fakes()[CHIME_SERVICE]
+    failures: list[str] = []
+
+    def check(name: str, ok: bool, info: str = "") -> None:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({info})' if info else ''}")
+        if not ok:
+            failures.append(name)
+
+    statements: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *a: statements.append(sql))
+
+    def gate_queries() -> int:
+        return sum(1 for sql in statements if "FROM scheduled_meetings" in sql and "chime_meeting_id =" in sql)
+
+    async with AsgiClient(app) as client:
+        # Scheduled meetings of past terms, so the table isn't trivially small.
+        with SessionLocal() as db:
+            db.execute(
+                insert(ScheduledMeeting),
+                [
+                    {
+                        "join_code": f"exam-old-{i}",
+                        "created_by_user_id": 1,
+                        "region": "us-east-1",
+                        "status": "ended",
+                        "chime_meeting_id": str(uuid.uuid4()),
+                    }
+                    for i in range(meetings)
+                ],
+            )
+            db.commit()
+
+        async def start(title: str) -> tuple[str, str]:
+            code = (await client.request("POST", "/scheduled-meetings", json_body={"title": title})).json()["join_code"]
+            started = await client.request("POST", f"/scheduled-meetings/{code}/start", json_body={})
+            return code, started.json()["meeting"]["Meeting"]["MeetingId"]
+
+        async def attend(meeting_id: str, user: str) -> int:
+            return (
+                await client.request("POST", f"/meetings/{meeting_id}/attendees", json_body={"external_user_id": user})
+            ).status
+
+        live_code, live_id = await start("Live exam")
+        ended_code, ended_id = await start("Ended exam")
+        await client.request("POST", f"/scheduled-meetings/{ended_code}/end", json_body={})
+        legacy = (await client.request("POST", "/meetings", json_body={"external_meeting_id": "legacy-room"})).json()
+        legacy_id = legacy["Meeting"]["MeetingId"]
+        statuses = (await attend(live_id, "a"), await attend(ended_id, "a"), await attend(legacy_id, "a"))
+        check("started: 200, ended: 403, legacy: 200", statuses == (200, 403, 200), f"{statuses}")
+
+        # Join storm on the started meeting, once this worker has noticed the
+        # bumps above (each clears the map: one query per id afterwards).
+        await asyncio.sleep(MEETING_STATUS_RECHECK_SECONDS * 1.5)
+        await attend(live_id, "warm-up")
+        shared_reads = []
+        read_version = versions.get
+        versions.get = lambda key: shared_reads.append(key) or read_version(key)
+        statements.clear()
+        started = time.perf_counter()
+        try:
+            codes = [await attend(live_id, f"examinee-{n}") for n in range(300)]
+        finally:
+            versions.get = read_version
+        elapsed = time.perf_counter() - started
+        check(
+            "join storm runs no scheduled_meetings query",
+            codes == [200] * 300 and gate_queries() == 0,
+            f"{gate_queries()} gate queries for 300 attendees",
+        )
+        check(
+            "join storm reads the shared version once per recheck interval",
+            len(shared_reads) <= elapsed / MEETING_STATUS_RECHECK_SECONDS + 2,
+            f"{len(shared_reads)} reads for 300 attendees in {elapsed:.2f}s",
+        )
+
+        # Other proctors' edits (scheduled-meetings bumps) keep the map.
+        await client.request("POST", "/scheduled-meetings", json_body={"title": "Next week"})
+        await asyncio.sleep(MEETING_STATUS_RECHECK_SECONDS * 1.5)
+        statements.clear()
+        status = await attend(live_id, "after-create")
+        check("creating another exam keeps the map", status == 200 and gate_queries() == 0, f"{gate_queries()} gate queries")
+
+        # Another worker ends the exam: only the row and the shared version change.
+        with SessionLocal() as db:
+            db.execute(update(ScheduledMeeting).where(ScheduledMeeting.join_code == live_code).values(status="ended"))
+            db.commit()
+        bump(MEETING_STATUS)
+        attendee_cache.clear()
+        await asyncio.sleep(MEETING_STATUS_RECHECK_SECONDS * 1.5)
+        refused = await attend(live_id, "late")
+        check("exam ended through another worker is refused", refused == 403, f"status={refused}")
+
+        # Deleted: the id no longer belongs to a scheduled meeting.
+        deleted_code, deleted_id = await start("Deleted exam")
+        await client.request("POST", f"/scheduled-meetings/{deleted_code}/end", json_body={})
+        with SessionLocal() as db:
+            before = meeting_status.lookup(db, deleted_id)
+        await client.request("DELETE", f"/scheduled-meetings/{deleted_code}")
+        with SessionLocal() as db:
+            after = meeting_status.lookup(db, deleted_id)
+        check(
+            "deleted exam is dropped from the map",
+            before is not None and before.status == "ended" and after is None,
+            f"before={before}, after={after}",
+        )
+
+        # Chime dropped the meeting: guest join recreates it under a new id.
+        recreated_code, old_id = await start("Recreated exam")
+        chime.meetings.pop(old_id)
+        joined = (
+            await client.request(
+                "POST", "/guest/join", json_body={"external_meeting_id": recreated_code, "external_user_id": "g"}
+            )
+        ).json()
+        new_id = joined["Meeting"]["MeetingId"]
+        statements.clear()
+        status = await attend(new_id, "h")
+        with SessionLocal() as db:
+            old = meeting_status.lookup(db, old_id)
+        check(
+            "recreated meeting is mapped under its new id, old id no longer served from the map",
+            new_id != old_id and status == 200 and gate_queries() == 1 and old is None,
+            f"new-id gate queries={gate_queries() - 1}, old id -> {old}",
+        )
+
+        with engine.connect() as conn:
+            plan = " ".join(
+                str(row[-1])
+                for row in conn.execute(
+                    text("EXPLAIN QUERY PLAN SELECT join_code, status FROM scheduled_meetings WHERE chime_meeting_id = :m"),
+                    {"m": old_id},
+                )
+            )
+        check("map misses use the chime_meeting_id index", INDEX in plan, plan)
+
+        # Cost of one gate lookup.
+        ids = [live_id, ended_id, new_id]
+
+        def timed(fn, n: int = 2000) -> str:
+            samples = []
+            for i in range(n):
+                started = time.perf_counter()
+                fn(ids[i % len(ids)])
+                samples.append(time.perf_counter() - started)
+            return f"p50 {statistics.median(samples) * 1e6:8.1f} µs"
+
+        old_query = text("SELECT join_code, status FROM scheduled_meetings WHERE chime_meeting_id = :m")
+        with engine.connect() as conn:
+            indexed = timed(lambda m: conn.execute(old_query, {"m": m}).first(), 500)
+            conn.execute(text(f"DROP INDEX {INDEX}"))
+            unindexed = timed(lambda m: conn.execute(old_query, {"m": m}).first(), 100)
+            conn.execute(text(f"CREATE INDEX {INDEX} ON scheduled_meetings (chime_meeting_id)"))
+            conn.commit()
+        with SessionLocal() as db:
+            mapped = timed(lambda m: meeting_status.lookup(db, m))
+        print(f"\ngate lookup, {meetings:,} scheduled meetings:")
+        print(f"  query, no index (before):  {unindexed}")
+        print(f"  query, indexed (fallback): {indexed}")
+        print(f"  map hit:                   {mapped}\n")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--meetings", type=int, default=20000, help="scheduled meetings in the table")
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args.meetings))
+    print(f"{len(failures)} check(s) failed" if failures else "all checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
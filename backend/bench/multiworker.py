@@ -0,0 +1,262 @@
+"""Multi-worker correctness check with real worker processes.
+
+Starts N Uvicorn processes (one port each, like N nodes behind a load
+balancer) on one SQLite database with SHARED_STATE_URL=sql://, all talking
+to one SharedFakeChime. Consecutive steps of each flow are sent to different
+workers, and the check verifies:
+
+- init_db ran on one elected worker only;
+- examinees joining a scheduled exam through different workers all land in
+  the same Chime meeting (created once);
+- an unscheduled (legacy) meeting created on one worker is joinable through
+  the others, and concurrent creates agree on one meeting;
+- an Idempotency-Key retry landing on another worker is replayed;
+- a write on one worker invalidates ETags handed out by another;
+- once the exam is ended on one worker, every worker refuses joins.
+
+With --gunicorn, one gunicorn master (gunicorn.conf.py) runs the N workers
+on a single port instead, and the kernel decides which worker serves what.
+
+Exits non-zero if any check fails.
+
+Usage (from backend/):
+    python -m bench.multiworker
+    python -m bench.multiworker --workers 4
+    python -m bench.multiworker --gunicorn
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+
+class Reply:
+    def __init__(self, status: int, headers: dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Any:
+        return json.loads(self.body or b"null")
+
+
+def _request(port: int, method: str, path: str, json_body: Any = None, headers: Optional[dict] = None) -> Reply:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        body = json.dumps(json_body).encode() if json_body is not None else None
+        all_headers = {"Content-Type": "application/json", **(headers or {})}
+        conn.request(method, path, body=body, headers=all_headers)
+        resp = conn.getresponse()
+        return Reply(resp.status, {k.lower(): v for k, v in resp.getheaders()}, resp.read())
+    finally:
+        conn.close()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(ports: list[int], timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    for port in set(ports):
+        while True:
+            try:
+                if _request(port, "GET", "/readyz").status == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"worker on port {port} did not become ready")
+            time.sleep(0.2)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--examinees", type=int, default=24)
+    parser.add_argument("--gunicorn", action="store_true", help="one gunicorn master instead of one process per port")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="exam-multiworker-")
+    chime_path = os.path.join(workdir, "chime.db")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        SHARED_STATE_URL="sql://",
+        BENCH_SHARED_CHIME_PATH=chime_path,
+        # Reports queued on end (REPORTS_ON_END) stay out of the source tree.
+        REPORTS_DIR=os.path.join(workdir, "reports"),
+        ADMISSION_WORKERS=str(args.workers),
+        # Dev auth bypass: every caller is "dev-user", made a proctor here.
+        COGNITO_USER_POOL_ID="",
+        DEFAULT_PROCTOR_USERS="dev-user",
+        AWS_DEFAULT_REGION="us-east-1",
+    )
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    procs: list[subprocess.Popen] = []
+    logs: list[str] = []
+
+    def spawn(cmd: list[str]) -> None:
+        log_path = os.path.join(workdir, f"worker{len(procs)}.log")
+        logs.append(log_path)
+        with open(log_path, "wb") as log:
+            procs.append(subprocess.Popen(cmd, cwd=backend_dir, env=env, stdout=log, stderr=subprocess.STDOUT))
+
+    if args.gunicorn:
+        port = _free_port()
+        ports = [port] * args.workers
+        env["WEB_CONCURRENCY"] = str(args.workers)
+        env["BIND"] = f"127.0.0.1:{port}"
+        spawn([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "bench.fake_app:app"])
+    else:
+        ports = [_free_port() for _ in range(args.workers)]
+        for port in ports:
+            spawn([sys.executable, "-m", "uvicorn", "bench.fake_app:app", "--host", "127.0.0.1", "--port", str(port)])
+
+    failures: list[str] = []
+
+    def check(name: str, ok: bool, info: str = "") -> None:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({info})' if info else ''}")
+        if not ok:
+            failures.append(name)
+
+    def worker(i: int) -> int:
+        return ports[i % len(ports)]
+
+    try:
+        _wait_ready(ports)
+        from bench.fakes import SharedFakeChime
+
+        chime = SharedFakeChime(chime_path)
+        mode = "gunicorn master" if args.gunicorn else "processes"
+        print(f"{args.workers} worker {mode} up (logs in {workdir})\n")
+
+        # Idempotent create: the retry lands on another worker.
+        key = {"Idempotency-Key": uuid.uuid4().hex}
+        created = _request(worker(0), "POST", "/scheduled-meetings", {"title": "Multi-worker exam"}, key)
+        retried = _request(worker(1), "POST", "/scheduled-meetings", {"title": "Multi-worker exam"}, key)
+        join_code = created.json()["join_code"]
+        listing = _request(worker(2), "GET", "/scheduled-meetings")
+        titles = [m["title"] for m in listing.json()]
+        check(
+            "Idempotency-Key retry on another worker is replayed",
+            retried.json().get("join_code") == join_code
+            and retried.headers.get("idempotent-replayed") == "true"
+            and titles.count("Multi-worker exam") == 1,
+            f"meetings created: {titles.count('Multi-worker exam')}",
+        )
+
+        # ETag handed out by one worker, write on another, revalidate on a third.
+        etag = listing.headers.get("etag")
+        started = _request(worker(1), "POST", f"/scheduled-meetings/{join_code}/start", {})
+        revalidated = _request(worker(0), "GET", "/scheduled-meetings", headers={"If-None-Match": etag})
+        fresh_tag = revalidated.headers.get("etag")
+        again = _request(worker(2), "GET", "/scheduled-meetings", headers={"If-None-Match": fresh_tag or ""})
+        check(
+            "write on one worker invalidates ETags of the others",
+            started.status == 200 and revalidated.status == 200 and again.status == 304,
+            f"stale tag -> {revalidated.status}, fresh tag on another worker -> {again.status}",
+        )
+
+        # Join storm spread over all workers (and a reconnect via a different one).
+        def join(i: int) -> Reply:
+            # Like the frontend: retry after Retry-After when admission control says 429.
+            body = {"external_meeting_id": join_code, "external_user_id": f"student-{i}"}
+            for attempt in range(5):
+                reply = _request(worker(i + attempt), "POST", "/guest/join", body)
+                if reply.status != 429:
+                    break
+                time.sleep(float(reply.headers.get("retry-after") or 1))
+            return reply
+
+        with ThreadPoolExecutor(max_workers=min(32, args.examinees)) as pool:
+            joins = list(pool.map(join, range(args.examinees)))
+        meeting_ids = {(r.json().get("Meeting") or {}).get("MeetingId") for r in joins if r.status == 200}
+        totals = chime.totals()
+        check(
+            "joins through different workers share one Chime meeting",
+            all(r.status == 200 for r in joins) and len(meeting_ids) == 1 and totals.get("create_meeting") == 1,
+            f"statuses={sorted({r.status for r in joins})}, meetings={len(meeting_ids)}, "
+            f"create_meeting calls={totals.get('create_meeting')}",
+        )
+        first = joins[0].json()["Attendee"]["AttendeeId"]
+        rejoin = _request(worker(1), "POST", "/guest/join", {"external_meeting_id": join_code, "external_user_id": "student-0"})
+        check(
+            "reconnect via another worker gets the same attendee",
+            rejoin.status == 200 and rejoin.json()["Attendee"]["AttendeeId"] == first,
+        )
+
+        # Legacy (unscheduled) meetings: registry shared by the workers.
+        legacy = _request(worker(0), "POST", "/meetings", {"external_meeting_id": "legacy-room"})
+        guest = _request(worker(1), "POST", "/guest/join", {"external_meeting_id": "legacy-room", "external_user_id": "g1"})
+        check(
+            "legacy meeting created on one worker is joinable on another",
+            legacy.status == 200
+            and guest.status == 200
+            and guest.json()["Meeting"]["MeetingId"] == legacy.json()["Meeting"]["MeetingId"],
+            f"create={legacy.status}, join={guest.status}",
+        )
+        with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+            racing = list(
+                pool.map(
+                    lambda i: _request(worker(i), "POST", "/meetings", {"external_meeting_id": "legacy-race"}),
+                    range(len(ports)),
+                )
+            )
+        raced_ids = {r.json()["Meeting"]["MeetingId"] for r in racing if r.status == 200}
+        check("concurrent legacy creates agree on one meeting", len(raced_ids) == 1, f"meetings={len(raced_ids)}")
+
+        # End on one worker: every worker refuses further joins.
+        ended = _request(worker(2), "POST", f"/scheduled-meetings/{join_code}/end", {})
+        after = [
+            _request(worker(i), "POST", "/guest/join", {"external_meeting_id": join_code, "external_user_id": "student-0"})
+            for i in range(len(ports))
+        ]
+        check(
+            "ended exam is refused by every worker",
+            ended.status == 200 and all(r.status == 403 for r in after),
+            f"statuses={[r.status for r in after]}",
+        )
+    except Exception as e:
+        # e.g. a worker answering 500 where a flow expects JSON.
+        check("flows completed", False, f"{type(e).__name__}: {e}")
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    output = "".join(open(path, encoding="utf-8", errors="replace").read() for path in logs)
+    leaders = output.count("elected leader")
+    applied = output.count("Applied schema migration")
+    from app.migrations import LATEST_VERSION
+
+    check(
+        "init_db ran on one elected worker",
+        leaders == 1 and applied == LATEST_VERSION,
+        f"leaders={leaders}, migrations applied={applied}",
+    )
+
+    print(f"\n{len(failures)} check(s) failed" if failures else "\nall checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""GET /overview check: live stats of many started exams from counters.
+
+Runs the app in process on a fresh SQLite file, starts --rooms exams and
+drives examinees through the attendance / chat endpoints (joins, leaves,
+messages, direct messages that raise flags). Verifies:
+
+- every room's live attendees, expected (roster) count, last chat time and
+  flag count match the tables; a roster change updates the expected count;
+- a steady-state call reads no scheduled-meeting / attendance / chat / flag
+  table (counters only);
+- joins committed but not yet counted when a new room is first reconciled
+  (a join storm) are not kept as a correction, so they aren't counted twice
+  once their counters land;
+- after the in-process backend loses its counters (restart), the next call
+  reconciles from the tables and is correct again;
+- rows written around the counters (direct DB insert) are corrected once two
+  reconciles agree.
+
+Then compares one /overview call with the per-room list calls it replaces.
+
+Exits non-zero if any check fails.
+
+Usage (from backend/):
+    python -m bench.overview
+    python -m bench.overview --rooms 50 --examinees 40
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+_workdir = tempfile.mkdtemp(prefix="exam-overview-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'app.db')}"
+os.environ["OVERVIEW_RECONCILE_SECONDS"] = "1"
+# Starting every room at once is not what is measured here.
+os.environ["ADMISSION_ENABLED"] = "0"
+# Dev auth bypass: every caller is "dev-user", made a proctor here.
+os.environ["COGNITO_USER_POOL_ID"] = ""
+os.environ["DEFAULT_PROCTOR_USERS"] = "dev-user"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+LOG_TABLES = ("scheduled_meetings", "meeting_attendance_sessions", "meeting_chat_logs", "meeting_flags")
+
+
+async def run(rooms: int, examinees: int) -> list[str]:
+    from sqlalchemy import event, func, select
+
+    from app import overview, rosters, shared_state
+    from app.conditional import USERS, bump
+    from app.db import SessionLocal, engine
+    from app.models import MeetingAttendanceSession, MeetingChatLog, MeetingFlag, User
+    from bench.asgi import AsgiClient
+    from bench.fakes import install_fakes
+    from main import app
+
+    install_fakes()
+    failures: list[str] = []
+    rng = random.Random(5)
+
+    def check(name: str, ok: bool, info: str = "") -> None:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({info})' if info else ''}")
+        if not ok:
+            failures.append(name)
+
+    statements: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *a: statements.append(sql))
+
+    def truth(codes: list[str]) -> dict[str, dict]:
+        with SessionLocal() as db:
+            s = MeetingAttendanceSession
+            live = dict(
+                db.execute(
+                    select(s.join_code, func.count())
+                    .where(s.left_at.is_(None), s.role == "examinee")
+                    .group_by(s.join_code)
+                ).all()
+            )
+            flags = dict(db.execute(select(MeetingFlag.join_code, func.count()).group_by(MeetingFlag.join_code)).all())
+            chats = dict(
+                db.execute(select(MeetingChatLog.join_code, func.max(MeetingChatLog.created_at)).group_by(MeetingChatLog.join_code)).all()
+            )
+        return {c: {"live": live.get(c, 0), "flags": flags.get(c, 0), "chat": chats.get(c)} for c in codes}
+
+    def mismatches(listed: list[dict], codes: list[str]) -> list[str]:
+        expected = truth(codes)
+        bad = []
+        for row in listed:
+            want = expected[row["join_code"]]
+            last = row["last_chat_at"] and datetime.fromisoformat(row["last_chat_at"])
+            # Counter time is taken right after the commit; allow the gap.
+            chat_ok = (last is None) == (want["chat"] is None) and (
+                last is None or abs((last - want["chat"]).total_seconds()) < 2
+            )
+            if row["live_attendees"] != want["live"] or row["flag_count"] != want["flags"] or not chat_ok:
+                bad.append(f"{row['join_code']}: got {row['live_attendees']}/{row['flag_count']}, want {want['live']}/{want['flags']}")
+        if len(listed) != len(codes):
+            bad.append(f"{len(listed)} rooms listed, {len(codes)} started")
+        return bad
+
+    def enrol(email: str, class_name: str) -> None:
+        with SessionLocal() as db:
+            user = User(email=email, role="examinee", class_name=class_name)
+            db.add(user)
+            rosters.set_user_class(db, user, class_name)
+            db.commit()
+
+    async with AsgiClient(app) as client:
+        # Roster: one class of --examinees students per room.
+        for i in range(rooms):
+            for n in range(examinees):
+                enrol(f"student-{i}-{n}@example.com", f"class-{i}")
+        codes = []
+        for i in range(rooms + 1):
+            created = await client.request(
+                "POST", "/scheduled-meetings", json_body={"title": f"Room {i}", "class_names": [f"class-{i}"]}
+            )
+            codes.append(created.json()["join_code"])
+        for code in codes[:rooms]:
+            await client.request("POST", f"/scheduled-meetings/{code}/start", json_body={})
+        not_started = codes.pop()
+
+        started = time.perf_counter()
+        events = 0
+        for code in codes:
+            for n in range(examinees):
+                await client.request(
+                    "POST", "/attendance/join", json_body={"join_code": code, "attendee_id": f"{code}-{n}"}
+                )
+                events += 1
+            # Some leave, some chat, a few whisper to each other.
+            for n in rng.sample(range(examinees), examinees // 4):
+                await client.request(
+                    "POST", "/attendance/leave", json_body={"join_code": code, "attendee_id": f"{code}-{n}"}
+                )
+                events += 1
+            for n in range(rng.randint(0, 5)):
+                to_examinee = rng.random() < 0.3
+                await client.request(
+                    "POST",
+                    "/chat-logs",
+                    json_body={"join_code": code, "message_id": f"m{n}", "text": "hi", "type": "direct",
+                               "fromRole": "examinee", "fromAttendeeId": f"{code}-{n}",
+                               "toRole": "examinee" if to_examinee else "proctor", "toAttendeeId": f"{code}-{n + 1}"},
+                )
+                events += 1
+        await client.request("POST", "/attendance/join", json_body={"join_code": not_started, "attendee_id": "x"})
+        print(f"{rooms} rooms, {events:,} write events in {time.perf_counter() - started:.1f}s")
+
+        first = (await client.request("GET", "/overview")).json()
+        bad = mismatches(first, codes)
+        check(
+            "every room matches the tables",
+            not bad and all(row["expected_count"] == examinees for row in first),
+            "; ".join(bad[:3]) or f"{sum(r['live_attendees'] for r in first)} live, {sum(r['flag_count'] for r in first)} flags",
+        )
+
+        statements.clear()
+        steady = (await client.request("GET", "/overview")).json()
+        touched = sorted({t for sql in statements for t in LOG_TABLES if t in sql})
+        check("steady-state call reads no meeting / log table", not touched and steady == first, f"{touched}")
+
+        # Roster change: the cached meeting list follows the users version.
+        enrol("late-enrolment@example.com", "class-0")
+        bump(USERS)
+        enrolled = (await client.request("GET", "/overview")).json()
+        room = next(r for r in enrolled if r["join_code"] == codes[0])
+        check("roster changes update expected_count", room["expected_count"] == examinees + 1, f"{room['expected_count']}")
+
+        # Join storm in a room that just started: sessions committed, their
+        # counter increments not yet made when /overview first sees the room.
+        created = await client.request("POST", "/scheduled-meetings", json_body={"title": "Storm"})
+        storm = created.json()["join_code"]
+        await client.request("POST", f"/scheduled-meetings/{storm}/start", json_body={})
+        codes.append(storm)
+        with SessionLocal() as db:
+            for n in range(5):
+                db.add(MeetingAttendanceSession(join_code=storm, attendee_id=f"storm-{n}", role="examinee"))
+            db.commit()
+        in_flight = (await client.request("GET", "/overview")).json()
+        for _ in range(5):
+            overview.record_join(storm, "examinee")
+        landed = (await client.request("GET", "/overview")).json()
+        await asyncio.sleep(1.1)
+        confirmed = (await client.request("GET", "/overview")).json()
+        live = [next(r for r in rows if r["join_code"] == storm)["live_attendees"] for rows in (in_flight, landed, confirmed)]
+        bad = mismatches(confirmed, codes)
+        check(
+            "in-flight joins are not kept as a correction",
+            live == [0, 5, 5] and not bad,
+            f"live before / after the counters landed / after the next reconcile: {live}",
+        )
+
+        # Restart of the in-process backend: counters are gone.
+        shared_state.set_backend(shared_state.MemoryBackend())
+        after_restart = (await client.request("GET", "/overview")).json()
+        bad = mismatches(after_restart, codes)
+        check("counters lost: reconciled from the tables", not bad, "; ".join(bad[:3]))
+
+        # A session written around the write path, e.g. by a script.
+        with SessionLocal() as db:
+            db.add(MeetingAttendanceSession(join_code=codes[0], attendee_id="side-door", role="examinee"))
+            db.commit()
+        await asyncio.sleep(1.1)
+        await client.request("GET", "/overview")
+        await asyncio.sleep(1.1)
+        corrected = (await client.request("GET", "/overview")).json()
+        bad = mismatches(corrected, codes)
+        check("out-of-band rows are corrected once two reconciles agree", not bad, "; ".join(bad[:3]))
+
+        # One dashboard refresh: /overview vs the per-room list calls it replaces.
+        def timed(samples: list[float]) -> str:
+            samples.sort()
+            return f"p50 {statistics.median(samples) * 1000:6.1f} ms, p95 {samples[int(len(samples) * 0.95) - 1] * 1000:6.1f} ms"
+
+        overview_times, per_room_times = [], []
+        for _ in range(20):
+            t = time.perf_counter()
+            await client.request("GET", "/overview")
+            overview_times.append(time.perf_counter() - t)
+            t = time.perf_counter()
+            for code in codes:
+                await client.request("GET", f"/attendance/{code}")
+                await client.request("GET", f"/chat-logs/{code}")
+            per_room_times.append(time.perf_counter() - t)
+        print(f"\nGET /overview ({rooms} rooms):            {timed(overview_times)}")
+        print(f"per-room list calls ({2 * rooms} requests): {timed(per_room_times)}\n")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=50, help="started exams")
+    parser.add_argument("--examinees", type=int, default=20, help="examinees per exam")
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args.rooms, args.examinees))
+    print(f"{len(failures)} check(s) failed" if failures else "all checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
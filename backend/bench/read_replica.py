@@ -0,0 +1,161 @@
+"""Read-replica routing check with two local SQLite databases.
+
+The app runs in process with DATABASE_URL (primary) and DATABASE_READ_URL
+(replica) pointing at two SQLite files. "Replication" is explicit: the
+check copies the primary onto the replica (sqlite3 backup) when it wants the
+replica to catch up, so replica lag is whatever the check says it is.
+Verifies:
+
+- a resource not written recently is read from the replica;
+- right after a write, the writer reads it back from the primary
+  (read-your-writes), although the replica has not caught up yet;
+- `X-Read-Consistency: primary` forces primary reads;
+- once the lag window has passed, reads go back to the replica;
+- read-only sessions refuse writes.
+
+Exits non-zero if any check fails.
+
+Usage (from backend/):
+    python -m bench.read_replica
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+_workdir = tempfile.mkdtemp(prefix="exam-replica-")
+PRIMARY_PATH = os.path.join(_workdir, "primary.db")
+REPLICA_PATH = os.path.join(_workdir, "replica.db")
+LAG_WINDOW_SECONDS = 0.3
+
+os.environ["DATABASE_URL"] = f"sqlite:///{PRIMARY_PATH}"
+os.environ["DATABASE_READ_URL"] = f"sqlite:///{REPLICA_PATH}"
+os.environ["DB_READ_REPLICA_MAX_LAG_SECONDS"] = str(LAG_WINDOW_SECONDS)
+# Dev auth bypass: every caller is "dev-user", made a proctor here.
+os.environ["COGNITO_USER_POOL_ID"] = ""
+os.environ["DEFAULT_PROCTOR_USERS"] = "dev-user"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+def replicate() -> None:
+    """Bring the replica up to date with the primary."""
+    src = sqlite3.connect(PRIMARY_PATH)
+    dst = sqlite3.connect(REPLICA_PATH)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def insert_replica_only(join_code: str, text: str) -> None:
+    """A row only the replica has: seeing it proves the replica served the read."""
+    conn = sqlite3.connect(REPLICA_PATH)
+    try:
+        conn.execute(
+            "INSERT INTO meeting_chat_logs (join_code, message_id, text, created_at)"
+            " VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+            (join_code, uuid.uuid4().hex, text),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def run() -> list[str]:
+    from app.db import ReadSessionLocal, read_routing_total
+    from app.models import User
+    from bench.asgi import AsgiClient
+    from bench.fakes import install_fakes
+    from main import app
+
+    install_fakes()
+    failures: list[str] = []
+
+    def check(name: str, ok: bool, info: str = "") -> None:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({info})' if info else ''}")
+        if not ok:
+            failures.append(name)
+
+    def routed() -> dict[tuple[str, ...], float]:
+        return dict(read_routing_total._values)
+
+    async with AsgiClient(app) as client:
+        join_code = "replica-exam"
+        await client.request("GET", "/me")  # creates the dev user on the primary
+        replicate()
+        await asyncio.sleep(LAG_WINDOW_SECONDS * 1.5)
+
+        def texts(resp) -> list[str]:
+            return [row["text"] for row in resp.json()]
+
+        insert_replica_only(join_code, "replica-only")
+        quiet = await client.request("GET", f"/chat-logs/{join_code}")
+        check("quiet resource is read from the replica", texts(quiet) == ["replica-only"], f"rows={texts(quiet)}")
+
+        # Write, then read back before the replica has caught up.
+        posted = await client.request(
+            "POST", "/chat-logs", json_body={"join_code": join_code, "message_id": "m1", "text": "hello"}
+        )
+        fresh = await client.request("GET", f"/chat-logs/{join_code}")
+        check(
+            "read-your-writes: just-written resource comes from the primary",
+            posted.status == 200 and texts(fresh) == ["hello"],
+            f"rows={texts(fresh)}",
+        )
+
+        created = await client.request("POST", "/scheduled-meetings", json_body={"title": "Replica exam"})
+        listing = await client.request("GET", "/scheduled-meetings")
+        check(
+            "new scheduled meeting is listed immediately",
+            created.status == 200 and [m["title"] for m in listing.json()] == ["Replica exam"],
+            f"titles={[m['title'] for m in listing.json()]}",
+        )
+
+        # Past the lag window the un-replicated row is invisible again, unless forced.
+        await asyncio.sleep(LAG_WINDOW_SECONDS * 1.5)
+        forced = await client.request(
+            "GET", f"/chat-logs/{join_code}", headers={"X-Read-Consistency": "primary"}
+        )
+        check("X-Read-Consistency: primary reads the primary", texts(forced) == ["hello"], f"rows={texts(forced)}")
+
+        replicate()
+        before = routed()
+        caught_up = await client.request("GET", f"/chat-logs/{join_code}")
+        after = routed()
+        replica_reads = after.get(("replica", "none"), 0) - before.get(("replica", "none"), 0)
+        check(
+            "after the lag window reads return to the replica",
+            texts(caught_up) == ["hello"] and replica_reads == 1,
+            f"rows={texts(caught_up)}, replica reads={replica_reads:g}",
+        )
+
+    session = ReadSessionLocal()
+    try:
+        session.add(User(email=f"{uuid.uuid4().hex}@example.com", role="examinee"))
+        session.flush()
+        refused = False
+    except RuntimeError:
+        refused = True
+    finally:
+        session.close()
+    check("read-only sessions refuse writes", refused)
+
+    print("\nrouting:", {"/".join(k): int(v) for k, v in sorted(routed().items())})
+    return failures
+
+
+def main() -> int:
+    started = time.perf_counter()
+    failures = asyncio.run(run())
+    print(f"\n{len(failures)} check(s) failed" if failures else "\nall checks passed", end="")
+    print(f" in {time.perf_counter() - started:.1f}s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
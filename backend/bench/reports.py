@@ -0,0 +1,289 @@
+"""Post-exam report job check (app/reports.py).
+
+Runs the app in process on a fresh SQLite file with fake S3, fills an exam
+with attendance, chat logs, a flag and recordings, ends it and verifies:
+
+- ending the exam queues the report; POST /scheduled-meetings/{join_code}/report
+  then returns that job (cached) instead of building again;
+- sessions still open at the end are closed by it, so the report has no
+  `open` examinees and the clients' leave calls don't make it stale;
+- GET /reports/{job_id} reaches "done" and the JSON / zip artifacts hold every
+  session, message, recording and flag (CSV row counts included);
+- new data, or force=true, builds a new report;
+- an archived exam reports the same transcript from the archive files;
+- with REPORTS_S3_BUCKET, artifacts go to S3 and downloads redirect;
+- a job orphaned by a dead process reads as failed and is rebuilt.
+
+Prints the build time and artifact sizes.
+
+Exits non-zero if any check fails.
+
+Usage (from backend/):
+    python -m bench.reports
+    python -m bench.reports --messages 50000
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta
+
+_workdir = tempfile.mkdtemp(prefix="exam-reports-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'app.db')}"
+os.environ["REPORTS_DIR"] = os.path.join(_workdir, "reports")
+os.environ["ARCHIVE_DIR"] = os.path.join(_workdir, "archive")
+os.environ["ARCHIVE_BATCH_PAUSE_SECONDS"] = "0"
+os.environ["RECORDINGS_S3_BUCKET"] = "bench-recordings"
+# Dev auth bypass: every caller is "dev-user", made a proctor here.
+os.environ["COGNITO_USER_POOL_ID"] = ""
+os.environ["DEFAULT_PROCTOR_USERS"] = "dev-user"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+async def run(messages: int, sessions: int) -> list[str]:
+    from sqlalchemy import func, select, update
+
+    from app import archive, reports
+    from app.aws_clients import S3_SERVICE
+    from app.db import SessionLocal
+    from app.models import MeetingAttendanceSession, MeetingChatLog, ReportJob, ScheduledMeeting
+    from bench.asgi import AsgiClient
+    from bench.fakes import install_fakes
+    from main import app
+
+    s3 = install_fakes()[S3_SERVICE]
+    failures: list[str] = []
+
+    def check(name: str, ok: bool, info: str = "") -> None:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({info})' if info else ''}")
+        if not ok:
+            failures.append(name)
+
+    def fill(join_code: str) -> None:
+        base = datetime.utcnow() - timedelta(hours=1)
+        with SessionLocal() as db:
+            db.execute(
+                MeetingChatLog.__table__.insert(),
+                [
+                    {
+                        "join_code": join_code,
+                        "message_id": f"m{i}",
+                        "msg_type": "direct",
+                        "from_role": "examinee",
+                        "from_attendee_id": f"att-{i % sessions}",
+                        "to_role": "proctor",
+                        "text": f"質問 {i}, with a comma",
+                        "sent_at": base + timedelta(seconds=i % 3600),
+                    }
+                    for i in range(messages)
+                ],
+            )
+            db.execute(
+                MeetingAttendanceSession.__table__.insert(),
+                [
+                    {
+                        "join_code": join_code,
+                        "attendee_id": f"att-{i % sessions}",
+                        "external_user_id": f"student-{i % sessions}#Student",
+                        "role": "examinee",
+                        "joined_at": base + timedelta(minutes=i // sessions),
+                        # Still connected (second session) when the exam ends.
+                        "left_at": None if i >= sessions else base + timedelta(minutes=50),
+                        "duration_seconds": None if i >= sessions else 3000 - 60 * (i // sessions),
+                    }
+                    # Every examinee twice (one reconnect).
+                    for i in range(2 * sessions)
+                ],
+            )
+            db.commit()
+        for n in range(2):
+            s3.put_object(Bucket="bench-recordings", Key=f"proctor-recordings/{join_code}/rec-{n}.webm", Body=b"x" * 1000)
+
+    async with AsgiClient(app) as client:
+
+        async def wait_done(job_id: str, timeout: float = 120.0) -> dict:
+            deadline = time.monotonic() + timeout
+            while True:
+                view = (await client.request("GET", f"/reports/{job_id}")).json()
+                if view["status"] in ("done", "failed") or time.monotonic() > deadline:
+                    return view
+                await asyncio.sleep(0.05)
+
+        async def post_report(join_code: str, **params):
+            return await client.request("POST", f"/scheduled-meetings/{join_code}/report", params=params)
+
+        async def download(job_id: str, fmt: str):
+            return await client.request("GET", f"/reports/{job_id}/download", params={"format": fmt})
+
+        created = await client.request("POST", "/scheduled-meetings", json_body={"title": "Report exam"})
+        code = created.json()["join_code"]
+        await client.request("POST", f"/scheduled-meetings/{code}/start", json_body={})
+        fill(code)
+        # A flag, through the real write path.
+        await client.request(
+            "POST",
+            "/chat-logs",
+            json_body={"join_code": code, "message_id": "dm", "text": "psst", "type": "direct", "fromRole": "examinee",
+                       "fromAttendeeId": "att-1", "toRole": "examinee", "toAttendeeId": "att-2"},
+        )
+
+        started = time.perf_counter()
+        await client.request("POST", f"/scheduled-meetings/{code}/end", json_body={})
+        # The examinees' clients report leaving once the meeting is gone.
+        leaves = [
+            (
+                await client.request(
+                    "POST", "/attendance/leave", json_body={"join_code": code, "attendee_id": f"att-{n}"}
+                )
+            ).json()["updated"]
+            for n in range(sessions)
+        ]
+        first = await post_report(code)
+        view = await wait_done(first.json()["job_id"])
+        elapsed = time.perf_counter() - started
+        with SessionLocal() as db:
+            jobs = db.scalar(select(func.count()).select_from(ReportJob).where(ReportJob.join_code == code))
+        check(
+            "ending the exam queues the report; POST returns it",
+            first.status == 200 and view["status"] == "done" and jobs == 1,
+            f"POST status={first.status}, job status={view['status']}, jobs={jobs}",
+        )
+        print(
+            f"      built in {elapsed:.2f}s: {messages:,} messages, {2 * sessions:,} sessions;"
+            f" json {view.get('json_bytes', 0):,} B, zip {view.get('zip_bytes', 0):,} B"
+        )
+
+        body = await download(view["job_id"], "json")
+        report = json.loads(body.body) if body.status == 200 else {}
+        zipped = await download(view["job_id"], "zip")
+        names, csv_rows = [], {}
+        if zipped.status == 200:
+            with zipfile.ZipFile(io.BytesIO(zipped.body)) as zf:
+                names = sorted(zf.namelist())
+                for name in names:
+                    if name.endswith(".csv"):
+                        text = zf.read(name).decode("utf-8-sig")
+                        csv_rows[name] = len(list(csv.DictReader(io.StringIO(text))))
+        counts = {
+            "chat": len(report.get("chat", [])),
+            "sessions": len(report.get("attendance", {}).get("sessions", [])),
+            "examinees": len(report.get("attendance", {}).get("summary", [])),
+            "recordings": len(report.get("recordings", {}).get("items", [])),
+            "flags": len(report.get("flags", [])),
+        }
+        still_open = sum(1 for p in report.get("attendance", {}).get("summary", []) if p["open"])
+        check(
+            "ending closes open sessions; later leave calls don't make the report stale",
+            still_open == 0 and not any(leaves) and jobs == 1,
+            f"open examinees={still_open}, leave updates={sum(leaves)}, jobs={jobs}",
+        )
+        check(
+            "JSON artifact holds every row",
+            counts == {"chat": messages + 1, "sessions": 2 * sessions, "examinees": sessions, "recordings": 2, "flags": 1},
+            f"{counts}",
+        )
+        check(
+            "zip artifact has the CSVs with the same rows",
+            csv_rows.get("chat.csv") == messages + 1
+            and csv_rows.get("attendance_sessions.csv") == 2 * sessions
+            and csv_rows.get("attendance_summary.csv") == sessions
+            and csv_rows.get("recordings.csv") == 2
+            and csv_rows.get("flags.csv") == 1
+            and "report.json" in names,
+            f"{csv_rows}",
+        )
+
+        await client.request(
+            "POST", "/chat-logs", json_body={"join_code": code, "message_id": "late", "text": "after the end"}
+        )
+        changed = await post_report(code)
+        forced = await post_report(code, force="true")
+        check(
+            "new data or force=true builds a new report",
+            changed.status == 202 and forced.status == 202 and changed.json()["job_id"] != view["job_id"],
+            f"after new message={changed.status}, force={forced.status}",
+        )
+        changed_view = await wait_done(changed.json()["job_id"])
+        await wait_done(forced.json()["job_id"])
+
+        # Archived: same transcript, read from the archive files.
+        with SessionLocal() as db:
+            db.execute(
+                update(ScheduledMeeting)
+                .where(ScheduledMeeting.join_code == code)
+                .values(updated_at=datetime.utcnow() - timedelta(days=60))
+            )
+            db.commit()
+        archive.run_archive_pass()
+        archived = await wait_done((await post_report(code, force="true")).json()["job_id"])
+        before = json.loads((await download(changed_view["job_id"], "json")).body)
+        after = json.loads((await download(archived["job_id"], "json")).body)
+        with SessionLocal() as db:
+            left = db.scalar(select(func.count()).select_from(MeetingChatLog).where(MeetingChatLog.join_code == code))
+        check(
+            "archived exam reports the same transcript",
+            left == 0 and after["chat"] == before["chat"] and after["attendance"] == before["attendance"],
+            f"rows left in table={left}, messages={len(after['chat'])}",
+        )
+
+        # S3 storage.
+        reports.REPORTS_S3_BUCKET = "bench-reports"
+        try:
+            s3_view = await wait_done((await post_report(code, force="true")).json()["job_id"])
+            redirect = await download(s3_view["job_id"], "zip")
+            stored = sorted(k for b, k in s3.objects if b == "bench-reports")
+        finally:
+            reports.REPORTS_S3_BUCKET = ""
+        check(
+            "with REPORTS_S3_BUCKET artifacts go to S3 and downloads redirect",
+            redirect.status == 307 and "bench-reports.s3.local" in redirect.headers.get("location", "")
+            and stored == [f"reports/{code}/{s3_view['job_id']}.json", f"reports/{code}/{s3_view['job_id']}.zip"],
+            f"status={redirect.status}, objects={len(stored)}",
+        )
+
+        # A job whose process died while running it.
+        code = (await client.request("POST", "/scheduled-meetings", json_body={"title": "Orphan exam"})).json()[
+            "join_code"
+        ]
+        with SessionLocal() as db:
+            db.add(
+                ReportJob(
+                    id="orphan",
+                    join_code=code,
+                    status="running",
+                    fingerprint=reports.fingerprint(code),
+                    created_at=datetime.utcnow() - timedelta(hours=1),
+                )
+            )
+            db.commit()
+        orphan = (await client.request("GET", "/reports/orphan")).json()
+        rebuilt = await post_report(code)
+        check(
+            "an orphaned job reads as failed and is rebuilt",
+            orphan["status"] == "failed" and rebuilt.status == 202,
+            f"orphan={orphan['status']}, POST={rebuilt.status}",
+        )
+        await wait_done(rebuilt.json()["job_id"])
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10000, help="chat messages in the exam")
+    parser.add_argument("--sessions", type=int, default=300, help="examinees (each joins twice)")
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args.messages, args.sessions))
+    print(f"\n{len(failures)} check(s) failed" if failures else "\nall checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
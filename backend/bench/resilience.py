@@ -0,0 +1,154 @@
+"""Fault-injection checks for the AWS retry / circuit-breaker layer.
+
+Drives app.chime_client and the resilient client wrappers against
+bench.fakes.FakeChime wrapped in a FaultInjector, and verifies:
+
+- a throttled get_meeting is retried and the existing meeting is reused
+  (no new meeting is created, so the room isn't split);
+- only NotFound recreates a meeting;
+- persistent throttling surfaces as 503 + Retry-After, not 500;
+- the breaker opens after consecutive failures, fails fast without calling
+  AWS, and closes again after a successful half-open probe.
+
+Exits non-zero if any check fails.
+
+Usage (from backend/):
+    python -m bench.resilience
+"""
+
+import os
+import sys
+import time
+
+# Fast backoff / cooldown so the checks run in about a second.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("AWS_RETRY_BASE_SECONDS", "0.005")
+os.environ.setdefault("AWS_RETRY_MAX_BACKOFF_SECONDS", "0.02")
+os.environ.setdefault("AWS_BREAKER_FAILURE_THRESHOLD", "5")
+os.environ.setdefault("AWS_BREAKER_COOLDOWN_SECONDS", "0.3")
+
+
+def main() -> int:
+    from fastapi import HTTPException
+
+    from app import resilience
+    from app.aws_clients import CHIME_SERVICE, reset_clients, set_client
+    from app.chime_client import _get_or_create_chime_meeting, get_chime_client
+    from bench.fakes import FakeChime, FaultInjector
+
+    failures = []
+
+    def check(name: str, ok: bool, info: str = "") -> None:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({info})' if info else ''}")
+        if not ok:
+            failures.append(name)
+
+    def fresh() -> tuple[FakeChime, FaultInjector, str]:
+        reset_clients()
+        resilience.reset_breakers()
+        chime = FakeChime()
+        faulty = FaultInjector(chime)
+        set_client(CHIME_SERVICE, faulty)
+        meeting_id = chime.create_meeting(ClientRequestToken="t", MediaRegion="us-east-1", ExternalMeetingId="exam-1")[
+            "Meeting"
+        ]["MeetingId"]
+        return chime, faulty, meeting_id
+
+    # 1. Transient throttling on get_meeting: retried, same meeting reused.
+    chime, faulty, meeting_id = fresh()
+    faulty.script("get_meeting", "throttle", "throttle")
+    resp = _get_or_create_chime_meeting(external_meeting_id="exam-1", region="us-east-1", existing_meeting_id=meeting_id)
+    check(
+        "throttled get_meeting is retried and reuses the meeting",
+        resp["Meeting"]["MeetingId"] == meeting_id and len(chime.meetings) == 1,
+        f"injected={faulty.injected}, meetings={len(chime.meetings)}",
+    )
+
+    # 2. NotFound: the meeting expired, so it is recreated (once, no retries).
+    chime, faulty, meeting_id = fresh()
+    faulty.script("get_meeting", "not_found")
+    resp = _get_or_create_chime_meeting(external_meeting_id="exam-1", region="us-east-1", existing_meeting_id=meeting_id)
+    check(
+        "NotFound recreates the meeting",
+        resp["Meeting"]["MeetingId"] != meeting_id and chime.calls.get("create_meeting") == 2,
+        f"get_meeting attempts={faulty.injected.get('get_meeting', 0) + faulty.passed.get('get_meeting', 0)}",
+    )
+
+    # 3. Persistent throttling: 503 with Retry-After, and no replacement meeting.
+    chime, faulty, meeting_id = fresh()
+    faulty.fail_always("throttle")
+    try:
+        _get_or_create_chime_meeting(external_meeting_id="exam-1", region="us-east-1", existing_meeting_id=meeting_id)
+        error = None
+    except HTTPException as e:
+        error = e
+    check(
+        "persistent throttling -> 503 + Retry-After, meeting not recreated",
+        error is not None
+        and error.status_code == 503
+        and "Retry-After" in (error.headers or {})
+        and chime.calls.get("create_meeting") == 1,
+        f"status={getattr(error, 'status_code', None)}, attempts={faulty.injected.get('get_meeting')}",
+    )
+
+    # 4. Breaker: opens on consecutive failures, fails fast, recovers via probe.
+    chime, faulty, meeting_id = fresh()
+    faulty.fail_always("unavailable")
+    client = get_chime_client()
+    for _ in range(3):
+        try:
+            client.create_attendee(MeetingId=meeting_id, ExternalUserId="u1")
+        except Exception:
+            pass
+    breaker = resilience.breaker_for(CHIME_SERVICE)
+    attempts_when_open = sum(faulty.injected.values())
+    started = time.perf_counter()
+    try:
+        client.create_attendee(MeetingId=meeting_id, ExternalUserId="u1")
+        fast_fail = None
+    except Exception as e:
+        fast_fail = e
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    check(
+        "breaker opens and fails fast without calling AWS",
+        breaker.state == breaker.OPEN
+        and isinstance(fast_fail, resilience.CircuitOpenError)
+        and sum(faulty.injected.values()) == attempts_when_open,
+        f"state={breaker.state}, fast-fail {elapsed_ms:.2f} ms",
+    )
+    mapped = resilience.http_exception(fast_fail) if fast_fail else None
+    check("open circuit maps to 503", mapped is not None and mapped.status_code == 503)
+
+    faulty.fail_always(None)
+    time.sleep(float(os.environ["AWS_BREAKER_COOLDOWN_SECONDS"]) + 0.05)
+    attendee = client.create_attendee(MeetingId=meeting_id, ExternalUserId="u1")
+    check(
+        "half-open probe succeeds and closes the breaker",
+        breaker.state == breaker.CLOSED and bool(attendee.get("Attendee")),
+        f"state={breaker.state}",
+    )
+
+    # 5. Non-idempotent operations are not retried on ambiguous failures.
+    from app.aws_clients import COGNITO_SERVICE, get_cognito
+    from bench.fakes import FakeCognito
+
+    cognito = FaultInjector(FakeCognito())
+    set_client(COGNITO_SERVICE, cognito)
+    cognito.script("admin_create_user", "unavailable")
+    try:
+        get_cognito().admin_create_user(UserPoolId="p", Username="a@example.com")
+    except Exception:
+        pass
+    check(
+        "admin_create_user is not retried after a 5xx",
+        cognito.injected.get("admin_create_user") == 1 and not cognito.passed.get("admin_create_user"),
+    )
+
+    reset_clients()
+    resilience.reset_breakers()
+    print(f"\n{len(failures)} check(s) failed" if failures else "\nall checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""Micro-benchmark: chat-log list serialization (legacy path vs FastJSONResponse).
+
+Seeds N chat rows for one join_code into a scratch SQLite database, then
+times, per strategy, the query + serialization work of GET /chat-logs/{code}:
+
+- legacy:   ORM entities -> dicts -> jsonable_encoder -> JSONResponse
+- fast:     column projection -> rows_to_dicts -> FastJSONResponse (orjson)
+- fast-json: same, with the stdlib json fallback (orjson disabled)
+
+Usage (from backend/):
+    python -m bench.serialization --rows 5000 --runs 15
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="exam-bench-"), "serialization.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    from app import responses
+    from app.db import SessionLocal, init_db
+    from app.models import MeetingChatLog
+    from app.responses import FastJSONResponse, rows_to_dicts
+    from app.routers.chat_logs import _CHAT_LOG_FIELDS
+
+    init_db()
+    code = "BENCH01"
+    base = datetime(2026, 1, 1, 9, 0, 0)
+    with SessionLocal.begin() as db:
+        db.bulk_insert_mappings(
+            MeetingChatLog,
+            [
+                {
+                    "join_code": code,
+                    "message_id": f"m-{i}",
+                    "msg_type": "chat",
+                    "from_role": "examinee",
+                    "from_attendee_id": f"att-{i % 300}",
+                    "to_role": "proctor",
+                    "to_attendee_id": "att-proctor",
+                    "text": f"質問があります / question #{i}",
+                    "sent_at": base + timedelta(milliseconds=137 * i),
+                    "created_at": base + timedelta(milliseconds=137 * i + 11),
+                }
+                for i in range(args.rows)
+            ],
+        )
+
+    order = (
+        MeetingChatLog.sent_at.is_(None).asc(),
+        MeetingChatLog.sent_at.asc(),
+        MeetingChatLog.created_at.asc(),
+        MeetingChatLog.id.asc(),
+    )
+
+    def legacy(db):
+        rows = db.query(MeetingChatLog).filter(MeetingChatLog.join_code == code).order_by(*order).all()
+        content = [
+            {
+                "id": r.id,
+                "join_code": r.join_code,
+                "message_id": r.message_id,
+                "ts": r.sent_at,
+                "type": r.msg_type,
+                "from_role": r.from_role,
+                "from_attendee_id": r.from_attendee_id,
+                "to_role": r.to_role,
+                "to_attendee_id": r.to_attendee_id,
+                "text": r.text,
+                "created_at": r.created_at,
+            }
+            for r in rows
+        ]
+        return JSONResponse(jsonable_encoder(content)).body
+
+    def fast(db):
+        rows = (
+            db.query(
+                MeetingChatLog.id,
+                MeetingChatLog.join_code,
+                MeetingChatLog.message_id,
+                MeetingChatLog.sent_at,
+                MeetingChatLog.msg_type,
+                MeetingChatLog.from_role,
+                MeetingChatLog.from_attendee_id,
+                MeetingChatLog.to_role,
+                MeetingChatLog.to_attendee_id,
+                MeetingChatLog.text,
+                MeetingChatLog.created_at,
+            )
+            .filter(MeetingChatLog.join_code == code)
+            .order_by(*order)
+            .all()
+        )
+        return FastJSONResponse(rows_to_dicts(rows, _CHAT_LOG_FIELDS)).body
+
+    def fast_stdlib(db):
+        saved, responses.orjson = responses.orjson, None
+        try:
+            return fast(db)
+        finally:
+            responses.orjson = saved
+
+    strategies = [("legacy", legacy), ("fast", fast)]
+    if responses.orjson is not None:
+        strategies.append(("fast-json", fast_stdlib))
+    else:
+        print("orjson is not installed: 'fast' uses the stdlib json fallback")
+
+    bodies = {}
+    results = {}
+    for name, fn in strategies:
+        samples = []
+        for i in range(args.runs + 1):
+            db = SessionLocal()
+            try:
+                t0 = time.perf_counter()
+                body = fn(db)
+                elapsed = (time.perf_counter() - t0) * 1000
+            finally:
+                db.close()
+            if i:  # first run warms caches
+                samples.append(elapsed)
+        bodies[name] = body
+        results[name] = statistics.median(samples)
+
+    identical = len({bytes(b) for b in bodies.values()}) == 1
+    print(f"{args.rows} chat rows, {len(bodies['legacy'])} bytes, identical output: {identical}")
+    for name, median in results.items():
+        speedup = results["legacy"] / median if median else float("inf")
+        print(f"  {name:10s} median {median:8.2f} ms  ({speedup:.1f}x vs legacy)")
+
+
+if __name__ == "__main__":
+    main()
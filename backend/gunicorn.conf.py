@@ -0,0 +1,45 @@
+"""Gunicorn settings for running several Uvicorn workers per node.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Several workers (or nodes) need SHARED_STATE_URL pointing at a shared
+backend (`sql://` or `redis://...`, see app/shared_state.py); startup
+refuses an in-process backend with more than one worker.
+"""
+
+import multiprocessing
+import os
+
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+# Async workers: one per core is enough; DB work runs in each worker's threadpool.
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Not preloaded: each worker imports the app after fork (AWS clients and DB
+# pools must not be shared across processes), and runs its own startup.
+preload_app = False
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# Longer than the load balancer's idle timeout (ALB default: 60 s), so the
+# LB, not the worker, closes idle keep-alive connections.
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "75"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+
+def on_starting(server):
+    shared_state_url = os.getenv("SHARED_STATE_URL", "").strip()
+    if server.cfg.workers > 1 and (not shared_state_url or shared_state_url.startswith("memory:")):
+        raise RuntimeError(
+            f"{server.cfg.workers} workers need a shared state backend: set SHARED_STATE_URL (sql:// or redis://...)"
+        )
+    admission_workers = int(os.getenv("ADMISSION_WORKERS", "1") or 1)
+    if admission_workers < server.cfg.workers:
+        server.log.warning(
+            "ADMISSION_WORKERS=%s but this node runs %s workers; Chime admission limits are multiplied",
+            admission_workers,
+            server.cfg.workers,
+        )
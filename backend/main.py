@@ -1,42 +1,127 @@
+from functools import partial
+
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
-from app.db import init_db
+from app import audit, logs, shared_state
+from app.archive import start_archiver, stop_archiver
+from app.auth import COGNITO_REGION, COGNITO_USER_POOL_ID, refresh_jwks
+from app.aws_clients import AWS_CLIENTS_PREWARM, close_clients, prewarm_clients
+from app.compression import COMPRESSION_ENABLED, CompressionMiddleware
+from app.db import dispose_engines, init_db
+from app.flags import start_sweeper, stop_sweeper
+from app.health import monitor as health_monitor
+from app.idempotency import IDEMPOTENCY_ENABLED, IdempotencyMiddleware
+from app.lifecycle import lifecycle
+from app.metrics import MetricsMiddleware
+from app.profiling import PROFILING_ENABLED, ProfilingMiddleware
+from app.reports import stop_reports
 from app.routers.attendance import router as attendance_router
 from app.routers.chat_logs import router as chat_logs_router
+from app.routers.classes import router as classes_router
 from app.routers.meetings import router as meetings_router
+from app.routers.metrics import router as metrics_router
+from app.routers.overview import router as overview_router
 from app.routers.profile import router as profile_router
+from app.routers.reports import router as reports_router
 from app.routers.root import router as root_router
 from app.routers.scheduled_meetings import router as scheduled_meetings_router
 from app.routers.users import router as users_router
 
 
 load_dotenv()
+# Queued until the "logging" component starts the writer thread.
+logs.configure_logging()
 
-app = FastAPI(title="Exam Surveillance API")
+app = FastAPI(title="Exam Surveillance API", lifespan=lifecycle.lifespan)
 
+if IDEMPOTENCY_ENABLED:
+    # Inside CORS, so replayed responses still get CORS headers.
+    app.add_middleware(IdempotencyMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the frontend read pagination/caching/admission headers cross-origin.
+    expose_headers=[
+        "ETag",
+        "X-Next-After-Id",
+        "X-Next-Offset",
+        "X-Search-Truncated",
+        "Location",
+        "Retry-After",
+        "X-Queue-Position",
+        "Idempotent-Replayed",
+        logs.REQUEST_ID_HEADER,
+    ],
 )
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+# Measures the whole request including CORS handling.
+app.add_middleware(MetricsMiddleware)
+# Outermost: the request id is bound for everything inside, including CORS.
+app.add_middleware(logs.RequestLogMiddleware)
+
 
+def _register_components() -> None:
+    # First to start, last to stop: everything else logs through it.
+    lifecycle.register("logging", start=logs.start_listener, stop=partial(run_in_threadpool, logs.stop_listener))
+    # Blocking hooks run in the threadpool; the loops need the event loop itself.
+    lifecycle.register("shared_state", start=shared_state.backend, stop=shared_state.close_backend)
+    # init_db elects its migration leader through the shared state.
+    lifecycle.register(
+        "database",
+        start=partial(run_in_threadpool, init_db),
+        stop=partial(run_in_threadpool, dispose_engines),
+        after=("shared_state",),
+    )
+    lifecycle.register(
+        "aws_clients",
+        # Runs per worker, i.e. after fork.
+        start=partial(run_in_threadpool, prewarm_clients, cognito_region=COGNITO_REGION) if AWS_CLIENTS_PREWARM else None,
+        stop=partial(run_in_threadpool, close_clients),
+    )
+    if COGNITO_USER_POOL_ID:
+        # Requests only read the cached keys; if this fetch fails, the health
+        # monitor's jwks probe retries every HEALTH_AWS_PROBE_INTERVAL_SECONDS.
+        lifecycle.register("jwks", start=partial(run_in_threadpool, refresh_jwks))
+    lifecycle.register("archiver", start=start_archiver, stop=stop_archiver, after=("database", "shared_state"))
+    lifecycle.register("flag_sweeper", start=start_sweeper, stop=stop_sweeper, after=("database", "shared_state"))
+    lifecycle.register("audit", start=audit.start_flusher, stop=audit.stop_flusher, after=("database",))
+    # Probes need the clients and pools; the first round runs before the worker is ready.
+    lifecycle.register(
+        "health",
+        start=health_monitor.start,
+        stop=health_monitor.stop,
+        after=("shared_state", "database", "aws_clients"),
+    )
+    lifecycle.register(
+        "reports",
+        # Drains within what is left of the shutdown deadline.
+        stop=lambda: run_in_threadpool(stop_reports, lifecycle.remaining()),
+        after=("database", "aws_clients"),
+    )
 
-@app.on_event("startup")
-def _startup():
-    init_db()
 
+_register_components()
 
 app.include_router(root_router)
+app.include_router(metrics_router)
 app.include_router(profile_router)
 app.include_router(scheduled_meetings_router)
 app.include_router(users_router)
+app.include_router(classes_router)
 app.include_router(meetings_router)
 app.include_router(attendance_router)
 app.include_router(chat_logs_router)
+app.include_router(reports_router)
+app.include_router(overview_router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -33,17 +33,49 @@ async function parseErrorDetail(res) {
   return detail;
 }
 
-export async function callApi(endpoint, body) {
+// Join endpoints answer 429 + Retry-After while admission control queues a join storm.
+const MAX_RETRIES = 5;
+
+function sleep(ms) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+// One key per logical request; retries reuse it so the server can dedupe them.
+function newIdempotencyKey() {
+  if (globalThis.crypto?.randomUUID) return globalThis.crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+async function fetchWithRetry(url, init) {
+  for (let attempt = 0; ; attempt += 1) {
+    let res;
+    try {
+      res = await fetch(url, init);
+    } catch (err) {
+      // Network failure: only safe to resend when the server can dedupe it.
+      if (!init.headers?.['Idempotency-Key'] || attempt >= MAX_RETRIES) throw err;
+      await sleep(2 ** attempt * 250 + Math.random() * 250);
+      continue;
+    }
+    if (res.status !== 429 || attempt >= MAX_RETRIES) return res;
+    const retryAfter = Number(res.headers.get('Retry-After')) || 1;
+    // Jitter so queued clients don't come back in lockstep.
+    await sleep(retryAfter * 1000 + Math.random() * 500);
+  }
+}
+
+export async function callApi(endpoint, body, extraHeaders = {}) {
   const headers = {
     'Content-Type': 'application/json',
     ...buildAuthHeaders(),
+    ...extraHeaders,
   };
 
   if (!headers.Authorization) {
     console.warn(`[callApi] Warning: No authToken available for request to ${endpoint}`);
   }
 
-  const res = await fetch(`${API_BASE}${endpoint}`, {
+  const res = await fetchWithRetry(`${API_BASE}${endpoint}`, {
     method: 'POST',
     headers,
     body: JSON.stringify(body),
@@ -58,12 +90,13 @@ export async function callApi(endpoint, body) {
   return res.json();
 }
 
-export async function callApiNoAuth(endpoint, body) {
+export async function callApiNoAuth(endpoint, body, extraHeaders = {}) {
   const headers = {
     'Content-Type': 'application/json',
+    ...extraHeaders,
   };
 
-  const res = await fetch(`${API_BASE}${endpoint}`, {
+  const res = await fetchWithRetry(`${API_BASE}${endpoint}`, {
     method: 'POST',
     headers,
     body: JSON.stringify(body),
@@ -154,19 +187,28 @@ export async function createMeeting(meetingId) {
 }
 
 export async function createAttendee(meetingId, userId) {
-  return callApi(`/meetings/${meetingId}/attendees`, { external_user_id: userId });
+  return callApi(
+    `/meetings/${meetingId}/attendees`,
+    { external_user_id: userId },
+    { 'Idempotency-Key': newIdempotencyKey() },
+  );
 }
 
 export async function guestJoinMeeting(joinCode, externalUserId, region) {
-  return callApiNoAuth('/guest/join', {
-    external_meeting_id: joinCode,
-    external_user_id: externalUserId,
-    region: region || 'us-east-1',
-  });
+  return callApiNoAuth(
+    '/guest/join',
+    {
+      external_meeting_id: joinCode,
+      external_user_id: externalUserId,
+      region: region || 'us-east-1',
+    },
+    { 'Idempotency-Key': newIdempotencyKey() },
+  );
 }
 
 export async function attendanceJoin({ joinCode, chimeMeetingId, attendeeId, externalUserId, role }) {
-  return callApiNoAuth('/attendance/join', {
+  // Auth is optional server-side; when sent, the session is linked to the user for roster status.
+  return callApi('/attendance/join', {
     join_code: String(joinCode || '').trim(),
     chime_meeting_id: chimeMeetingId ? String(chimeMeetingId) : null,
     attendee_id: String(attendeeId || '').trim(),
@@ -183,7 +225,7 @@ export async function attendanceLeave({ joinCode, attendeeId }) {
 }
 
 export async function createScheduledMeeting(body) {
-  return callApi('/scheduled-meetings', body);
+  return callApi('/scheduled-meetings', body, { 'Idempotency-Key': newIdempotencyKey() });
 }
 
 export async function listScheduledMeetings() {